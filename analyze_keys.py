@@ -2,45 +2,74 @@
 """
 Analyze key patterns in the LevelDB database
 """
+import contextlib
 import plyvel
 import sys
 from collections import defaultdict
 import config
+import run_history
+import sharded_scan
 
-def analyze_keys(db_path='state/'):
-    """Analyze key patterns and structure"""
-    try:
-        db = plyvel.DB(db_path, create_if_missing=False)
-    except Exception as e:
-        print(f"Error opening database: {e}")
-        return
-    
-    # Collect key patterns
+# Example keys kept per key length (5 for the distribution, 3 with values)
+EXAMPLES_PER_LENGTH = 5
+
+def _analyze_range(db, start, stop):
+    """Key length counts, example keys and prefix counts of one key range"""
     key_prefixes = defaultdict(int)
-    key_by_length = defaultdict(list)
-    
-    print("Analyzing keys...")
-    for key, value in db:
+    key_counts = defaultdict(int)
+    example_keys = defaultdict(list)
+    for key in sharded_scan.iterate(db, start, stop, include_value=False):
         # Group by length
-        key_by_length[len(key)].append((key, value))
+        key_counts[len(key)] += 1
+        if len(example_keys[len(key)]) < EXAMPLES_PER_LENGTH:
+            example_keys[len(key)].append(key)
         
         # Try to find common prefixes (first 1-4 bytes)
         for prefix_len in [1, 2, 4, 8]:
             if len(key) >= prefix_len:
                 prefix = key[:prefix_len]
                 key_prefixes[(prefix_len, prefix)] += 1
+    return key_counts, example_keys, key_prefixes
+
+def analyze_keys(db_path='state/', jobs=None):
+    """Analyze key patterns and structure"""
+    # Collect key patterns. Only counts and the few example keys that are
+    # printed are kept; their values are fetched afterwards, so the scan
+    # never loads a value (e.g. the large changelog blob). Ranges come back
+    # in key order, so the merged examples are the first keys of each length.
+    key_prefixes = defaultdict(int)
+    key_counts = defaultdict(int)
+    example_keys = defaultdict(list)
+    
+    run = run_history.current()
+    run.set_db(db_path)
+    print("Analyzing keys...")
+    try:
+        with run.phase('scan'):
+            for counts, examples, prefixes in sharded_scan.map_ranges(db_path, _analyze_range, jobs=jobs):
+                for length, count in counts.items():
+                    key_counts[length] += count
+                for length, keys in examples.items():
+                    example_keys[length].extend(keys[:EXAMPLES_PER_LENGTH - len(example_keys[length])])
+                for prefix, count in prefixes.items():
+                    key_prefixes[prefix] += count
+        db = plyvel.DB(db_path, create_if_missing=False)
+    except (plyvel.Error, OSError) as e:
+        print(f"Error opening database: {e}")
+        return False
+    run.set(db_keys=sum(key_counts.values()))
     
     # Print results
     print("\n" + "="*80)
     print("KEY LENGTH DISTRIBUTION")
     print("="*80)
-    for length in sorted(key_by_length.keys()):
-        count = len(key_by_length[length])
+    for length in sorted(key_counts.keys()):
+        count = key_counts[length]
         print(f"Length {length:3d}: {count:6d} keys")
         
         # Show a few examples
         if count <= 5:
-            for key, value in key_by_length[length][:5]:
+            for key in example_keys[length][:5]:
                 print(f"  Example: {key.hex()}")
     
     print("\n" + "="*80)
@@ -60,34 +89,43 @@ def analyze_keys(db_path='state/'):
     print("DETAILED ANALYSIS BY KEY LENGTH")
     print("="*80)
     
-    for length in sorted(key_by_length.keys()):
-        entries = key_by_length[length]
-        print(f"\n--- Keys of length {length} ({len(entries)} total) ---")
+    for length in sorted(key_counts.keys()):
+        print(f"\n--- Keys of length {length} ({key_counts[length]} total) ---")
         
-        # Show first 3 examples with their values
-        for i, (key, value) in enumerate(entries[:3], 1):
+        # Show first 3 examples with their values (point lookups)
+        for i, key in enumerate(example_keys[length][:3], 1):
+            value = db.get(key, b'')
             print(f"\nExample {i}:")
             print(f"  Key (hex):   {key.hex()}")
             print(f"  Value (hex): {value.hex()[:100]}{'...' if len(value.hex()) > 100 else ''}")
             print(f"  Value size:  {len(value)} bytes")
     
     db.close()
+    return True
 
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description='Analyze key patterns in the LevelDB database')
     parser.add_argument('--db', default=None, help='Path to LevelDB database (default: auto-detect from config)')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Parallel scan workers (default: config.SCAN_JOBS or the number of CPUs)')
 
     args = parser.parse_args()
 
-    # Use config if no db path specified
-    if args.db is None:
-        try:
-            args.db = config.get_safe_db_path()
-        except (FileNotFoundError, RuntimeError) as e:
-            print(f"ERROR: {e}")
-            sys.exit(1)
+    run = run_history.start('analyze')
+
+    # The copy replaces the local database another command may be reading
+    with config.tool_lock('analyze') if args.db is None else contextlib.nullcontext():
+        # Use config if no db path specified
+        if args.db is None:
+            try:
+                with run.phase('copy'):
+                    args.db = config.get_safe_db_path()
+            except (FileNotFoundError, RuntimeError) as e:
+                print(f"ERROR: {e}")
+                sys.exit(1)
 
-    analyze_keys(args.db)
+        success = analyze_keys(args.db, args.jobs)
+    run.finish(success)
 
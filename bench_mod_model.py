@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Benchmark the compact mod model against the dict-of-dicts layout.
+
+Builds both representations from the same synthetic Vortex keys (no
+database needed) and reports retained memory and lookup speed.
+"""
+import gc
+import json
+import time
+import tracemalloc
+import mod_model
+
+def make_entries(num_mods, num_profiles, game='subnautica'):
+    """Synthetic (key, value) pairs shaped like a Vortex library"""
+    entries = []
+    for i in range(num_mods):
+        mod_id = f'Ancient Sword (BepInEx - Nautilus) {i}-{226 + i}-1-9-{1755769809 + i}'
+        prefix = f'persistent###mods###{game}###{mod_id}###'
+        entries.append((prefix + 'installationPath', json.dumps(mod_id)))
+        entries.append((prefix + 'type', json.dumps('bepinex-plugin' if i else 'bepinex-5')))
+        entries.append((prefix + 'state', json.dumps('installed')))
+        entries.append((prefix + 'attributes###name', json.dumps(f'Ancient Sword {i}')))
+        entries.append((prefix + 'attributes###modVersion', json.dumps('1.9.1')))
+        entries.append((prefix + 'attributes###author', json.dumps('someone')))
+        for p in range(num_profiles):
+            state_prefix = f'persistent###profiles###profile{p}###modState###{mod_id}###'
+            entries.append((state_prefix + 'enabled', 'true' if (i + p) % 3 else 'false'))
+            entries.append((state_prefix + 'enabledTime', str(1700000000000 + i)))
+    return [(key.encode(), value.encode()) for key, value in entries]
+
+def build_dicts(entries, game='subnautica'):
+    """The dict-of-dicts layout the scanning scripts used to build"""
+    mods_info = {}
+    mod_enabled_status = {}
+    enabled_mods = {}
+    for key, value in entries:
+        parts = key.decode('utf-8').split('###')
+        if parts[1] == 'profiles':
+            profile_id, mod_id, field = parts[2], parts[4], parts[5]
+            if field == 'enabled':
+                mod_enabled_status.setdefault(profile_id, {})[mod_id] = value == b'true'
+            else:
+                enabled_mods.setdefault(profile_id, {})[mod_id] = value.decode('utf-8')
+        else:
+            mod_id = parts[3]
+            info = mods_info.setdefault(mod_id, {'id': mod_id})
+            info[parts[-1]] = json.loads(value.decode('utf-8'))
+    return mods_info, mod_enabled_status, enabled_mods
+
+def build_library(entries, game='subnautica'):
+    """The same data in a mod_model.ModLibrary"""
+    library = mod_model.ModLibrary()
+    for key, value in entries:
+        parts = key.decode('utf-8').split('###')
+        if parts[1] == 'profiles':
+            profile_id, mod_id, field = parts[2], parts[4], parts[5]
+            if field == 'enabled':
+                library.set_enabled(profile_id, mod_id, value == b'true')
+            else:
+                library.set_enabled_time(profile_id, mod_id, value)
+        elif len(parts) == 5:
+            library.set_field(parts[3], parts[4], json.loads(value.decode('utf-8')))
+        else:
+            library.set_attribute(parts[3], parts[5], json.loads(value.decode('utf-8')))
+    return library
+
+def measure_memory(build, entries):
+    """Bytes still allocated after building (the structure's footprint)"""
+    gc.collect()
+    tracemalloc.start()
+    result = build(entries)
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+def time_lookups(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def run_benchmark(num_mods=2000, num_profiles=5, repeat=5):
+    """Print memory and lookup timings for both layouts"""
+    print("="*80)
+    print(f"MOD MODEL BENCHMARK ({num_mods} mods, {num_profiles} profiles)")
+    print("="*80)
+
+    entries = make_entries(num_mods, num_profiles)
+    (mods_info, enabled_status, _), dict_bytes = measure_memory(build_dicts, entries)
+    library, library_bytes = measure_memory(build_library, entries)
+
+    print(f"\nMemory (retained after build):")
+    print(f"  dict of dicts: {dict_bytes / 1024:10.1f} KiB")
+    print(f"  ModLibrary:    {library_bytes / 1024:10.1f} KiB")
+    print(f"  saved:         {(dict_bytes - library_bytes) / 1024:10.1f} KiB "
+          f"({1 - library_bytes / dict_bytes:.0%})")
+
+    mod_ids = list(mods_info)
+    profile_ids = [f'profile{p}' for p in range(num_profiles)]
+    lookups = len(mod_ids) * len(profile_ids)
+
+    def dict_enabled():
+        for profile_id in profile_ids:
+            status = enabled_status.get(profile_id, {})
+            for mod_id in mod_ids:
+                status.get(mod_id, False)
+
+    def library_enabled_by_id():
+        for profile_id in profile_ids:
+            for mod_id in mod_ids:
+                library.is_enabled(profile_id, mod_id)
+
+    def library_enabled_by_index():
+        for profile_id in profile_ids:
+            flags = library.enabled_flags(profile_id)
+            for index in range(len(flags)):
+                flags[index] == mod_model.ENABLED
+
+    def dict_type_filter():
+        [info for info in mods_info.values() if info.get('type') in ('bepinex-5', 'bepinex-plugin')]
+
+    def library_type_filter():
+        wanted = (mod_model.ModType.BEPINEX_5, mod_model.ModType.BEPINEX_PLUGIN)
+        [record for record in library if record.mod_type in wanted]
+
+    print(f"\nLookup speed (best of {repeat}, {lookups} enabled checks):")
+    for label, fn in [
+        ("dict of dicts, by id", dict_enabled),
+        ("ModLibrary, by id", library_enabled_by_id),
+        ("ModLibrary, by index", library_enabled_by_index),
+    ]:
+        elapsed = time_lookups(fn, repeat)
+        print(f"  {label:24s}: {elapsed * 1000:8.2f} ms  ({elapsed / lookups * 1e9:6.1f} ns/lookup)")
+
+    print(f"\nType filter over {len(mod_ids)} mods:")
+    for label, fn in [
+        ("dict of dicts", dict_type_filter),
+        ("ModLibrary (enum)", library_type_filter),
+    ]:
+        elapsed = time_lookups(fn, repeat)
+        print(f"  {label:24s}: {elapsed * 1000:8.2f} ms")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark the compact mod model')
+    parser.add_argument('--mods', type=int, default=2000, help='Number of synthetic mods (default: 2000)')
+    parser.add_argument('--profiles', type=int, default=5, help='Number of profiles (default: 5)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing repetitions (default: 5)')
+
+    args = parser.parse_args()
+    run_benchmark(args.mods, args.profiles, args.repeat)
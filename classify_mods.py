@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Infer the deploy target of mods Vortex has no type for.
+
+Enabled mods without a type used to be skipped. Their staging tree
+usually says where they belong:
+
+  BepInEx/, QMods/, doorstop_config.ini or winhttp.dll at the root
+      -> bepinex-5, deployed into the game root
+  a DLL at the top level or in a top-level folder
+      -> bepinex-plugin, deployed into BepInEx/plugins
+
+Mods with a type of their own (e.g. 'dinput', 'enb' or 'qmod') are left
+alone: another installer deploys them, however they look.
+
+Listings come from the staging listing cache (staging_cache.ListingCache)
+when the caller has one, and results are cached per mod id under a digest
+of every listing infer_type() reads: the top level and each top-level
+folder. Classifying an unchanged mod costs the listing cache's one stat
+per directory.
+"""
+import hashlib
+import json
+import os
+import threading
+import config
+from mod_model import ModType
+
+CACHE_VERSION = 3
+
+# Top-level entries (lowercase) of a mod that goes into the game root
+ROOT_DIRS = {'bepinex', 'qmods'}
+ROOT_FILES = {'doorstop_config.ini', 'winhttp.dll'}
+
+PLUGIN_SUFFIX = '.dll'
+
+def scan_dir(dir_path):
+    """(dirs, files) entry names of a directory, like ListingCache.list_dir() without a cache"""
+    dirs = []
+    files = []
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            (dirs if entry.is_dir() else files).append(entry.name)
+    return dirs, files
+
+def infer_type(staging_dir, list_dir=scan_dir):
+    """
+    Classify one staging directory by its layout.
+
+    Returns (ModType, reason), or (None, reason) if it doesn't look like
+    anything deploy_mods.py can place. Raises FileNotFoundError if the
+    directory is gone.
+    """
+    dirs, files = list_dir(staging_dir)
+
+    for name in dirs:
+        if name.lower() in ROOT_DIRS:
+            return ModType.BEPINEX_5, f"{name}/ at the root"
+    for name in files:
+        if name.lower() in ROOT_FILES:
+            return ModType.BEPINEX_5, f"{name} at the root"
+
+    for name in files:
+        if name.lower().endswith(PLUGIN_SUFFIX):
+            return ModType.BEPINEX_PLUGIN, f"plugin DLL {name} at the top level"
+    for name in dirs:
+        try:
+            _, sub_files = list_dir(os.path.join(staging_dir, name))
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+        for sub_name in sub_files:
+            if sub_name.lower().endswith(PLUGIN_SUFFIX):
+                return ModType.BEPINEX_PLUGIN, f"plugin DLL {name}/{sub_name}"
+
+    return None, "no BepInEx, QMods or plugin DLL found"
+
+def listing_key(staging_dir, list_dir=scan_dir):
+    """
+    Digest of the listings infer_type() decides from (the top level and the
+    files of each top-level folder). Raises FileNotFoundError if the
+    directory is gone.
+    """
+    dirs, files = list_dir(staging_dir)
+    listing = [staging_dir, sorted(dirs), sorted(files)]
+    for name in sorted(dirs):
+        try:
+            _, sub_files = list_dir(os.path.join(staging_dir, name))
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            sub_files = None
+        listing.append([name, sorted(sub_files) if sub_files is not None else None])
+    return hashlib.sha1(json.dumps(listing).encode()).hexdigest()
+
+def needs_inference(record):
+    """Only mods Vortex has no type for are classified"""
+    return record.mod_type is ModType.NONE
+
+class TypeCache:
+    """
+    Inferred mod types keyed by mod id and validated by listing_key().
+
+    listings is the staging_cache.ListingCache to list directories with;
+    without one, directories are scanned.
+    """
+
+    def __init__(self, path=None, listings=None):
+        self.path = path or config.MOD_TYPE_CACHE
+        self.listings = listings
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Load the cache file, starting empty if it is missing or unreadable"""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == CACHE_VERSION:
+            self.entries = data.get('mods', {})
+
+    def save(self):
+        """Write the cache back if anything changed"""
+        if not self.dirty:
+            return
+        with self.lock:
+            data = {'version': CACHE_VERSION, 'mods': self.entries}
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
+    def classify(self, mod_id, staging_dir):
+        """Return (ModType or None, reason) for a mod, None type if its staging directory is missing"""
+        list_dir = self.listings.list_dir if self.listings is not None else scan_dir
+        try:
+            key = listing_key(staging_dir, list_dir)
+        except (FileNotFoundError, NotADirectoryError):
+            return None, f"staging directory not found: {staging_dir}"
+
+        with self.lock:
+            cached = self.entries.get(mod_id)
+            if cached is not None and cached['key'] == key:
+                self.hits += 1
+                return ModType.parse(cached['type']) if cached['type'] else None, cached['reason']
+
+        try:
+            mod_type, reason = infer_type(staging_dir, list_dir)
+        except (FileNotFoundError, NotADirectoryError):
+            return None, f"staging directory not found: {staging_dir}"
+
+        with self.lock:
+            self.misses += 1
+            self.entries[mod_id] = {'key': key, 'type': mod_type.value if mod_type else None, 'reason': reason}
+            self.dirty = True
+        return mod_type, reason
@@ -1,36 +1,71 @@
 #!/usr/bin/env python3
 """
 Remove mod symlinks from the game directory.
-Safely undeploys mods by removing only symlinks (not real files).
+Safely undeploys mods by removing only what deploy_mods.py placed: the
+files recorded in the deploy manifest that are still unchanged (symlinks,
+hardlinks and copies, recognised by inode), or without a manifest every
+symlink. Other real files are never removed.
 """
 import os
+import shutil
 import sys
 from pathlib import Path
 import config
+import deploy_journal
+import deploy_manifest
+import fs_batch
+import game_backups
+import run_history
+import shadow_tree
 
 def find_symlinks(directory, recursive=True):
     """Find all symlinks in a directory"""
     symlinks = []
     
-    if not os.path.exists(directory):
-        return symlinks
-    
     try:
-        for item in os.listdir(directory):
-            item_path = os.path.join(directory, item)
-            
-            if os.path.islink(item_path):
-                symlinks.append(item_path)
-            elif recursive and os.path.isdir(item_path) and not os.path.islink(item_path):
-                # Recursively search subdirectories
-                symlinks.extend(find_symlinks(item_path, recursive=True))
-    except PermissionError:
+        # scandir reports the entry type from the directory listing itself,
+        # so no extra lstat per entry is needed
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_symlink():
+                    symlinks.append(entry.path)
+                elif recursive and entry.is_dir(follow_symlinks=False):
+                    # Recursively search subdirectories
+                    symlinks.extend(find_symlinks(entry.path, recursive=True))
+    except (FileNotFoundError, PermissionError):
         pass
     
     return symlinks
 
-def cleanup_mods(game_path, dry_run=False, verbose=False):
-    """Remove mod symlinks from game directory"""
+def find_deployed_files(manifest):
+    """
+    Files of the manifest that are still the ones deploy placed.
+
+    Returns (owned, changed): changed files were replaced since the
+    deployment (e.g. by a game update) and are not ours to remove.
+    """
+    owned = []
+    changed = []
+    for dest, entry in manifest['entries'].items():
+        try:
+            st = os.lstat(dest)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        (owned if deploy_manifest.is_owned(entry, st) else changed).append(dest)
+    return owned, changed
+
+def cleanup_mods(game_path, dry_run=False, verbose=False, scan=False):
+    """
+    Remove deployed files from game directory.
+
+    With a deploy manifest for this game directory (and the journal of an
+    interrupted deployment, merged into it), its files are removed,
+    the game files it replaced are restored from the backup store and the
+    directories deployments created are pruned once empty; without
+    one (or with scan) every symlink in the game root and BepInEx is
+    removed as well. The plugins.previous and plugins.shadow trees of
+    --shadow deployments are removed too.
+    """
     print("="*80)
     print("VORTEX MOD CLEANUP SCRIPT")
     print("="*80)
@@ -47,73 +82,157 @@ def cleanup_mods(game_path, dry_run=False, verbose=False):
         print("DRY RUN MODE - No changes will be made")
         print()
     
-    # Find symlinks in game root
-    print("Scanning for symlinks in game root...")
-    root_symlinks = []
-    for item in os.listdir(game_path):
-        item_path = os.path.join(game_path, item)
-        if os.path.islink(item_path):
-            root_symlinks.append(item_path)
-    
-    print(f"Found {len(root_symlinks)} symlinks in game root")
-    
-    # Find symlinks in BepInEx directory
-    bepinex_dir = os.path.join(game_path, 'BepInEx')
-    bepinex_symlinks = []
-    
-    if os.path.exists(bepinex_dir):
-        print("Scanning for symlinks in BepInEx directory...")
-        bepinex_symlinks = find_symlinks(bepinex_dir, recursive=True)
-        print(f"Found {len(bepinex_symlinks)} symlinks in BepInEx directory")
+    run = run_history.current()
+    manifest = deploy_manifest.load_manifest()
+    if manifest is not None and os.path.realpath(manifest['game_path']) != os.path.realpath(game_path):
+        print(f"Deploy manifest is for another game directory ({manifest['game_path']}), ignoring it")
+        manifest = None
+
+    # What an interrupted deployment placed is not in the manifest yet
+    interrupted = deploy_journal.load_journal()
+    if interrupted is not None and os.path.realpath(interrupted['game_path'] or '') == os.path.realpath(game_path):
+        print("Including the files of an interrupted deployment (deploy journal)")
+        manifest = manifest or deploy_manifest.new_manifest(None, game_path, None, None)
+        manifest['entries'].update(interrupted['entries'])
+        manifest['dirs'] = manifest.get('dirs', []) + interrupted['dirs']
+        manifest['backups'] = {**manifest.get('backups', {}), **interrupted['backups']}
+
+    all_files = []
+    methods = {}
+    if manifest is not None:
+        print("Checking files recorded in the deploy manifest...")
+        with run.phase('scan'):
+            all_files, changed = find_deployed_files(manifest)
+        methods = {dest: deploy_manifest.entry_method(entry) for dest, entry in manifest['entries'].items()}
+        print(f"Found {len(all_files)} deployed files")
+        if changed:
+            print(f"Keeping {len(changed)} files that were replaced since the deployment")
+            if verbose:
+                for path in changed:
+                    print(f"  = {os.path.relpath(path, game_path)}")
     
-    all_symlinks = root_symlinks + bepinex_symlinks
+    if manifest is None or scan:
+        # Find symlinks in game root
+        print("Scanning for symlinks in game root...")
+        with run.phase('scan'):
+            root_symlinks = find_symlinks(game_path, recursive=False)
+        
+        print(f"Found {len(root_symlinks)} symlinks in game root")
+        
+        # Find symlinks in BepInEx directory
+        bepinex_dir = os.path.join(game_path, 'BepInEx')
+        bepinex_symlinks = []
+        
+        if os.path.exists(bepinex_dir):
+            print("Scanning for symlinks in BepInEx directory...")
+            with run.phase('scan'):
+                bepinex_symlinks = find_symlinks(bepinex_dir, recursive=True)
+            print(f"Found {len(bepinex_symlinks)} symlinks in BepInEx directory")
+        
+        known = set(all_files)
+        all_files += [path for path in root_symlinks + bepinex_symlinks if path not in known]
+    run.set(links=len(all_files))
     
-    if not all_symlinks:
+    created_dirs = manifest.get('dirs', []) if manifest is not None else []
+    backups = manifest.get('backups', {}) if manifest is not None else {}
+    # Replaced (or never swapped in) plugin trees of --shadow deployments
+    side_trees = shadow_tree.side_trees(shadow_tree.plugins_dir(game_path))
+    if not all_files and not backups and not side_trees:
         print()
-        print("No symlinks found. Nothing to clean up.")
+        print("No deployed files found. Nothing to clean up.")
+        if manifest is not None and not dry_run:
+            fs_batch.prune_dirs(created_dirs)
+            deploy_manifest.remove_manifest()
+            deploy_journal.remove_journal()
         return True
     
     print()
-    print(f"Total symlinks to remove: {len(all_symlinks)}")
+    print(f"Total files to remove: {len(all_files)}")
+    if side_trees:
+        print(f"Plugin trees of shadow deployments to remove: {len(side_trees)}")
     print()
     
     if verbose or dry_run:
-        print("Symlinks to be removed:")
-        for symlink in all_symlinks:
-            target = os.readlink(symlink) if os.path.islink(symlink) else "?"
-            rel_path = os.path.relpath(symlink, game_path)
+        print("Files to be removed:")
+        for path in all_files:
+            rel_path = os.path.relpath(path, game_path)
+            method = methods.get(path, fs_batch.SYMLINK)
+            if method != fs_batch.SYMLINK:
+                print(f"  {rel_path} ({method})")
+                continue
+            try:
+                target = os.readlink(path)
+            except OSError:
+                target = "?"
             print(f"  {rel_path} -> {target}")
         print()
+        if backups:
+            print("Game files to be restored:")
+            for path in backups:
+                print(f"  {os.path.relpath(path, game_path)}")
+            print()
+        if side_trees:
+            print("Plugin trees to be removed:")
+            for path in side_trees:
+                print(f"  {os.path.relpath(path, game_path)}/")
+            print()
     
     if not dry_run:
-        print("Removing symlinks...")
-        removed_count = 0
-        failed_count = 0
+        print("Removing deployed files...")
+        # Unlink relative to each directory instead of per absolute path
+        with run.phase('remove'):
+            removed, failed = fs_batch.unlink_paths(all_files)
+            # Only the replaced files, before their directories could be pruned
+            restored, not_restored = game_backups.restore_all(backups)
+            for path in side_trees:
+                shutil.rmtree(path)
+            # Children before parents, so nested empty directories all go
+            pruned = fs_batch.prune_dirs(created_dirs)
+        removed_count = len(removed)
+        failed_count = len(failed)
         
-        for symlink in all_symlinks:
-            try:
-                os.remove(symlink)
-                removed_count += 1
-                if verbose:
-                    print(f"  ✓ Removed: {os.path.relpath(symlink, game_path)}")
-            except Exception as e:
-                failed_count += 1
-                print(f"  ✗ Failed to remove {symlink}: {e}")
+        if verbose:
+            for path in removed + pruned:
+                print(f"  ✓ Removed: {os.path.relpath(path, game_path)}")
+            for path in side_trees:
+                print(f"  ✓ Removed: {os.path.relpath(path, game_path)}/")
+            for path in restored:
+                print(f"  ✓ Restored: {os.path.relpath(path, game_path)}")
+            for path in not_restored:
+                print(f"  = Not restored (another file is there now): {os.path.relpath(path, game_path)}")
+        for path, e in failed:
+            print(f"  ✗ Failed to remove {path}: {e}")
         
         print()
         print("="*80)
         print("CLEANUP COMPLETE")
         print("="*80)
-        print(f"Symlinks removed: {removed_count}")
+        print(f"Files removed: {removed_count}")
+        if pruned:
+            print(f"Empty directories removed: {len(pruned)}")
+        if side_trees:
+            print(f"Shadow deployment plugin trees removed: {len(side_trees)}")
+        if backups:
+            print(f"Original game files restored: {len(restored)} of {len(backups)}")
         if failed_count > 0:
             print(f"Failed: {failed_count}")
+        else:
+            # Nothing recorded in the manifest (or journal) is deployed anymore
+            deploy_manifest.remove_manifest()
+            deploy_journal.remove_journal()
     else:
         print("="*80)
         print("CLEANUP PREVIEW")
         print("="*80)
-        print(f"Symlinks would be removed: {len(all_symlinks)}")
+        print(f"Files would be removed: {len(all_files)}")
+        if created_dirs:
+            print(f"Directories created by the deployment, removed if empty: {len(created_dirs)}")
+        if backups:
+            print(f"Original game files would be restored: {len(backups)}")
+        if side_trees:
+            print(f"Shadow deployment plugin trees would be removed: {len(side_trees)}")
         print()
-        print("Run without --dry-run to actually remove the symlinks")
+        print("Run without --dry-run to actually remove them")
     
     return True
 
@@ -136,6 +255,9 @@ Examples:
   
   # Use custom game path
   python3 cleanup_mods.py --game-path /path/to/game/
+
+  # Also remove symlinks the deploy manifest doesn't know about
+  python3 cleanup_mods.py --scan
         """
     )
     parser.add_argument('--game-path',
@@ -145,6 +267,8 @@ Examples:
                        help='Preview changes without making them')
     parser.add_argument('--verbose', '-v', action='store_true',
                        help='Show detailed output')
+    parser.add_argument('--scan', action='store_true',
+                       help='Also remove every symlink in the game root and BepInEx, not only the manifest\'s files')
 
     args = parser.parse_args()
 
@@ -156,6 +280,12 @@ Examples:
             print(f"ERROR: {e}")
             sys.exit(1)
 
-    success = cleanup_mods(args.game_path, args.dry_run, args.verbose)
+    run = run_history.start('cleanup-preview' if args.dry_run else 'cleanup')
+    if args.dry_run:
+        success = cleanup_mods(args.game_path, args.dry_run, args.verbose, args.scan)
+    else:
+        with config.tool_lock('cleanup'):
+            success = cleanup_mods(args.game_path, args.dry_run, args.verbose, args.scan)
+    run.finish(success)
     sys.exit(0 if success else 1)
 
@@ -2,83 +2,25 @@
 """
 Compare what find_enabled_mods.py and deploy_mods.py see
 """
-import plyvel
-import json
+import os
+import classify_mods
 import config
+import vortex_keys
+from deploy_mods import win_to_linux
+from mod_model import ModType
 
-def compare_mods():
-    db_path = config.get_safe_db_path()
-    db = plyvel.DB(db_path, create_if_missing=False)
-    
-    active_profile_id = None
-    mod_enabled_status = {}
-    enabled_mods_with_time = {}
-    mods_info = {}
-    
-    # Scan database
-    for key, value in db:
-        key_str = key.decode('utf-8', errors='ignore')
-        
-        # Find active profile
-        if key_str == 'settings###profiles###lastActiveProfile###subnautica':
-            try:
-                active_profile_id = json.loads(value.decode('utf-8'))
-            except:
-                pass
-        
-        # Find enabled status (true/false flag)
-        if '###modState###' in key_str and key_str.endswith('###enabled'):
-            parts = key_str.split('###')
-            if len(parts) >= 5:
-                profile_id = parts[2]
-                mod_id = parts[4]
-                try:
-                    is_enabled = value.decode('utf-8') == 'true'
-                    if profile_id not in mod_enabled_status:
-                        mod_enabled_status[profile_id] = {}
-                    mod_enabled_status[profile_id][mod_id] = is_enabled
-                except:
-                    pass
-        
-        # Find enabled mods with enabledTime
-        if '###modState###' in key_str and key_str.endswith('###enabledTime'):
-            parts = key_str.split('###')
-            if len(parts) >= 5:
-                profile_id = parts[2]
-                mod_id = parts[4]
-                try:
-                    enabled_time = value.decode('utf-8')
-                    if profile_id not in enabled_mods_with_time:
-                        enabled_mods_with_time[profile_id] = {}
-                    enabled_mods_with_time[profile_id][mod_id] = enabled_time
-                except:
-                    pass
-        
-        # Collect mod information
-        if key_str.startswith('persistent###mods###subnautica###'):
-            parts = key_str.split('###')
-            if len(parts) >= 4:
-                mod_id = parts[3]
-                if mod_id not in mods_info:
-                    mods_info[mod_id] = {'id': mod_id}
-                
-                if len(parts) == 5:
-                    field = parts[4]
-                    try:
-                        value_str = value.decode('utf-8')
-                        if field in ['installationPath', 'type', 'state']:
-                            mods_info[mod_id][field] = json.loads(value_str)
-                    except:
-                        pass
-                
-                # Get name from attributes
-                if len(parts) >= 6 and parts[4] == 'attributes' and parts[5] == 'name':
-                    try:
-                        mods_info[mod_id]['name'] = json.loads(value.decode('utf-8'))
-                    except:
-                        pass
+DEPLOY_TYPES = (ModType.BEPINEX_5, ModType.BEPINEX_PLUGIN)
+
+def compare_mods(game=config.DEFAULT_GAME):
+    # The copy replaces the local database another command may be reading
+    with config.tool_lock('compare_mods'):
+        db_path = config.get_safe_db_path()
+        state = vortex_keys.load_state(db_path, game)
+    if state is None:
+        return
     
-    db.close()
+    active_profile_id = state['active_profile_id']
+    library = state['library']
     
     if not active_profile_id:
         print("ERROR: Could not find active profile")
@@ -87,8 +29,9 @@ def compare_mods():
     print(f"Active Profile: {active_profile_id}\n")
     
     # Get enabled mods from both methods
-    enabled_by_flag = set(mod_id for mod_id, enabled in mod_enabled_status.get(active_profile_id, {}).items() if enabled)
-    enabled_by_time = set(enabled_mods_with_time.get(active_profile_id, {}).keys())
+    enabled_by_flag = set(record.id for record in library.enabled_records(active_profile_id))
+    enabled_by_time = set(record.id for record in library
+                          if library.enabled_time(active_profile_id, record.id) is not None)
     
     print(f"Mods with enabled=true flag: {len(enabled_by_flag)}")
     print(f"Mods with enabledTime: {len(enabled_by_time)}")
@@ -104,17 +47,45 @@ def compare_mods():
     print(f"Mods ONLY with enabledTime: {len(only_time)}")
     print()
     
-    # Check types for deploy_mods filtering
+    # Check types for deploy_mods filtering, untyped mods by their staging tree
+    staging_path = win_to_linux(state['staging_path'])
+    classifier = classify_mods.TypeCache()
     deployable_mods = []
+    inferred = {}
+    reasons = {}
     for mod_id in both:
-        mod_info = mods_info.get(mod_id, {})
-        mod_type = mod_info.get('type', 'unknown')
-        if mod_type in ['bepinex-5', 'bepinex-plugin']:
+        record = library.get(mod_id)
+        if record.mod_type in DEPLOY_TYPES:
             deployable_mods.append(mod_id)
+        elif record.mod_type is ModType.COLLECTION:
+            reasons[mod_id] = 'Collections are not deployed'
+        elif not classify_mods.needs_inference(record):
+            reasons[mod_id] = f"Type '{record.type_name}' is deployed by its own installer"
+        elif not record.installation_path or not staging_path:
+            reasons[mod_id] = 'No installation path'
+        else:
+            mod_type, reason = classifier.classify(mod_id, os.path.join(staging_path, record.installation_path))
+            if mod_type is not None:
+                deployable_mods.append(mod_id)
+                inferred[mod_id] = (mod_type, reason)
+            else:
+                reasons[mod_id] = f"Not bepinex-5 or bepinex-plugin, {reason}"
+    classifier.save()
     
     print(f"Mods that deploy_mods.py would deploy (bepinex-5 or bepinex-plugin): {len(deployable_mods)}")
+    print(f"  of which untyped, classified by their staging tree: {len(inferred)}")
     print()
     
+    if inferred:
+        print("Mods deployed by inferred type:")
+        print()
+        for mod_id in sorted(inferred):
+            record = library.get(mod_id)
+            mod_type, reason = inferred[mod_id]
+            print(f"  - {record.display_name}")
+            print(f"    Type: {record.type_name} -> {mod_type.value} ({reason})")
+            print()
+    
     # Show mods that find_enabled_mods sees but deploy_mods doesn't
     find_enabled_sees = both  # find_enabled_mods uses both flags
     deploy_sees = set(deployable_mods)
@@ -125,12 +96,12 @@ def compare_mods():
         print(f"Mods that find_enabled_mods.py shows but deploy_mods.py skips: {len(missing_from_deploy)}")
         print()
         for mod_id in sorted(missing_from_deploy):
-            mod_info = mods_info.get(mod_id, {})
-            mod_name = mod_info.get('name', mod_id)
-            mod_type = mod_info.get('type', 'unknown')
+            record = library.get(mod_id)
+            mod_name = record.display_name
+            mod_type = record.type_name
             print(f"  - {mod_name}")
             print(f"    Type: {mod_type}")
-            print(f"    Reason: {'Not bepinex-5 or bepinex-plugin' if mod_type not in ['bepinex-5', 'bepinex-plugin'] else 'Unknown'}")
+            print(f"    Reason: {reasons.get(mod_id, 'Unknown')}")
             print()
 
 if __name__ == "__main__":
@@ -2,59 +2,188 @@
 """
 Configuration file for Vortex Mod Fixer
 """
+import contextlib
 import os
 import shutil
+import sys
 from pathlib import Path
+import steam_discovery
 
-# Vortex state database path
+# Steam app id of Subnautica; Vortex is installed into its Proton prefix
+STEAM_APP_ID = "264710"
+
+# Game and Vortex prefix found in all Steam libraries (see steam_discovery.py),
+# revalidated with a few stat calls on every start
+STEAM_DISCOVERY_CACHE = "steam_discovery.json"
+_discovered = steam_discovery.discover(STEAM_APP_ID, STEAM_DISCOVERY_CACHE)
+
+# Vortex user data directory ({USERDATA} in Vortex settings)
 # This is where Vortex stores its LevelDB database when running under Proton/Wine
-VORTEX_STATE_DB = os.path.expanduser(
-    "~/.steam/steam/steamapps/compatdata/264710/pfx/drive_c/users/steamuser/AppData/Roaming/Vortex/state.v2"
+VORTEX_USERDATA = _discovered['vortex_dir'] or os.path.expanduser(
+    "~/.steam/steam/steamapps/compatdata/264710/pfx/drive_c/users/steamuser/AppData/Roaming/Vortex"
 )
 
+# Vortex state database path
+VORTEX_STATE_DB = os.path.join(VORTEX_USERDATA, "state.v2")
+
 # Vortex lockfile path
-VORTEX_LOCKFILE = os.path.expanduser(
-    "~/.steam/steam/steamapps/compatdata/264710/pfx/drive_c/users/steamuser/AppData/Roaming/Vortex/lockfile"
-)
+VORTEX_LOCKFILE = os.path.join(VORTEX_USERDATA, "lockfile")
 
 # Local copy of state.v2 database (used when Vortex is not running)
 LOCAL_STATE_COPY = "state.v2.local"
 
-# Subnautica game directory
-SUBNAUTICA_GAME_PATH = os.path.expanduser(
+# Subnautica game directory (get_game_path() falls back to the one Vortex recorded)
+SUBNAUTICA_GAME_PATH = _discovered['game_path'] or os.path.expanduser(
     "~/.steam/steam/steamapps/common/Subnautica"
 )
 
 # Default game name
 DEFAULT_GAME = "subnautica"
 
+# Record of the links created by the last deployment (used by verify/cleanup)
+DEPLOY_MANIFEST = "deploy_manifest.json"
+
+# How each mod type's files are placed in the game: symlink, hardlink, reflink or copy
+# (hardlink falls back to reflink and reflink to copy when the filesystem can't do it)
+DEPLOY_METHODS = {'bepinex-5': 'symlink', 'bepinex-plugin': 'symlink'}
+
+# Game files replaced by deployments, stored by content hash (see game_backups.py)
+GAME_BACKUP_DIR = "game_backups"
+
+# Journal of the running deployment, lets an interrupted one resume (see deploy_journal.py)
+DEPLOY_JOURNAL = "deploy_journal.jsonl"
+
+# flock()ed while a command changes the game directory or the Vortex database
+TOOL_LOCK = "vortexfixer.lock"
+
+# What the last deployment was made from, for the pre-launch check (see deploy_status.py)
+DEPLOY_STATUS = "deploy_status.json"
+
+# Cached staging directory listings (validated by directory inode and mtime)
+STAGING_CACHE = "staging_cache.json"
+
+# Deploy types inferred from the staging tree of untyped mods (see classify_mods.py)
+MOD_TYPE_CACHE = "mod_types.json"
+
+# Parsed Vortex mod rules and the load order computed from them (see load_order.py)
+LOAD_ORDER_CACHE = "load_order.json"
+
+# Indexed SQLite export of the state (see export_sqlite.py)
+SQLITE_EXPORT = "vortex_state.sqlite"
+
+# Query daemon (see vortex_daemon.py): socket and its private database copy
+DAEMON_SOCKET = os.path.join(os.environ.get('XDG_RUNTIME_DIR') or '/tmp', f"vortex-fixer-{os.getuid()}.sock")
+DAEMON_STATE_COPY = "state.v2.daemon"
+
+# Timings and sizes of every deploy, cleanup and scan (see run_history.py)
+RUN_HISTORY = "run_history.jsonl"
+
+# Worker processes for full-database scans (see sharded_scan.py), None = all CPUs
+SCAN_JOBS = None
+
+# Deduplicated history of state.v2 (see snapshots.py)
+SNAPSHOT_DIR = "state_snapshots"
+# Snapshot the fresh local copy a deploy works from (costs a few stat calls if nothing changed)
+SNAPSHOT_ON_COPY = True
+# Retention: keep the newest N snapshots plus everything younger than N days
+SNAPSHOT_KEEP = 20
+SNAPSHOT_KEEP_DAYS = 30
+
 def is_vortex_running():
     """Check if Vortex is currently running by checking for lockfile"""
     return os.path.exists(VORTEX_LOCKFILE)
 
-def copy_database_to_local():
-    """Copy the Vortex state.v2 database to a local directory"""
+@contextlib.contextmanager
+def tool_lock(command):
+    """
+    Serialize our own commands that change the game directory, the deploy
+    manifest or the Vortex database (deploy, cleanup, repair, edit, restore),
+    and those that replace LOCAL_STATE_COPY while another may be reading it.
+
+    Holds an exclusive flock() on TOOL_LOCK, so a second command (e.g. the
+    launcher while a deploy runs in a terminal) waits for the first one.
+    The kernel releases the lock when the process dies, so a crashed run
+    never leaves a stale lock behind.
+    """
+    import fcntl
+    fd = os.open(TOOL_LOCK, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            holder = os.pread(fd, 256, 0).decode(errors='replace').strip()
+            print(f"Waiting for another command to finish ({holder or 'unknown'})...", file=sys.stderr)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        # Who holds the lock, for the message above
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, f"{command}, pid {os.getpid()}\n".encode(), 0)
+        yield
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+def db_fingerprint(db_path):
+    """
+    Cheap fingerprint of a LevelDB directory's contents.
+
+    Every write goes to the log and every compaction rewrites the MANIFEST
+    that CURRENT names, so their names, sizes and mtimes change whenever
+    the data does. copytree() preserves mtimes, so a fresh local copy of an
+    unchanged database has the same fingerprint as the previous one. Opening
+    a directory with LevelDB may rewrite its log, so take the fingerprint
+    before opening it.
+    """
+    import hashlib
+    hasher = hashlib.sha1()
+    with open(os.path.join(db_path, 'CURRENT'), 'rb') as f:
+        current = f.read().strip()
+    hasher.update(current)
+    for name in sorted(os.listdir(db_path)):
+        if name == current.decode() or name.endswith('.log'):
+            st = os.stat(os.path.join(db_path, name))
+            hasher.update(f"{name}:{st.st_size}:{st.st_mtime_ns}".encode())
+    return hasher.hexdigest()
+
+def copy_database_to_local(target=None, snapshot=False):
+    """
+    Copy the Vortex state.v2 database to a local directory (default: LOCAL_STATE_COPY).
+
+    With snapshot (and SNAPSHOT_ON_COPY), the copy is also recorded in the
+    snapshot store; only commands that change the game or the database ask
+    for that, not read-only scripts or the daemon's refreshes.
+    """
+    target = target or LOCAL_STATE_COPY
     if not os.path.exists(VORTEX_STATE_DB):
         raise FileNotFoundError(f"Vortex database not found at: {VORTEX_STATE_DB}")
 
-    print(f"Copying database from {VORTEX_STATE_DB} to {LOCAL_STATE_COPY}...")
+    print(f"Copying database from {VORTEX_STATE_DB} to {target}...")
 
     # Remove old local copy if it exists
-    if os.path.exists(LOCAL_STATE_COPY):
-        shutil.rmtree(LOCAL_STATE_COPY)
+    if os.path.exists(target):
+        shutil.rmtree(target)
 
     # Copy the entire state.v2 directory
-    shutil.copytree(VORTEX_STATE_DB, LOCAL_STATE_COPY)
-    print(f"✓ Database copied to {LOCAL_STATE_COPY}")
+    shutil.copytree(VORTEX_STATE_DB, target)
+    print(f"✓ Database copied to {target}")
 
-    return LOCAL_STATE_COPY
+    if snapshot and SNAPSHOT_ON_COPY:
+        # Snapshot the copy before anything opens it
+        import snapshots
+        try:
+            snapshots.take_snapshot(target)
+            snapshots.prune_snapshots(quiet=True)
+        except OSError as e:
+            print(f"Warning: Could not snapshot database: {e}")
 
-def get_safe_db_path():
+    return target
+
+def get_safe_db_path(snapshot=False):
     """
     Get a safe database path to use.
 
     If Vortex is running (lockfile exists), abort to prevent corruption.
-    If Vortex is not running, create a fresh local copy and use that.
+    If Vortex is not running, create a fresh local copy and use that
+    (snapshotted with snapshot, see copy_database_to_local()).
     """
     if is_vortex_running():
         raise RuntimeError(
@@ -67,7 +196,7 @@ def get_safe_db_path():
     print("✓ Vortex is not running (no lockfile detected)")
 
     # Always create a fresh local copy
-    return copy_database_to_local()
+    return copy_database_to_local(snapshot=snapshot)
 
 def get_db_path():
     """
@@ -88,14 +217,37 @@ def get_db_path():
             f"  or local state/ directory"
         )
 
+def recorded_game_path(game=DEFAULT_GAME, db_path=None):
+    """
+    The game path Vortex recorded in its database, from the local copy
+    (default: LOCAL_STATE_COPY). None if there is no copy or no path.
+    """
+    db_path = db_path or LOCAL_STATE_COPY
+    if not os.path.isdir(db_path):
+        return None
+    import plyvel
+    import vortex_keys
+    from deploy_mods import win_to_linux
+    try:
+        db = plyvel.DB(db_path, create_if_missing=False)
+    except Exception:
+        return None
+    try:
+        return win_to_linux(vortex_keys.get(db, 'game_path', game))
+    finally:
+        db.close()
+
 def get_game_path():
-    """Get the Subnautica game path"""
+    """Get the Subnautica game path (Steam libraries first, then the one in Vortex's database)"""
     if os.path.exists(SUBNAUTICA_GAME_PATH):
         return SUBNAUTICA_GAME_PATH
-    else:
-        raise FileNotFoundError(
-            f"Could not find Subnautica at: {SUBNAUTICA_GAME_PATH}"
-        )
+    recorded = recorded_game_path()
+    if recorded and os.path.exists(recorded):
+        return recorded
+    raise FileNotFoundError(
+        f"Could not find Subnautica at: {SUBNAUTICA_GAME_PATH}"
+        + (f" or {recorded} (recorded by Vortex)" if recorded else "")
+    )
 
 if __name__ == "__main__":
     print("Vortex Mod Fixer Configuration")
@@ -107,6 +259,8 @@ if __name__ == "__main__":
     print(f"  Exists: {os.path.exists(VORTEX_LOCKFILE)}")
     print(f"  Vortex Running: {is_vortex_running()}")
     print()
+    print(f"Steam libraries: {', '.join(_discovered['libraries']) or 'none found'}")
+    print()
     print(f"Subnautica Game: {SUBNAUTICA_GAME_PATH}")
     print(f"  Exists: {os.path.exists(SUBNAUTICA_GAME_PATH)}")
     print()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Write-ahead journal of a running deployment.
+
+deploy_mods.py only writes the deploy manifest at the end. If it is
+interrupted halfway through thousands of links, the journal tells the
+next run what was already done:
+
+  {"op": "start", ...}                           a deployment started (or resumed)
+  {"op": "plan", "mod": id, "links": [...],      before a mod's links are placed
+   "winning": [...]}                             (all of them, and those it wins)
+  {"op": "backup", "dest": path, "record": ...}  before a game file is replaced
+  {"op": "done", "mod": id, "entries": ...}      after a mod's links are placed
+
+Plans are flushed before the links are placed, so a killed process
+leaves them behind; the journal is fsync()ed at checkpoints (at most
+every CHECKPOINT_INTERVAL seconds, and before every game file that is
+replaced) against power loss. A rerun skips every mod whose links are
+done and still planned the same way, and the journal is removed once the
+manifest is written. Which links a mod wins depends on the order the
+plans arrive in, so a rerun compares all of them and then checks the
+files it would skip are still the mod's own.
+"""
+import json
+import os
+import time
+import config
+
+# Seconds between fsync() checkpoints of completed batches
+CHECKPOINT_INTERVAL = 1.0
+
+def load_journal(path=None):
+    """
+    Fold the journal of an interrupted deployment into what it did.
+
+    Returns None if there is none, otherwise a dict with the game path,
+    'entries' (dest -> manifest entry, for started batches without an
+    inode and with the entry they would replace as 'previous'), 'dirs', 'backups' and 'done' (mod id -> the done record and
+    the plan it completed). A torn last line is ignored.
+    """
+    path = path or config.DEPLOY_JOURNAL
+    try:
+        with open(path) as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return None
+
+    state = {'game_path': None, 'entries': {}, 'dirs': [], 'backups': {}, 'done': {}}
+    plans = {}
+    shadow = False
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        op = record.get('op')
+        if op == 'start':
+            state['game_path'] = record['game_path']
+            shadow = record.get('shadow', False)
+        elif op == 'plan':
+            plans[record['mod']] = record
+            state['done'].pop(record['mod'], None)
+            # Possibly placed: owned only while they still match their staging file
+            for src, dest in record.get('winning', record['links']):
+                entry = {'src': src, 'mod': record['mod']}
+                if record['method'] != 'symlink':
+                    entry['method'] = record['method']
+                # The plan may not have got to this file yet
+                if dest in state['entries']:
+                    entry['previous'] = state['entries'][dest]
+                state['entries'][dest] = entry
+        elif op == 'backup':
+            state['backups'][record['dest']] = record['record']
+        elif op == 'done':
+            state['entries'].update(record['entries'])
+            state['dirs'].extend(record['dirs'])
+            plan = plans.get(record['mod'])
+            # Links built in a shadow tree that was never swapped in can't be reused
+            if plan is not None and not shadow:
+                state['done'][record['mod']] = {'method': plan['method'], 'links': plan['links'],
+                                                'entries': record['entries'], 'dirs': record['dirs']}
+            else:
+                state['done'].pop(record['mod'], None)
+    return state
+
+def remove_journal(path=None):
+    """Forget the journal (after the manifest was written)"""
+    path = path or config.DEPLOY_JOURNAL
+    if os.path.exists(path):
+        os.remove(path)
+
+class Journal:
+    """Appends the records of one deployment run"""
+
+    def __init__(self, path=None):
+        self.path = path or config.DEPLOY_JOURNAL
+        self.file = None
+        self.last_checkpoint = time.monotonic()
+
+    def start(self, game_path, profile_id, shadow=False, resume=False):
+        """Open the journal; without resume an old one is discarded"""
+        self.file = open(self.path, 'a' if resume else 'w')
+        self._write({'op': 'start', 'game_path': game_path, 'profile_id': profile_id, 'shadow': shadow,
+                     'started': time.strftime('%Y-%m-%dT%H:%M:%S')}, sync=True)
+
+    def plan(self, mod_id, method, links, winning):
+        self._write({'op': 'plan', 'mod': mod_id, 'method': method, 'links': [list(link) for link in links],
+                     'winning': [list(link) for link in winning]})
+
+    def backup(self, dest, record):
+        # The game file is about to be unlinked: its record must survive a crash
+        self._write({'op': 'backup', 'dest': dest, 'record': record}, sync=True)
+
+    def done(self, mod_id, entries, dirs):
+        self._write({'op': 'done', 'mod': mod_id, 'entries': entries, 'dirs': dirs},
+                    sync=time.monotonic() - self.last_checkpoint >= CHECKPOINT_INTERVAL)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _write(self, record, sync=False):
+        if self.file is None:
+            return
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+            self.last_checkpoint = time.monotonic()
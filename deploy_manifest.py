@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Read and write the deployment manifest.
+
+The manifest records every link created by deploy_mods.py so that other
+tools can check or undo a deployment without scanning the database again.
+"""
+import hashlib
+import json
+import os
+import stat
+import time
+import config
+import fs_batch
+
+MANIFEST_VERSION = 1
+
+def new_manifest(game, game_path, staging_path, profile_id):
+    """Create an empty manifest for a deployment"""
+    return {
+        'version': MANIFEST_VERSION,
+        'game': game,
+        'game_path': game_path,
+        'staging_path': staging_path,
+        'profile_id': profile_id,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        # dest path -> {'src': staging file, 'mod': mod id}, plus 'method' and
+        # 'inode' for files that are not symlinks (hardlinks, reflinks, copies)
+        'entries': {},
+        # Directories created by deployments, pruned again once empty
+        'dirs': [],
+        # Game files the deployment replaced: dest path -> game_backups record
+        'backups': {},
+    }
+
+def load_manifest(path=None):
+    """Load the manifest, returns None if no deployment has been recorded"""
+    path = path or config.DEPLOY_MANIFEST
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read deploy manifest {path}: {e}")
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        print(f"Warning: Ignoring deploy manifest with unknown version: {path}")
+        return None
+    return manifest
+
+def save_manifest(manifest, path=None):
+    """Write the manifest atomically (temp file + rename)"""
+    path = path or config.DEPLOY_MANIFEST
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def remove_manifest(path=None):
+    """Forget the recorded deployment (after a full cleanup)"""
+    path = path or config.DEPLOY_MANIFEST
+    if os.path.exists(path):
+        os.remove(path)
+
+def manifest_hash(path=None):
+    """SHA-1 of the manifest file, None if there is none"""
+    path = path or config.DEPLOY_MANIFEST
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+def enabled_set_hash(profile_id, records, order_digest=''):
+    """
+    Hash of what a deployment is made from: the profile, the id, type and
+    installation path of every enabled, deployable mod, and the load order
+    its rules produce (load_order.LoadOrder.digest(), decides conflicts).
+    """
+    hasher = hashlib.sha1(str(profile_id).encode())
+    for mod_id, mod_type, installation_path in sorted(
+            (record.id, record.type_name, record.installation_path or '') for record in records):
+        hasher.update(f"\0{mod_id}\0{mod_type}\0{installation_path}".encode())
+    hasher.update(f"\0load_order\0{order_digest}".encode())
+    return hasher.hexdigest()
+
+def entry_method(entry):
+    """How an entry was placed (entries without a method are symlinks)"""
+    return entry.get('method', fs_batch.SYMLINK)
+
+def is_owned(entry, st):
+    """
+    Whether the file at an entry's dest (its lstat result) is still the one
+    the deployment placed there.
+
+    Symlinks are recognised as such; hardlinks and copies by the inode
+    recorded when they were created. Entries from a plan have no inode:
+    then only a file matching its staging file's size and mtime counts,
+    or the file of the entry the plan would have replaced ('previous').
+    """
+    if 'previous' in entry and is_owned(entry['previous'], st):
+        return True
+    if entry_method(entry) == fs_batch.SYMLINK:
+        return stat.S_ISLNK(st.st_mode)
+    if not stat.S_ISREG(st.st_mode):
+        return False
+    if 'inode' in entry:
+        return st.st_ino == entry['inode']
+    try:
+        src_st = os.stat(entry['src'])
+    except OSError:
+        return False
+    return (st.st_size, st.st_mtime_ns) == (src_st.st_size, src_st.st_mtime_ns)
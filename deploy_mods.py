@@ -1,160 +1,478 @@
 #!/usr/bin/env python3
 """
-Deploy Subnautica mods by symlinking from staging to game directory.
+Deploy Subnautica mods by symlinking (or hardlinking, reflinking or
+copying) from staging to game directory.
 Fixes Vortex's broken mod installer on Linux.
 """
 import plyvel
-import json
 import os
 import sys
 import shutil
+import stat
+from collections import Counter
 from pathlib import Path
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import classify_mods
 import config
+import deploy_journal
+import deploy_manifest
+import deploy_status
+import fs_batch
+import game_backups
+import load_order
+import mod_model
+import run_history
+import shadow_tree
+import staging_cache
+import vortex_keys
+from mod_model import ModType
+
+# Number of staging directories walked concurrently
+DEFAULT_JOBS = 8
 
 def win_to_linux(win_path):
-    r"""Convert Windows path (Z:\...) to Linux path"""
+    r"""
+    Convert a Windows path from the Vortex database or settings to a Linux path.
+
+    Z:\ is the Linux root, other drive letters live in the Wine prefix as
+    drive_<letter>, and {USERDATA} is Vortex's AppData directory.
+    """
     if not win_path:
         return None
-    if win_path.startswith('Z:\\'):
-        # Remove Z:\ and convert backslashes to forward slashes
-        linux_path = win_path[3:].replace('\\', '/')
-        return '/' + linux_path
+    win_path = win_path.replace('{USERDATA}', config.VORTEX_USERDATA)
+    if len(win_path) >= 3 and win_path[1:3] == ':\\':
+        drive = win_path[0].lower()
+        # Remove the drive and convert backslashes to forward slashes
+        rest = win_path[3:].replace('\\', '/')
+        if drive == 'z':
+            return '/' + rest
+        # .../pfx/drive_c/users/steamuser/AppData/Roaming/Vortex -> .../pfx
+        prefix = config.VORTEX_USERDATA
+        marker = os.sep + 'drive_'
+        if marker in prefix:
+            prefix = prefix[:prefix.index(marker)]
+        return os.path.join(prefix, f'drive_{drive}', rest)
     return win_path.replace('\\', '/')
 
-def get_mod_data(db_path='state/', game='subnautica'):
-    """Extract mod data from Vortex database"""
+class ModStream:
+    """
+    Iterator over the records of open_mod_stream().
+
+    close() releases the database even if iteration never started (closing
+    a generator that never ran doesn't run its finally block). keys counts
+    the database keys read so far, for the run history.
+    """
+
+    def __init__(self, db, records, keys=0):
+        self.db = db
+        self.records = records
+        self.keys = keys
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.records)
+
+    def close(self):
+        self.records.close()
+        self.db.close()
+
+def open_mod_stream(db_path='state/', game='subnautica'):
+    """
+    Open the database and stream mod records as soon as each one is complete.
+
+    Returns (data, mods) where data holds the active profile, the game/staging
+    paths and a mod_model.ModLibrary with the profile's enabled status, and
+    mods is a ModStream of mod_model.ModRecord. LevelDB iterates keys in sorted order, so all keys of
+    one mod are adjacent: a record is complete as soon as the next mod id
+    appears. Returns (None, None) on error. The database is closed when the
+    stream is exhausted or closed.
+    """
     try:
         db = plyvel.DB(db_path, create_if_missing=False)
     except Exception as e:
         print(f"ERROR: Could not open database: {e}")
-        return None
-    
-    # Collect data
-    active_profile_id = None
-    mods_info = {}
-    mod_enabled_status = {}
-    game_path = None
-    staging_path = None
-    
-    for key, value in db:
-        key_str = key.decode('utf-8', errors='ignore')
-        
-        # Find active profile
-        if key_str == f'settings###profiles###lastActiveProfile###{game}':
-            try:
-                active_profile_id = json.loads(value.decode('utf-8'))
-            except:
-                pass
-        
-        # Find enabled status
-        if '###modState###' in key_str and key_str.endswith('###enabled'):
-            parts = key_str.split('###')
-            if len(parts) >= 5:
-                profile_id = parts[2]
-                mod_id = parts[4]
-                try:
-                    is_enabled = value.decode('utf-8') == 'true'
-                    if profile_id not in mod_enabled_status:
-                        mod_enabled_status[profile_id] = {}
-                    mod_enabled_status[profile_id][mod_id] = is_enabled
-                except:
-                    pass
-        
-        # Collect mod information
-        if key_str.startswith(f'persistent###mods###{game}###'):
-            parts = key_str.split('###')
-            if len(parts) >= 4:
-                mod_id = parts[3]
-                if mod_id not in mods_info:
-                    mods_info[mod_id] = {'id': mod_id}
-                
-                if len(parts) == 5:
-                    field = parts[4]
-                    try:
-                        value_str = value.decode('utf-8')
-                        if field in ['installationPath', 'type', 'state']:
-                            mods_info[mod_id][field] = json.loads(value_str)
-                    except:
-                        pass
-                
-                # Get name from attributes
-                if len(parts) >= 6 and parts[4] == 'attributes' and parts[5] == 'name':
-                    try:
-                        mods_info[mod_id]['name'] = json.loads(value.decode('utf-8'))
-                    except:
-                        pass
-        
-        # Get game path
-        if key_str == f'settings###gameMode###discovered###{game}###path':
-            try:
-                game_path = json.loads(value.decode('utf-8'))
-            except:
-                pass
-        
-        # Get staging path
-        if key_str == f'settings###mods###installPath###{game}':
-            try:
-                staging_path = json.loads(value.decode('utf-8'))
-            except:
-                pass
-    
-    db.close()
-    
+        return None, None
+
+    # Single keys are point lookups instead of a full scan
+    active_profile_id = vortex_keys.get(db, 'active_profile', game)
     if not active_profile_id:
         print(f"ERROR: Could not find active profile for {game}")
-        return None
-    
-    return {
+        db.close()
+        return None, None
+
+    game_path = vortex_keys.get(db, 'game_path', game)
+    staging_path = vortex_keys.get(db, 'staging_path', game)
+
+    # Enabled status of the active profile only
+    library = mod_model.ModLibrary()
+    router = vortex_keys.KeyRouter({
+        'mod_enabled': lambda value, profile_id, mod_id: library.set_enabled(profile_id, mod_id, value),
+    }, game)
+    prefix = f'persistent###profiles###{active_profile_id}###modState###'.encode()
+    state_keys = 0
+    for key, value in db.iterator(prefix=prefix):
+        router.route(key, value)
+        state_keys += 1
+
+    # Vortex's before/after rules between the enabled mods, by point lookups
+    rules, attributes = load_order.read_rules(
+        db, game, [record.id for record in library.enabled_records(active_profile_id)])
+
+    data = {
         'active_profile_id': active_profile_id,
-        'mods_info': mods_info,
-        'mod_enabled_status': mod_enabled_status.get(active_profile_id, {}),
+        'library': library,
         'game_path': win_to_linux(game_path),
-        'staging_path': win_to_linux(staging_path)
+        'staging_path': win_to_linux(staging_path),
+        # Deploy types of mods without a usable Vortex type
+        'classifier': classify_mods.TypeCache(),
+        # Which mod wins a file both have (see load_rank())
+        'load_order': load_order.build(rules, attributes),
     }
 
-def symlink_directory_contents(src_dir, dest_dir, dry_run=False):
-    """Recursively symlink directory contents"""
-    if not os.path.exists(src_dir):
-        return []
-    
-    created_links = []
-    
-    for item in os.listdir(src_dir):
-        src_path = os.path.join(src_dir, item)
-        dest_path = os.path.join(dest_dir, item)
-        
-        if os.path.isdir(src_path):
-            # Create directory if it doesn't exist
-            if not dry_run and not os.path.exists(dest_path):
-                os.makedirs(dest_path, exist_ok=True)
-            # Recursively symlink contents
-            created_links.extend(symlink_directory_contents(src_path, dest_path, dry_run))
-        else:
-            # Symlink file
-            if os.path.exists(dest_path) or os.path.islink(dest_path):
-                if not dry_run:
-                    os.remove(dest_path)
-            
-            if not dry_run:
-                os.symlink(src_path, dest_path)
-            created_links.append(dest_path)
-    
-    return created_links
+    # Records whose keys are done, waiting to be yielded
+    finished = []
+    current = [None]
+
+    def touch(mod_id):
+        record = current[0]
+        if record is None or record.id != mod_id:
+            # Previous mod's keys are done
+            if record is not None:
+                finished.append(record)
+            record = current[0] = library.add_mod(mod_id)
+        return record
+
+    def field_handler(field):
+        def handler(value, mod_id):
+            touch(mod_id)
+            if value is not None:
+                library.set_field(mod_id, field, value)
+        return handler
+
+    def set_name(value, mod_id):
+        record = touch(mod_id)
+        if value is not None:
+            record.name = value
+
+    mod_router = vortex_keys.KeyRouter({
+        'mod_installation_path': field_handler('installationPath'),
+        'mod_type': field_handler('type'),
+        'mod_state': field_handler('state'),
+        'mod_name': set_name,
+        'mod_other': lambda value, mod_id, rest: touch(mod_id),
+    }, game)
+
+    def mods():
+        try:
+            for key, value in db.iterator(prefix=f'persistent###mods###{game}###'.encode()):
+                mod_router.route(key, value)
+                stream.keys += 1
+                if finished:
+                    yield finished.pop()
+
+            if current[0] is not None:
+                yield current[0]
+        finally:
+            db.close()
+
+    stream = ModStream(db, mods(), state_keys)
+    return data, stream
+
+def get_mod_data(db_path='state/', game='subnautica'):
+    """Extract mod data from Vortex database"""
+    data, mods = open_mod_stream(db_path, game)
+    if data is None:
+        return None
 
-def deploy_mods(db_path='state/', game='subnautica', dry_run=False):
-    """Deploy mods by symlinking from staging to game directory"""
+    data['mods_info'] = {record.id: record for record in mods}
+    return data
+
+def plan_mod_links(src_dir, dest_dir, cache=None):
+    """
+    Walk a staging directory and return (src, dest) pairs for every file.
+
+    With a staging_cache.ListingCache, unchanged directories are not
+    listed again.
+    """
+    links = []
+
+    try:
+        if cache is not None:
+            dirs, files = cache.list_dir(src_dir)
+        else:
+            dirs = []
+            files = []
+            with os.scandir(src_dir) as it:
+                for entry in it:
+                    (dirs if entry.is_dir() else files).append(entry.name)
+    except FileNotFoundError:
+        return links
+
+    for name in files:
+        links.append((os.path.join(src_dir, name), os.path.join(dest_dir, name)))
+
+    for name in dirs:
+        links.extend(plan_mod_links(os.path.join(src_dir, name), os.path.join(dest_dir, name), cache))
+
+    return links
+
+def symlink_directory_contents(src_dir, dest_dir, dry_run=False, method=fs_batch.SYMLINK):
+    """Recursively symlink directory contents, returns (src, dest, placed) tuples"""
+    # Plan first, then apply grouped per destination directory
+    return fs_batch.apply_links(plan_mod_links(src_dir, dest_dir), dry_run, method)
+
+def mod_rank(record, mod_type=None):
+    """
+    Deployment order key: bepinex-5 first, then by name.
+
+    A mod with a higher rank is deployed later and wins conflicting paths.
+    mod_type is the type it is deployed as (default: its Vortex type).
+    """
+    mod_type = mod_type or record.mod_type
+    return (0 if mod_type is ModType.BEPINEX_5 else 1, record.display_name, record.id)
+
+def load_rank(data, record, mod_type=None):
+    """
+    Conflict winner key: the mod's depth in the graph of Vortex's load
+    order rules (see load_order.py), then mod_rank().
+    """
+    order = data.get('load_order')
+    return (order.depth(record.id) if order is not None else 0,) + mod_rank(record, mod_type)
+
+def deploy_type(data, record):
+    """
+    ModType a mod is deployed as, or None if it isn't deployed.
+
+    bepinex-5 and bepinex-plugin mods keep their Vortex type; untyped mods
+    are classified by their staging tree (see classify_mods.py). Other
+    types (collections, dinput, ...) are not deployed.
+    """
+    if record.mod_type in (ModType.BEPINEX_5, ModType.BEPINEX_PLUGIN):
+        return record.mod_type
+    classifier = data.get('classifier')
+    if not classify_mods.needs_inference(record) or classifier is None or not record.installation_path:
+        return None
+    mod_type, _ = classifier.classify(record.id, os.path.join(data['staging_path'], record.installation_path))
+    return mod_type
+
+def is_deployable(data, record):
+    """bepinex-5 and bepinex-plugin mods, and untyped mods that look like one"""
+    return deploy_type(data, record) is not None
+
+def is_enabled(data, record):
+    """Whether a mod is enabled in the active profile"""
+    return data['library'].is_enabled(data['active_profile_id'], record.id)
+
+def select_enabled_mods(data):
+    """Return the deployable enabled mods as ModRecords, in deployment order"""
+    enabled_mods = [record for record in data['mods_info'].values()
+                    if is_enabled(data, record) and is_deployable(data, record)]
+
+    # Sort: Vortex's load order rules, then bepinex-5 first, then bepinex-plugin
+    enabled_mods.sort(key=lambda record: load_rank(data, record, deploy_type(data, record)))
+    return enabled_mods
+
+def get_target_dir(mod_type, game_path):
+    """Directory a mod of the given ModType is deployed into"""
+    if mod_type is ModType.BEPINEX_5:
+        # BepInEx framework goes to the game root
+        return game_path
+    if mod_type is ModType.BEPINEX_PLUGIN:
+        return os.path.join(game_path, 'BepInEx', 'plugins')
+    return None
+
+def parse_methods(specs):
+    """
+    Turn --method values ("hardlink" or "bepinex-plugin=hardlink") into
+    {mod type: method}, starting from config.DEPLOY_METHODS.
+
+    Raises ValueError for unknown mod types or methods.
+    """
+    methods = dict(config.DEPLOY_METHODS)
+    for spec in specs or []:
+        mod_type, _, method = spec.rpartition('=')
+        if method not in fs_batch.METHODS:
+            raise ValueError(f"unknown method '{method}' (choose from {', '.join(fs_batch.METHODS)})")
+        if not mod_type:
+            methods = {name: method for name in methods}
+        elif mod_type in methods:
+            methods[mod_type] = method
+        else:
+            raise ValueError(f"unknown mod type '{mod_type}' (choose from {', '.join(methods)})")
+    return methods
+
+def use_listings(data, cache):
+    """Classify untyped mods from the same staging listings the plan is made of"""
+    if cache is not None and data.get('classifier') is not None:
+        data['classifier'].listings = cache
+
+def plan_deployment(data, cache=None, methods=None):
+    """
+    Compute the links a deployment should produce without touching the game.
+
+    Returns a dict of dest path -> {'src': staging file, 'mod': mod id},
+    plus 'method' for mod types not deployed as symlinks (see
+    config.DEPLOY_METHODS). Later mods in deployment order win conflicting
+    paths, like they do when deploying.
+    """
+    methods = methods or config.DEPLOY_METHODS
+    entries = {}
+    use_listings(data, cache)
+    for record in select_enabled_mods(data):
+        mod_type = deploy_type(data, record)
+        target_dir = get_target_dir(mod_type, data['game_path'])
+        if not record.installation_path or not target_dir:
+            continue
+        method = methods.get(mod_type.value, fs_batch.SYMLINK)
+        mod_staging_path = os.path.join(data['staging_path'], record.installation_path)
+        for src, dest in plan_mod_links(mod_staging_path, target_dir, cache):
+            entries[dest] = {'src': src, 'mod': record.id}
+            if method != fs_batch.SYMLINK:
+                entries[dest]['method'] = method
+    return entries
+
+def plan_mod(record, data, cache=None):
+    """Pipeline stage 2: walk one mod's staging directory (runs in a worker thread)"""
+    if not record.installation_path:
+        return record, None, None, "No installation path"
+
+    mod_staging_path = os.path.join(data['staging_path'], record.installation_path)
+    if not os.path.isdir(mod_staging_path):
+        return record, mod_staging_path, None, f"Staging directory not found: {mod_staging_path}"
+
+    target_dir = get_target_dir(deploy_type(data, record), data['game_path'])
+    return record, mod_staging_path, plan_mod_links(mod_staging_path, target_dir, cache), None
+
+def run_pipeline(data, mod_stream, jobs=DEFAULT_JOBS, cache=None):
+    """
+    Overlap the database scan, the staging walks and link creation.
+
+    The database scan runs in a producer thread and hands every enabled,
+    deployable mod to a pool of staging walkers as soon as its record is
+    complete. Finished plans are yielded in completion order, so the caller
+    can apply them while other mods are still being read or walked.
+    """
+    results = queue.Queue()
+    done = object()
+    use_listings(data, cache)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        def produce():
+            submitted = 0
+            try:
+                for record in mod_stream:
+                    if is_enabled(data, record) and is_deployable(data, record):
+                        future = executor.submit(plan_mod, record, data, cache)
+                        future.add_done_callback(results.put)
+                        submitted += 1
+            except BaseException as e:
+                results.put(e)
+            finally:
+                results.put((done, submitted))
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+
+        received = 0
+        expected = None
+        while expected is None or received < expected:
+            item = results.get()
+            if isinstance(item, tuple) and item[0] is done:
+                expected = item[1]
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                received += 1
+                yield item.result()
+
+        producer.join()
+
+def remove_stale_entries(previous_manifest, manifest, dry_run=False):
+    """
+    Incremental undeploy: remove the files of the previous deployment that
+    the new one no longer has (only if they are still the ones it placed),
+    restore the game files it had replaced there, then prune the
+    directories deployments created that are now empty. Backups of paths
+    that are still deployed move on to the new manifest.
+
+    Returns (removed files, restored files, removed directories).
+    """
+    entries = manifest['entries']
+    stale = []
+    for dest, entry in previous_manifest['entries'].items():
+        if dest in entries:
+            continue
+        try:
+            st = os.lstat(dest)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        if deploy_manifest.is_owned(entry, st):
+            stale.append(dest)
+    if dry_run:
+        return stale, [], []
+
+    removed, failed = fs_batch.unlink_paths(stale)
+    for path, e in failed:
+        print(f"  ✗ Failed to remove {path}: {e}")
+
+    restored = []
+    for dest, record in previous_manifest.get('backups', {}).items():
+        if dest in entries:
+            manifest['backups'].setdefault(dest, record)
+        elif dest not in manifest['backups'] and game_backups.restore(dest, record):
+            restored.append(dest)
+
+    # Only the created directories that held a removed file can have become empty
+    tracked = set(previous_manifest.get('dirs', []))
+    candidates = set()
+    for path in removed:
+        parent = os.path.dirname(path)
+        while parent in tracked and parent not in candidates:
+            candidates.add(parent)
+            parent = os.path.dirname(parent)
+    return removed, restored, fs_batch.prune_dirs(candidates)
+
+def still_placed(dest, entry):
+    """Whether the file at dest is still the one a journaled entry placed (not another mod's)"""
+    try:
+        st = os.lstat(dest)
+        if deploy_manifest.entry_method(entry) == fs_batch.SYMLINK:
+            return stat.S_ISLNK(st.st_mode) and os.readlink(dest) == entry['src']
+    except OSError:
+        return False
+    return deploy_manifest.is_owned(entry, st)
+
+def deploy_mods(db_path='state/', game='subnautica', dry_run=False, jobs=DEFAULT_JOBS, use_cache=True,
+                shadow=False, methods=None):
+    """
+    Deploy mods by symlinking from staging to game directory.
+
+    methods maps mod types to how their files are placed (symlink,
+    hardlink, reflink or copy, default config.DEPLOY_METHODS); hardlinks
+    and reflinks fall back when the filesystem can't make them. With shadow, BepInEx/plugins is built in a shadow tree and swapped in
+    at the end (see shadow_tree.py); framework links in the game root are
+    still created in place.
+    """
     print("="*80)
     print("VORTEX MOD DEPLOYMENT SCRIPT FOR LINUX")
     print("="*80)
     print()
 
-    # Get mod data
-    data = get_mod_data(db_path, game)
+    # Opening the database may rewrite its log, so fingerprint it first
+    # (a fresh local copy has the fingerprint of Vortex's database)
+    fingerprint = config.db_fingerprint(db_path)
+    run = run_history.current()
+    run.set_db(db_path)
+
+    # Get mod data (mod records are streamed while deploying)
+    data, mod_stream = open_mod_stream(db_path, game)
     if not data:
         return False
 
-    mods_info = data['mods_info']
-    enabled_status = data['mod_enabled_status']
     game_path = data['game_path']
     staging_path = data['staging_path']
 
@@ -164,93 +482,237 @@ def deploy_mods(db_path='state/', game='subnautica', dry_run=False):
     print()
 
     # Verify paths exist
-    if not os.path.exists(game_path):
+    if not game_path or not os.path.exists(game_path):
         print(f"ERROR: Game path does not exist: {game_path}")
+        mod_stream.close()
         return False
 
-    if not os.path.exists(staging_path):
+    if not staging_path or not os.path.exists(staging_path):
         print(f"ERROR: Staging path does not exist: {staging_path}")
+        mod_stream.close()
         return False
 
-    # Filter enabled mods
-    enabled_mods = []
-    for mod_id, mod_info in mods_info.items():
-        if enabled_status.get(mod_id, False):
-            mod_type = mod_info.get('type', 'unknown')
-            # Skip collections
-            if mod_type == 'collection':
-                continue
-            # Only process bepinex-5 and bepinex-plugin
-            if mod_type in ['bepinex-5', 'bepinex-plugin']:
-                enabled_mods.append((mod_id, mod_info))
-
-    # Sort: bepinex-5 first, then bepinex-plugin
-    enabled_mods.sort(key=lambda x: (0 if x[1].get('type') == 'bepinex-5' else 1, x[1].get('name', x[0])))
-
-    # Print summary
-    print(f"Found {len(enabled_mods)} enabled mods to deploy:")
-    print()
-
-    bepinex_count = sum(1 for _, m in enabled_mods if m.get('type') == 'bepinex-5')
-    plugin_count = sum(1 for _, m in enabled_mods if m.get('type') == 'bepinex-plugin')
+    order = data['load_order']
+    if order.edges:
+        print(f"Load order: {order.edges} rules between enabled mods decide which one wins a file")
+        for cycle in order.cycles:
+            print(f"⚠ Load order rules form a cycle, ignoring the rules between: {' -> '.join(cycle)}")
+        print()
 
-    print(f"  - BepInEx Framework: {bepinex_count}")
-    print(f"  - BepInEx Plugins: {plugin_count}")
-    print()
+    methods = methods or config.DEPLOY_METHODS
+    if any(method != fs_batch.SYMLINK for method in methods.values()):
+        print("Methods: " + ', '.join(f"{mod_type} {method}" for mod_type, method in methods.items()))
+        print()
 
     if dry_run:
         print("DRY RUN MODE - No changes will be made")
         print()
 
-    # Deploy mods
-    total_links = 0
-
-    for mod_id, mod_info in enabled_mods:
-        mod_name = mod_info.get('name', mod_id)
-        mod_type = mod_info.get('type', 'unknown')
-        install_path = mod_info.get('installationPath')
-
-        if not install_path:
-            print(f"⚠ SKIP: {mod_name} - No installation path")
-            continue
-
-        mod_staging_path = os.path.join(staging_path, install_path)
-
-        if not os.path.exists(mod_staging_path):
-            print(f"⚠ SKIP: {mod_name} - Staging directory not found: {mod_staging_path}")
-            continue
-
-        print(f"{'[DRY RUN] ' if dry_run else ''}Deploying: {mod_name}")
-        print(f"  Type: {mod_type}")
-        print(f"  From: {mod_staging_path}")
-
-        created_links = []
-
-        if mod_type == 'bepinex-5':
-            # Deploy BepInEx framework to game root
-            print(f"  To: {game_path} (game root)")
-            created_links = symlink_directory_contents(mod_staging_path, game_path, dry_run)
-
-        elif mod_type == 'bepinex-plugin':
-            # Deploy plugins to BepInEx/plugins directory
-            bepinex_plugins_dir = os.path.join(game_path, 'BepInEx', 'plugins')
+    # Deploy mods as their plans arrive
+    type_counts = {'bepinex-5': 0, 'bepinex-plugin': 0}
+    manifest = deploy_manifest.new_manifest(game, game_path, staging_path, data['active_profile_id'])
+    # dest path -> rank of the mod that currently owns it. Plans arrive in any
+    # order, so a lower-ranked mod must not overwrite a higher-ranked one.
+    owners = {}
+    cache = staging_cache.ListingCache() if use_cache else None
+    deployed_records = []
+    # Directories this deployment had to create (live paths)
+    created_dirs = []
+
+    live_plugins = shadow_tree.plugins_dir(game_path)
+    previous_manifest = deploy_manifest.load_manifest()
+
+    # A deployment that was interrupted: what it placed counts as deployed
+    interrupted = deploy_journal.load_journal()
+    if interrupted is not None and interrupted['game_path'] == game_path:
+        print(f"{'[DRY RUN] Would resume' if dry_run else 'Resuming'} an interrupted deployment "
+              f"({len(interrupted['done'])} mods were done)")
+        print()
+        previous_manifest = previous_manifest or deploy_manifest.new_manifest(game, game_path, staging_path, None)
+        previous_manifest['entries'].update(interrupted['entries'])
+        previous_manifest['dirs'] = previous_manifest.get('dirs', []) + interrupted['dirs']
+        previous_manifest['backups'] = {**previous_manifest.get('backups', {}), **interrupted['backups']}
+    else:
+        interrupted = None
+    previous_entries = previous_manifest['entries'] if previous_manifest else {}
+
+    journal = deploy_journal.Journal()
+    if not dry_run:
+        journal.start(game_path, data['active_profile_id'], shadow, resume=interrupted is not None)
+
+    def back_up(path):
+        """Keep a game file a mod overwrites (not one a deployment placed)"""
+        dest = shadow_tree.to_live(path, live_plugins)
+        if dest in manifest['entries']:
+            return
+        entry = previous_entries.get(dest)
+        if entry is not None and deploy_manifest.is_owned(entry, os.lstat(path)):
+            return
+        manifest['backups'][dest] = game_backups.back_up(path)
+        journal.backup(dest, manifest['backups'][dest])
+        print(f"  Backed up replaced game file: {os.path.relpath(dest, game_path)}")
+
+    if shadow and not dry_run:
+        # Start from what is in plugins/ but was not deployed by us
+        owned = set(previous_manifest['entries']) if previous_manifest else set()
+        owned_dirs = previous_manifest.get('dirs', []) if previous_manifest else []
+        shadow_dirs = []
+        with run.phase('shadow'):
+            carried = shadow_tree.prepare_shadow(live_plugins, owned, owned_dirs, shadow_dirs)
+        # The swapped-in plugins directory (and its parents) is ours if there was none before
+        for path in shadow_dirs:
+            live_path = shadow_tree.to_live(path, live_plugins)
+            if not os.path.isdir(live_path):
+                created_dirs.append(live_path)
+        print(f"Building plugins in {shadow_tree.shadow_dir(live_plugins)}"
+              + (f" ({carried} unmanaged files carried over)" if carried else ""))
+        print()
 
-            # Create BepInEx/plugins if it doesn't exist
-            if not dry_run and not os.path.exists(bepinex_plugins_dir):
-                os.makedirs(bepinex_plugins_dir, exist_ok=True)
+    with run.phase('deploy'):
+        for record, mod_staging_path, links, skip_reason in run_pipeline(data, mod_stream, jobs, cache):
+            deployed_records.append(record)
+            mod_name = record.display_name
 
-            print(f"  To: {bepinex_plugins_dir}")
-            created_links = symlink_directory_contents(mod_staging_path, bepinex_plugins_dir, dry_run)
+            if skip_reason:
+                print(f"⚠ SKIP: {mod_name} - {skip_reason}")
+                continue
 
-        print(f"  Created {len(created_links)} symlinks")
-        total_links += len(created_links)
+            mod_type = deploy_type(data, record).value
+            type_counts[mod_type] += 1
+
+            rank = load_rank(data, record, ModType(mod_type))
+            winning_links = []
+            for src, dest in links:
+                owner = owners.get(dest)
+                if owner is not None and owner > rank:
+                    continue
+                owners[dest] = rank
+                winning_links.append((src, dest))
+            overridden = len(links) - len(winning_links)
+
+            print(f"{'[DRY RUN] ' if dry_run else ''}Deploying: {mod_name}")
+            if mod_type == record.type_name:
+                print(f"  Type: {mod_type}")
+            else:
+                print(f"  Type: {mod_type} (inferred from staging, Vortex type: {record.type_name})")
+            print(f"  From: {mod_staging_path}")
+            if mod_type == 'bepinex-5':
+                print(f"  To: {game_path} (game root)")
+            else:
+                print(f"  To: {get_target_dir(ModType(mod_type), game_path)}")
+
+            method = methods.get(mod_type, fs_batch.SYMLINK)
+            first_dir = len(created_dirs)
+            done = interrupted['done'].get(record.id) if interrupted and not shadow else None
+            verb = "Created"
+            reused = []
+            if not dry_run:
+                # All of the mod's links: which of them win depends on the order plans arrive in
+                journal.plan(record.id, method, links, winning_links)
+            if done and done['method'] == method and done['links'] == [list(link) for link in links]:
+                # Placed before the interruption, unless a mod placed since then took the file
+                winning_dests = {dest for _, dest in winning_links}
+                reused = [(entry['src'], dest, {key: entry[key] for key in ('method', 'inode') if key in entry})
+                          for dest, entry in done['entries'].items()
+                          if dest in winning_dests and still_placed(dest, entry)]
+                reused_dests = {dest for _, dest, _ in reused}
+                winning_links = [(src, dest) for src, dest in winning_links if dest not in reused_dests]
+                created_dirs += done['dirs']
+                verb = "Already placed before the interruption:" if not winning_links else "Created"
+
+            if not winning_links:
+                created_links = []
+            elif shadow and not dry_run:
+                # Build below plugins.shadow, record the live paths
+                shadow_links = {}
+                for src, dest in winning_links:
+                    shadow_links[shadow_tree.to_shadow(dest, live_plugins) or dest] = (src, dest)
+                shadow_dirs = []
+                built = fs_batch.apply_links([(src, built_dest) for built_dest, (src, _) in shadow_links.items()],
+                                             method=method, created_dirs=shadow_dirs, on_replace=back_up)
+                created_links = [(*shadow_links[built_dest], placed) for _, built_dest, placed in built]
+                # A directory rebuilt in the shadow tree is only ours if the live tree lacks it
+                for path in shadow_dirs:
+                    live_path = shadow_tree.to_live(path, live_plugins)
+                    if live_path == path or not os.path.isdir(live_path):
+                        created_dirs.append(live_path)
+            else:
+                created_links = fs_batch.apply_links(winning_links, dry_run, method, created_dirs, back_up)
+
+            created_links = reused + created_links
+            for src, dest, placed in created_links:
+                manifest['entries'][dest] = {'src': src, 'mod': record.id, **placed}
+            if not dry_run:
+                journal.done(record.id, {dest: manifest['entries'][dest] for _, dest, _ in created_links},
+                             created_dirs[first_dir:])
+
+            if method == fs_batch.SYMLINK:
+                created = f"{len(created_links)} symlinks"
+            else:
+                used = Counter(deploy_manifest.entry_method(placed) for _, _, placed in created_links)
+                created = f"{len(created_links)} files ({', '.join(f'{name} {count}' for name, count in used.items())})"
+            print(f"  {verb} {created}"
+                  + (f" ({overridden} overridden by higher-ranked mods)" if overridden else ""))
+            print()
+
+    # Links replaced by a higher-ranked mod that finished later count once
+    total_links = len(manifest['entries'])
+    if shadow and not dry_run:
+        # One syscall from the old plugin tree to the new one
+        with run.phase('swap'):
+            atomic = shadow_tree.swap_in(live_plugins)
+        print(f"✓ Switched in the new plugins tree{'' if atomic else ' (two renames, no renameat2 here)'}, "
+              f"previous one kept at {shadow_tree.previous_dir(live_plugins)}")
         print()
+        if previous_manifest:
+            manifest['previous_plugins'] = {dest: entry for dest, entry in previous_manifest['entries'].items()
+                                            if shadow_tree.to_shadow(dest, live_plugins)}
+
+    stale = []
+    if previous_manifest and previous_manifest['game_path'] == game_path:
+        with run.phase('undeploy'):
+            stale, restored, pruned = remove_stale_entries(previous_manifest, manifest, dry_run)
+        if stale:
+            print(f"{'[DRY RUN] Would remove' if dry_run else 'Removed'} {len(stale)} files of mods "
+                  f"that are no longer deployed" + (f" and {len(pruned)} empty directories" if pruned else ""))
+        if restored:
+            print(f"Restored {len(restored)} game files those mods had replaced")
+        if stale or restored:
+            print()
+        # Directories of earlier deployments stay ours until they are pruned
+        created_dirs += [path for path in previous_manifest.get('dirs', []) if path not in pruned]
+    manifest['dirs'] = sorted(path for path in set(created_dirs) if dry_run or os.path.isdir(path))
+
+    with run.phase('save'):
+        if not dry_run:
+            deploy_manifest.save_manifest(manifest)
+            # The manifest has it all now
+            journal.close()
+            deploy_journal.remove_journal()
+            deploy_status.record_deployment(game, fingerprint, data['active_profile_id'], deployed_records,
+                                            data['load_order'])
+        if cache is not None:
+            cache.save()
+        data['classifier'].save()
+    # Keys of the mods and the profile's mod states the stream read
+    run.set(links=total_links, enabled_mods=len(deployed_records), db_keys=mod_stream.keys)
+    if cache is not None:
+        run.set(cache_hit_rate=round(cache.hit_rate(), 3))
 
     print("="*80)
     print(f"DEPLOYMENT {'PREVIEW' if dry_run else 'COMPLETE'}")
     print("="*80)
-    print(f"Total mods processed: {len(enabled_mods)}")
-    print(f"Total symlinks {'would be ' if dry_run else ''}created: {total_links}")
+    print(f"Total mods processed: {sum(type_counts.values())}")
+    print(f"  - BepInEx Framework: {type_counts['bepinex-5']}")
+    print(f"  - BepInEx Plugins: {type_counts['bepinex-plugin']}")
+    print(f"Total files {'would be ' if dry_run else ''}placed: {total_links}")
+    used = Counter(deploy_manifest.entry_method(entry) for entry in manifest['entries'].values())
+    if set(used) - {fs_batch.SYMLINK}:
+        print("  - By method: " + ', '.join(f"{name} {count}" for name, count in sorted(used.items())))
+    if manifest['backups']:
+        print(f"Replaced game files kept in {config.GAME_BACKUP_DIR}/: {len(manifest['backups'])}")
+    if cache is not None:
+        print(f"Staging listing cache: {cache.hits} hits, {cache.misses} misses ({cache.hit_rate():.0%})")
     print()
 
     if dry_run:
@@ -258,6 +720,36 @@ def deploy_mods(db_path='state/', game='subnautica', dry_run=False):
 
     return True
 
+def rollback_plugins():
+    """Swap the previous BepInEx/plugins tree of a shadow deployment back in"""
+    manifest = deploy_manifest.load_manifest()
+    if manifest is None:
+        print(f"ERROR: No deploy manifest found at {config.DEPLOY_MANIFEST}")
+        return False
+
+    live_plugins = shadow_tree.plugins_dir(manifest['game_path'])
+    atomic = shadow_tree.rollback(live_plugins)
+    if atomic is None:
+        print(f"ERROR: No previous plugins tree at {shadow_tree.previous_dir(live_plugins)}")
+        return False
+
+    # The manifest follows the trees: plugin entries trade places
+    def in_plugins(dest):
+        return shadow_tree.to_shadow(dest, live_plugins) is not None
+
+    current_plugins = {dest: entry for dest, entry in manifest['entries'].items() if in_plugins(dest)}
+    if 'previous_plugins' not in manifest:
+        print("Warning: The manifest does not record the previous plugins tree; "
+              "run verify_deploy.py --plan --repair to rebuild it")
+    manifest['entries'] = {dest: entry for dest, entry in manifest['entries'].items() if not in_plugins(dest)}
+    manifest['entries'].update(manifest.get('previous_plugins', {}))
+    manifest['previous_plugins'] = current_plugins
+    deploy_manifest.save_manifest(manifest)
+
+    print(f"✓ Rolled back {live_plugins}{'' if atomic else ' (three renames, no renameat2 here)'}")
+    print(f"  Run --rollback again to undo")
+    return True
+
 if __name__ == "__main__":
     import argparse
 
@@ -274,21 +766,60 @@ Examples:
 
   # Use custom database path
   python3 deploy_mods.py --db /path/to/state/
+
+  # Build BepInEx/plugins aside and switch it in with one rename
+  python3 deploy_mods.py --shadow
+
+  # Switch the previous plugins tree back in
+  python3 deploy_mods.py --rollback
+
+  # Hardlink plugins instead of symlinking them (falls back to reflink/copy across devices)
+  python3 deploy_mods.py --method bepinex-plugin=hardlink
+
+  # Reflink (or copy) everything
+  python3 deploy_mods.py --method reflink
         """
     )
     parser.add_argument('--db', default=None, help='Path to LevelDB database (default: auto-detect from config)')
     parser.add_argument('--game', default=config.DEFAULT_GAME, help=f'Game name (default: {config.DEFAULT_GAME})')
     parser.add_argument('--dry-run', action='store_true', help='Preview changes without making them')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Walk all staging directories instead of using cached listings')
+    parser.add_argument('--jobs', '-j', type=int, default=DEFAULT_JOBS,
+                        help=f'Staging directories walked in parallel (default: {DEFAULT_JOBS})')
+
+    parser.add_argument('--shadow', action='store_true',
+                        help='Build BepInEx/plugins in a shadow tree and swap it in atomically')
+    parser.add_argument('--rollback', action='store_true',
+                        help='Swap the plugins tree replaced by the last --shadow deployment back in')
+    parser.add_argument('--method', action='append', default=[], metavar='[TYPE=]METHOD',
+                        help=f'How files are placed: {", ".join(fs_batch.METHODS)}, for all mod types or '
+                             f'one (e.g. bepinex-plugin=hardlink); repeatable (default: config.DEPLOY_METHODS)')
 
     args = parser.parse_args()
+    try:
+        methods = parse_methods(args.method)
+    except ValueError as e:
+        parser.error(str(e))
 
-    # Use config if no db path specified
-    if args.db is None:
-        try:
-            args.db = config.get_safe_db_path()
-        except (FileNotFoundError, RuntimeError) as e:
-            print(f"ERROR: {e}")
-            sys.exit(1)
+    if args.rollback:
+        with config.tool_lock('deploy --rollback'):
+            sys.exit(0 if rollback_plugins() else 1)
 
-    success = deploy_mods(args.db, args.game, args.dry_run)
+    run = run_history.start('deploy-preview' if args.dry_run else 'deploy', game=args.game)
+
+    # One deploy at a time (a preview too: it replaces the local database copy)
+    with config.tool_lock('deploy-preview' if args.dry_run else 'deploy'):
+        # Use config if no db path specified
+        if args.db is None:
+            try:
+                with run.phase('copy'):
+                    # A real deploy records the state it deployed from
+                    args.db = config.get_safe_db_path(snapshot=not args.dry_run)
+            except (FileNotFoundError, RuntimeError) as e:
+                print(f"ERROR: {e}")
+                sys.exit(1)
+
+        success = deploy_mods(args.db, args.game, args.dry_run, args.jobs, not args.no_cache, args.shadow, methods)
+    run.finish(success)
     sys.exit(0 if success else 1)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Fast "is the deployment current?" check, e.g. before launching the game.
+
+deploy_mods.py records what each deployment was made from: the database
+fingerprint (CURRENT, MANIFEST and log stat, see config.db_fingerprint),
+a hash of the active profile's enabled mods and a hash of the deploy
+manifest it wrote. If the database and the manifest are unchanged, the
+deployment is current without opening the database. Only when the
+database did change (Vortex also writes for things like window state)
+is it copied and the enabled mods compared.
+"""
+import json
+import os
+import sys
+import time
+import config
+import deploy_manifest
+
+CURRENT = 0
+REDEPLOY = 1
+ERROR = 2
+
+def load_status(path=None):
+    """The recorded deployment status, None if there is none"""
+    path = path or config.DEPLOY_STATUS
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_status(status, path=None):
+    path = path or config.DEPLOY_STATUS
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(status, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def record_deployment(game, fingerprint, profile_id, records, order):
+    """Called after a deployment: remember what it was made from (order: the load_order.LoadOrder)"""
+    save_status({
+        'game': game,
+        'fingerprint': fingerprint,
+        'profile_id': profile_id,
+        'enabled_hash': deploy_manifest.enabled_set_hash(profile_id, records, order.digest()),
+        'manifest_hash': deploy_manifest.manifest_hash(),
+        'deployed': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    })
+
+def manifest_updated():
+    """Called after a repair rewrote the manifest of the recorded deployment"""
+    status = load_status()
+    if status is not None:
+        status['manifest_hash'] = deploy_manifest.manifest_hash()
+        save_status(status)
+
+def current_enabled_hash(game):
+    """
+    Copy the database and hash the active profile's enabled, deployable mods.
+
+    Returns (fingerprint, profile_id, hash), or None if the database can't
+    be read.
+    """
+    import contextlib
+    import io
+    import deploy_mods
+
+    # The copy's chatter is not interesting here; a deploy may be copying too
+    with config.tool_lock('status'), contextlib.redirect_stdout(io.StringIO()):
+        fingerprint = config.db_fingerprint(config.VORTEX_STATE_DB)
+        db_path = config.copy_database_to_local()
+        data, mod_stream = deploy_mods.open_mod_stream(db_path, game)
+        if data is None:
+            return None
+        records = [record for record in mod_stream
+                   if deploy_mods.is_enabled(data, record) and deploy_mods.is_deployable(data, record)]
+        data['classifier'].save()
+    profile_id = data['active_profile_id']
+    return fingerprint, profile_id, deploy_manifest.enabled_set_hash(profile_id, records,
+                                                                    data['load_order'].digest())
+
+def check_status(game='subnautica', deep=True):
+    """
+    Returns (code, reason): CURRENT, REDEPLOY or ERROR.
+
+    The common case (nothing changed) costs a few stat calls and hashing
+    the manifest. With deep, a changed database is copied and its enabled
+    mods compared; if they match, the recorded fingerprint is updated so
+    the next check is fast again.
+    """
+    status = load_status()
+    if status is None:
+        return REDEPLOY, "no deployment recorded"
+    if status.get('game') != game:
+        return REDEPLOY, f"last deployment was for {status.get('game')}"
+
+    if deploy_manifest.manifest_hash() != status.get('manifest_hash'):
+        return REDEPLOY, "deploy manifest changed or removed (cleanup or another deployment)"
+
+    try:
+        fingerprint = config.db_fingerprint(config.VORTEX_STATE_DB)
+    except OSError as e:
+        return ERROR, f"could not read the Vortex database: {e}"
+    if fingerprint == status.get('fingerprint'):
+        return CURRENT, "database unchanged since the last deployment"
+
+    if not deep:
+        return REDEPLOY, "database changed since the last deployment"
+    if config.is_vortex_running():
+        return REDEPLOY, "database changed and Vortex is running (enabled mods not compared)"
+
+    try:
+        current = current_enabled_hash(game)
+    except (OSError, RuntimeError) as e:
+        return ERROR, f"could not read the Vortex database: {e}"
+    if current is None:
+        return ERROR, "could not read the Vortex database"
+    fingerprint, profile_id, enabled_hash = current
+
+    if profile_id != status.get('profile_id'):
+        return REDEPLOY, "active profile changed"
+    if enabled_hash != status.get('enabled_hash'):
+        return REDEPLOY, "enabled mods or their load order changed"
+
+    status['fingerprint'] = fingerprint
+    save_status(status)
+    return CURRENT, "database changed, but not the enabled mods or their load order"
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Check whether the deployed mods match the Vortex state',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exit codes with --exit-code:
+  0  deployment is current
+  1  a redeploy is needed
+  2  the state could not be checked
+
+Examples:
+  # Show whether a redeploy is needed
+  python3 deploy_status.py
+
+  # Redeploy only when needed
+  python3 deploy_status.py --exit-code --quiet || python3 deploy_mods.py
+
+  # Steam launch options (redeploys if needed, then starts the game)
+  /path/to/vortexfixer/bin/vortex-launch %command%
+        """
+    )
+    parser.add_argument('--game', default=config.DEFAULT_GAME, help=f'Game name (default: {config.DEFAULT_GAME})')
+    parser.add_argument('--exit-code', action='store_true',
+                        help='Exit with 1 if a redeploy is needed (2 on errors)')
+    parser.add_argument('--no-deep', action='store_true',
+                        help='Never copy the database; any database change means a redeploy')
+    parser.add_argument('--quiet', '-q', action='store_true', help='Print nothing')
+
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    code, reason = check_status(args.game, deep=not args.no_deep)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    if not args.quiet:
+        if code == CURRENT:
+            print(f"✓ Deployment is current: {reason} ({elapsed_ms:.0f} ms)")
+        elif code == REDEPLOY:
+            print(f"✗ Redeploy needed: {reason} ({elapsed_ms:.0f} ms)")
+        else:
+            print(f"ERROR: {reason}")
+
+    if code == ERROR:
+        sys.exit(ERROR)
+    sys.exit(code if args.exit_code else 0)
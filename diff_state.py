@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Show what changed between two copies of the Vortex state database.
+
+LevelDB iterates keys in sorted order, so both databases are walked side
+by side as a merge-join: one pass, O(n) time and constant memory, no
+matter how large the databases are.
+
+Either side can also be a snapshot id (see snapshots.py); the snapshot is
+restored into a temporary directory for the diff and removed afterwards.
+"""
+import contextlib
+import os
+import shutil
+import tempfile
+import plyvel
+import sys
+import config
+import snapshots
+
+ADDED = 'added'
+REMOVED = 'removed'
+CHANGED = 'changed'
+
+def diff_databases(db_old, db_new, prefix=None):
+    """
+    Yield (change, key, old_value, new_value) for every differing key.
+
+    db_old and db_new are open plyvel databases. Keys come out in sorted
+    order; old_value is None for added keys, new_value for removed ones.
+    """
+    it_old = db_old.iterator(prefix=prefix) if prefix else db_old.iterator()
+    it_new = db_new.iterator(prefix=prefix) if prefix else db_new.iterator()
+
+    old = next(it_old, None)
+    new = next(it_new, None)
+
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            yield REMOVED, old[0], old[1], None
+            old = next(it_old, None)
+        elif old is None or new[0] < old[0]:
+            yield ADDED, new[0], None, new[1]
+            new = next(it_new, None)
+        else:
+            if old[1] != new[1]:
+                yield CHANGED, old[0], old[1], new[1]
+            old = next(it_old, None)
+            new = next(it_new, None)
+
+def key_group(key_str):
+    """Group a key by the mod, profile or download it belongs to"""
+    parts = key_str.split('###')
+    if len(parts) >= 4 and parts[0] == 'persistent' and parts[1] == 'mods':
+        return f"mod {parts[2]}/{parts[3]}"
+    if len(parts) >= 3 and parts[0] == 'persistent' and parts[1] == 'profiles':
+        return f"profile {parts[2]}"
+    if len(parts) >= 4 and parts[0] == 'persistent' and parts[1] == 'downloads' and parts[2] == 'files':
+        return f"download {parts[3]}"
+    return '###'.join(parts[:2])
+
+def _short(value, limit=80):
+    text = value.decode('utf-8', errors='replace')
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+def resolve_database(source, temp_dirs):
+    """
+    Database directory for a path or a snapshot id ('latest', an id or id prefix).
+
+    Snapshots are restored into a temporary directory that is appended to
+    temp_dirs for the caller to remove. Returns (path, label), or
+    (None, None) if source is neither.
+    """
+    if os.path.isdir(source):
+        return source, source
+    snapshot = snapshots.find_snapshot(source)
+    if snapshot is None:
+        return None, None
+    tmp_dir = tempfile.mkdtemp(prefix='diff_state.')
+    temp_dirs.append(tmp_dir)
+    db_path = os.path.join(tmp_dir, 'state.v2')
+    snapshots.extract_snapshot(snapshot, db_path)
+    return db_path, f"snapshot {snapshot['id']}"
+
+def diff_state(old_path, new_path, prefix=None, show_values=False, summary_only=False, labels=None):
+    """
+    Print the differences between two databases grouped by mod/profile
+
+    labels replaces the paths in the header, e.g. for restored snapshots.
+    """
+    try:
+        db_old = plyvel.DB(old_path, create_if_missing=False)
+    except Exception as e:
+        print(f"Error opening database: {e}")
+        return False
+    try:
+        db_new = plyvel.DB(new_path, create_if_missing=False)
+    except Exception as e:
+        db_old.close()
+        print(f"Error opening database: {e}")
+        return False
+
+    print("="*80)
+    print("VORTEX STATE DIFF")
+    print("="*80)
+    old_label, new_label = labels or (old_path, new_path)
+    print(f"Old: {old_label}")
+    print(f"New: {new_label}")
+    print()
+
+    counts = {ADDED: 0, REMOVED: 0, CHANGED: 0}
+    groups_changed = 0
+    current_group = None
+    markers = {ADDED: '+', REMOVED: '-', CHANGED: '~'}
+
+    try:
+        for change, key, old_value, new_value in diff_databases(
+                db_old, db_new, prefix.encode() if prefix else None):
+            counts[change] += 1
+            key_str = key.decode('utf-8', errors='ignore')
+
+            # Keys of one group are adjacent in sorted order, so grouping
+            # only needs to remember the current group
+            group = key_group(key_str)
+            if group != current_group:
+                current_group = group
+                groups_changed += 1
+                if not summary_only:
+                    print(f"\n[{group}]")
+
+            if summary_only:
+                continue
+
+            print(f"  {markers[change]} {key_str}")
+            if show_values:
+                if old_value is not None:
+                    print(f"      old: {_short(old_value)}")
+                if new_value is not None:
+                    print(f"      new: {_short(new_value)}")
+    finally:
+        db_old.close()
+        db_new.close()
+
+    print()
+    print("="*80)
+    print("SUMMARY")
+    print("="*80)
+    print(f"Added keys:   {counts[ADDED]}")
+    print(f"Removed keys: {counts[REMOVED]}")
+    print(f"Changed keys: {counts[CHANGED]}")
+    print(f"Groups affected (mods/profiles/...): {groups_changed}")
+    return True
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Diff two Vortex state databases in one sorted pass',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Compare a saved copy against the current Vortex state
+  python3 diff_state.py before.state.v2
+
+  # Compare two saved copies, showing values
+  python3 diff_state.py before.state.v2 after.state.v2 --values
+
+  # What changed since the latest snapshot
+  python3 diff_state.py latest
+
+  # Compare two snapshots (ids or unique id prefixes)
+  python3 diff_state.py 20260204-101500 20260205
+
+  # Only look at profiles
+  python3 diff_state.py before.state.v2 --prefix 'persistent###profiles###'
+        """
+    )
+    parser.add_argument('old', help="Path to the older database copy, or a snapshot id ('latest', id prefix)")
+    parser.add_argument('new', nargs='?', default=None,
+                        help='Path to the newer database copy or a snapshot id '
+                             '(default: fresh copy of the Vortex database)')
+    parser.add_argument('--prefix', default=None, help='Only compare keys with this prefix')
+    parser.add_argument('--values', action='store_true', help='Show old and new values')
+    parser.add_argument('--summary', action='store_true', help='Only show counts')
+
+    args = parser.parse_args()
+
+    # The copy replaces the local database another command may be reading
+    with config.tool_lock('diff') if args.new is None else contextlib.nullcontext():
+        # Use config if no new db path specified
+        if args.new is None:
+            if os.path.abspath(args.old) == os.path.abspath(config.LOCAL_STATE_COPY):
+                print(f"ERROR: {config.LOCAL_STATE_COPY} is replaced by the fresh copy, save it under another name first")
+                sys.exit(1)
+            try:
+                args.new = config.get_safe_db_path()
+            except (FileNotFoundError, RuntimeError) as e:
+                print(f"ERROR: {e}")
+                sys.exit(1)
+
+        temp_dirs = []
+        try:
+            paths = []
+            labels = []
+            for source in (args.old, args.new):
+                try:
+                    path, label = resolve_database(source, temp_dirs)
+                except OSError as e:
+                    print(f"ERROR: Could not restore snapshot '{source}': {e}")
+                    sys.exit(1)
+                if path is None:
+                    print(f"ERROR: '{source}' is neither a database directory nor a unique snapshot id")
+                    sys.exit(1)
+                paths.append(path)
+                labels.append(label)
+            success = diff_state(paths[0], paths[1], args.prefix, args.values, args.summary, labels)
+        finally:
+            for tmp_dir in temp_dirs:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+    sys.exit(0 if success else 1)
@@ -2,23 +2,18 @@
 """
 Dump all entries from the LevelDB database
 """
+import contextlib
 import plyvel
 import sys
 import json
 import config
+import run_history
+import sharded_scan
 
-def dump_database(db_path='state/', output_file=None):
-    """Dump all database entries"""
-    try:
-        db = plyvel.DB(db_path, create_if_missing=False)
-    except Exception as e:
-        print(f"Error opening database: {e}")
-        return
-    
+def _dump_range(db, start, stop):
+    """Entries of one key range"""
     entries = []
-    
-    print("Reading all entries...")
-    for key, value in db:
+    for key, value in sharded_scan.iterate(db, start, stop):
         entry = {
             'key_hex': key.hex(),
             'key_bytes': list(key),
@@ -40,18 +35,35 @@ def dump_database(db_path='state/', output_file=None):
             pass
         
         entries.append(entry)
+    return entries
+
+def dump_database(db_path='state/', output_file=None, jobs=None):
+    """Dump all database entries (key ranges are read in parallel by up to `jobs` workers)"""
+    entries = []
     
-    db.close()
+    run = run_history.current()
+    run.set_db(db_path)
+    print("Reading all entries...")
+    try:
+        with run.phase('scan'):
+            for range_entries in sharded_scan.map_ranges(db_path, _dump_range, jobs=jobs):
+                entries.extend(range_entries)
+    except (plyvel.Error, OSError) as e:
+        print(f"Error opening database: {e}")
+        return False
+    run.set(db_keys=len(entries))
     
     print(f"Total entries: {len(entries)}")
     
-    if output_file:
-        with open(output_file, 'w') as f:
-            json.dump(entries, f, indent=2)
-        print(f"Dumped to {output_file}")
-    else:
-        # Print to stdout
-        print(json.dumps(entries, indent=2))
+    with run.phase('write'):
+        if output_file:
+            with open(output_file, 'w') as f:
+                json.dump(entries, f, indent=2)
+            print(f"Dumped to {output_file}")
+        else:
+            # Print to stdout
+            print(json.dumps(entries, indent=2))
+    return True
 
 if __name__ == "__main__":
     import argparse
@@ -59,16 +71,24 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Dump all entries from the LevelDB database')
     parser.add_argument('--db', default=None, help='Path to LevelDB database (default: auto-detect from config)')
     parser.add_argument('--output', '-o', default=None, help='Output file (default: stdout)')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Parallel scan workers (default: config.SCAN_JOBS or the number of CPUs)')
 
     args = parser.parse_args()
 
-    # Use config if no db path specified
-    if args.db is None:
-        try:
-            args.db = config.get_safe_db_path()
-        except (FileNotFoundError, RuntimeError) as e:
-            print(f"ERROR: {e}")
-            sys.exit(1)
+    run = run_history.start('dump')
+
+    # The copy replaces the local database another command may be reading
+    with config.tool_lock('dump') if args.db is None else contextlib.nullcontext():
+        # Use config if no db path specified
+        if args.db is None:
+            try:
+                with run.phase('copy'):
+                    args.db = config.get_safe_db_path()
+            except (FileNotFoundError, RuntimeError) as e:
+                print(f"ERROR: {e}")
+                sys.exit(1)
 
-    dump_database(args.db, args.output)
+        success = dump_database(args.db, args.output, args.jobs)
+    run.finish(success)
 
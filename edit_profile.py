@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Enable or disable many mods of a Vortex profile in one go.
+
+Clicking through Vortex under Proton is slow. This script applies all
+changes to the profile's modState keys (enabled, enabledTime) of a copy
+of state.v2 in a single LevelDB WriteBatch, reopens the copy to verify
+it, and then swaps it into place while Vortex is closed. The previous
+database is kept as state.v2.before-edit (and in the snapshot store).
+"""
+import os
+import shutil
+import sys
+import time
+import plyvel
+import config
+import fs_batch
+import vortex_keys
+
+def resolve_mods(library, names):
+    """
+    Map mod ids or display names (case-insensitive) to installed records.
+
+    Returns (records, errors).
+    """
+    by_name = {}
+    for record in library.installed_records():
+        by_name.setdefault(record.display_name.lower(), []).append(record)
+
+    records = []
+    errors = []
+    for name in names:
+        record = library.get(name)
+        if record is not None and record.installed:
+            records.append(record)
+            continue
+        matches = by_name.get(name.lower(), [])
+        if len(matches) == 1:
+            records.append(matches[0])
+        elif matches:
+            errors.append(f"'{name}' matches {len(matches)} mods, use the mod id: "
+                          + ', '.join(record.id for record in matches))
+        else:
+            errors.append(f"No installed mod '{name}'")
+    return records, errors
+
+def apply_changes(db_path, game, profile_id, changes):
+    """
+    Write {mod id: enabled} for a profile in one WriteBatch, then verify.
+
+    Returns True if the reopened database holds exactly the new values.
+    """
+    enabled_time = int(time.time() * 1000)
+    expected = {}
+    for mod_id, enabled in changes.items():
+        captures = {'profile': profile_id, 'mod': mod_id}
+        expected[vortex_keys.key_for('mod_enabled', game, **captures)] = b'true' if enabled else b'false'
+        expected[vortex_keys.key_for('mod_enabled_time', game, **captures)] = str(enabled_time).encode()
+
+    db = plyvel.DB(db_path, create_if_missing=False)
+    try:
+        with db.write_batch(transaction=True, sync=True) as batch:
+            for key, value in expected.items():
+                batch.put(key, value)
+    finally:
+        db.close()
+
+    # Reopen, so the check reads what LevelDB recovers from disk
+    db = plyvel.DB(db_path, create_if_missing=False)
+    try:
+        wrong = [key for key, value in expected.items() if db.get(key) != value]
+    finally:
+        db.close()
+    for key in wrong:
+        print(f"  ✗ Not written: {key.decode()}")
+    return not wrong
+
+def swap_into_place(edited, fingerprint):
+    """
+    Replace the Vortex database with the edited copy.
+
+    Refused if Vortex started or its database changed since it was copied.
+    The previous database is moved to <state.v2>.before-edit.
+    """
+    target = config.VORTEX_STATE_DB
+    backup = target + '.before-edit'
+
+    if config.is_vortex_running():
+        print("ERROR: Vortex was started in the meantime, the database was not replaced.")
+        return False
+    if config.db_fingerprint(target) != fingerprint:
+        print("ERROR: The Vortex database changed in the meantime, the database was not replaced.")
+        return False
+
+    if os.path.exists(backup):
+        shutil.rmtree(backup)
+    if fs_batch.exchange_paths(edited, target):
+        # The edited copy is in place, its directory now holds the previous state
+        os.rename(edited, backup)
+    else:
+        os.rename(target, backup)
+        os.rename(edited, target)
+    print(f"  Previous database kept at {backup}")
+    return True
+
+def edit_profile(game, enable=(), disable=(), profile_id=None, dry_run=False):
+    """Enable/disable mods (ids or names) in a profile (default: the active one)"""
+    print("="*80)
+    print("EDIT PROFILE")
+    print("="*80)
+
+    if config.is_vortex_running():
+        print("ERROR: Vortex is currently running (lockfile detected)!")
+        print("Please close Vortex before editing a profile.")
+        return False
+    if not os.path.exists(config.VORTEX_STATE_DB):
+        print(f"ERROR: Vortex database not found at: {config.VORTEX_STATE_DB}")
+        return False
+
+    # Work on a copy next to the database, so the swap is a rename
+    edited = config.VORTEX_STATE_DB + '.edit'
+    if os.path.exists(edited):
+        shutil.rmtree(edited)
+    fingerprint = config.db_fingerprint(config.VORTEX_STATE_DB)
+    shutil.copytree(config.VORTEX_STATE_DB, edited)
+
+    try:
+        state = vortex_keys.load_state(edited, game)
+        if state is None:
+            return False
+        library = state['library']
+        profile_id = profile_id or state['active_profile_id']
+        if not profile_id:
+            print(f"ERROR: Could not find active profile for {game}!")
+            return False
+        print(f"Profile: {library.profile_name(profile_id, profile_id)} ({profile_id})")
+        print()
+
+        to_enable, errors = resolve_mods(library, enable)
+        to_disable, disable_errors = resolve_mods(library, disable)
+        errors += disable_errors
+        both = {record.id for record in to_enable} & {record.id for record in to_disable}
+        errors += [f"'{mod_id}' is both enabled and disabled" for mod_id in sorted(both)]
+        for error in errors:
+            print(f"ERROR: {error}")
+        if errors:
+            return False
+
+        changes = {}
+        for records, enabled in ((to_enable, True), (to_disable, False)):
+            for record in records:
+                if library.is_enabled(profile_id, record.id) == enabled:
+                    print(f"  = {record.display_name} (already {'enabled' if enabled else 'disabled'})")
+                    continue
+                changes[record.id] = enabled
+                print(f"  {'+' if enabled else '-'} {record.display_name}")
+        print()
+
+        if not changes:
+            print("Nothing to change.")
+            return True
+        if dry_run:
+            print(f"[DRY RUN] Would enable {sum(changes.values())} and disable "
+                  f"{len(changes) - sum(changes.values())} mods")
+            return True
+
+        if config.SNAPSHOT_ON_COPY:
+            # History entry of the state before the edit
+            import snapshots
+            snapshots.take_snapshot(config.VORTEX_STATE_DB, quiet=True)
+
+        if not apply_changes(edited, game, profile_id, changes):
+            print("ERROR: Verification failed, the Vortex database was not replaced.")
+            return False
+        print(f"✓ Wrote {len(changes)} mod states in one batch")
+
+        if not swap_into_place(edited, fingerprint):
+            return False
+        print(f"✓ Vortex database updated")
+        print()
+        print("Run vortex-deploy to deploy the new selection.")
+        return True
+    finally:
+        if os.path.exists(edited):
+            shutil.rmtree(edited)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Enable or disable many mods of a Vortex profile at once (Vortex must be closed)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        fromfile_prefix_chars='@',
+        epilog="""
+Mods are given by mod id or by name (case-insensitive).
+
+Examples:
+  # Preview
+  python3 edit_profile.py --disable "Map" "Slot Extender" --dry-run
+
+  # Enable and disable in one write
+  python3 edit_profile.py --enable "Map" --disable "Slot Extender"
+
+  # Arguments from a file (one per line)
+  python3 edit_profile.py @changes.txt
+        """
+    )
+    parser.add_argument('--game', default=config.DEFAULT_GAME, help=f'Game name (default: {config.DEFAULT_GAME})')
+    parser.add_argument('--profile', default=None, help='Profile id (default: the active profile)')
+    parser.add_argument('--enable', nargs='+', default=[], metavar='MOD', help='Mods to enable')
+    parser.add_argument('--disable', nargs='+', default=[], metavar='MOD', help='Mods to disable')
+    parser.add_argument('--dry-run', action='store_true', help='Show the changes without writing them')
+
+    args = parser.parse_args()
+    if not args.enable and not args.disable:
+        parser.error('nothing to do, use --enable and/or --disable')
+
+    # Not even a preview while a deploy reads the database it would write
+    with config.tool_lock('edit_profile'):
+        success = edit_profile(args.game, args.enable, args.disable, args.profile, args.dry_run)
+    sys.exit(0 if success else 1)
@@ -2,33 +2,99 @@
 """
 Explore the LevelDB database structure
 """
+import contextlib
 import plyvel
 import sys
 import config
+import run_history
+import sharded_scan
 
-def explore_database(db_path='state/'):
-    """Explore the LevelDB database and show statistics"""
+# Sample entries shown
+SAMPLE_COUNT = 10
+
+class _LengthStats:
+    """Min/max/average of a stream of lengths"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, length):
+        self.count += 1
+        self.total += length
+        if self.min is None or length < self.min:
+            self.min = length
+        if self.max is None or length > self.max:
+            self.max = length
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        for length in (other.min, other.max):
+            if length is not None:
+                self.min = length if self.min is None else min(self.min, length)
+                self.max = length if self.max is None else max(self.max, length)
+
+    def print(self):
+        print(f"  Min: {self.min} bytes")
+        print(f"  Max: {self.max} bytes")
+        print(f"  Avg: {self.total/self.count:.2f} bytes")
+
+def _explore_range(db, start, stop, keys_only):
+    """Entry count, length statistics and first sample keys of one key range"""
+    # Collect statistics (running min/max/sum, no per-entry lists)
+    total_entries = 0
+    key_stats = _LengthStats()
+    value_stats = _LengthStats()
+    sample_keys = []
+
+    if keys_only:
+        for key in sharded_scan.iterate(db, start, stop, include_value=False):
+            total_entries += 1
+            key_stats.add(len(key))
+            if len(sample_keys) < SAMPLE_COUNT:
+                sample_keys.append(key)
+    else:
+        for key, value in sharded_scan.iterate(db, start, stop):
+            total_entries += 1
+            key_stats.add(len(key))
+            value_stats.add(len(value))
+            
+            # Store first 10 keys as samples
+            if len(sample_keys) < SAMPLE_COUNT:
+                sample_keys.append(key)
+    return total_entries, key_stats, value_stats, sample_keys
+
+def explore_database(db_path='state/', keys_only=False, jobs=None):
+    """
+    Explore the LevelDB database and show statistics.
+
+    With keys_only, the scan never loads values (value length statistics
+    are skipped); only the sample entries are fetched with point lookups.
+    Key ranges are scanned in parallel by up to `jobs` workers.
+    """
+    total_entries = 0
+    key_stats = _LengthStats()
+    value_stats = _LengthStats()
+    sample_keys = []
+    
+    run = run_history.current()
+    run.set_db(db_path)
+    print("Scanning database..." + (" (keys only)" if keys_only else ""))
     try:
+        with run.phase('scan'):
+            for shard in sharded_scan.map_ranges(db_path, _explore_range, (keys_only,), jobs):
+                total_entries += shard[0]
+                key_stats.merge(shard[1])
+                value_stats.merge(shard[2])
+                sample_keys.extend(shard[3][:SAMPLE_COUNT - len(sample_keys)])
         db = plyvel.DB(db_path, create_if_missing=False)
-    except Exception as e:
+    except (plyvel.Error, OSError) as e:
         print(f"Error opening database: {e}")
-        return
-    
-    # Collect statistics
-    total_entries = 0
-    key_lengths = []
-    value_lengths = []
-    sample_entries = []
-    
-    print("Scanning database...")
-    for key, value in db:
-        total_entries += 1
-        key_lengths.append(len(key))
-        value_lengths.append(len(value))
-        
-        # Store first 10 entries as samples
-        if len(sample_entries) < 10:
-            sample_entries.append((key, value))
+        return False
+    run.set(db_keys=total_entries)
     
     # Print statistics
     print("\n" + "="*80)
@@ -36,23 +102,23 @@ def explore_database(db_path='state/'):
     print("="*80)
     print(f"Total entries: {total_entries}")
     
-    if key_lengths:
+    if key_stats.count:
         print(f"\nKey lengths:")
-        print(f"  Min: {min(key_lengths)} bytes")
-        print(f"  Max: {max(key_lengths)} bytes")
-        print(f"  Avg: {sum(key_lengths)/len(key_lengths):.2f} bytes")
+        key_stats.print()
         
         print(f"\nValue lengths:")
-        print(f"  Min: {min(value_lengths)} bytes")
-        print(f"  Max: {max(value_lengths)} bytes")
-        print(f"  Avg: {sum(value_lengths)/len(value_lengths):.2f} bytes")
+        if keys_only:
+            print("  (not collected in keys-only mode)")
+        else:
+            value_stats.print()
     
     # Show sample entries
     print("\n" + "="*80)
     print("SAMPLE ENTRIES (first 10)")
     print("="*80)
     
-    for i, (key, value) in enumerate(sample_entries, 1):
+    for i, key in enumerate(sample_keys, 1):
+        value = db.get(key, b'')
         print(f"\n--- Entry {i} ---")
         print(f"Key length: {len(key)} bytes")
         print(f"Key (hex): {key.hex()}")
@@ -77,22 +143,33 @@ def explore_database(db_path='state/'):
     
     db.close()
     print("\n" + "="*80)
+    return True
 
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description='Explore the LevelDB database structure')
     parser.add_argument('--db', default=None, help='Path to LevelDB database (default: auto-detect from config)')
+    parser.add_argument('--keys-only', action='store_true',
+                        help='Do not load values during the scan (skips value length statistics)')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Parallel scan workers (default: config.SCAN_JOBS or the number of CPUs)')
 
     args = parser.parse_args()
 
-    # Use config if no db path specified
-    if args.db is None:
-        try:
-            args.db = config.get_safe_db_path()
-        except (FileNotFoundError, RuntimeError) as e:
-            print(f"ERROR: {e}")
-            sys.exit(1)
+    run = run_history.start('explore-keys' if args.keys_only else 'explore')
+
+    # The copy replaces the local database another command may be reading
+    with config.tool_lock('explore') if args.db is None else contextlib.nullcontext():
+        # Use config if no db path specified
+        if args.db is None:
+            try:
+                with run.phase('copy'):
+                    args.db = config.get_safe_db_path()
+            except (FileNotFoundError, RuntimeError) as e:
+                print(f"ERROR: {e}")
+                sys.exit(1)
 
-    explore_database(args.db)
+        success = explore_database(args.db, args.keys_only, args.jobs)
+    run.finish(success)
 
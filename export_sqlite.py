@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Export the Vortex state into an indexed SQLite database for ad-hoc queries.
+
+Mods, mod attributes, profiles and their modState, downloads and settings
+are flattened into normalized tables in one streaming pass over the
+LevelDB keys. The database fingerprint is stored with the export, so an
+unchanged Vortex state is not exported again.
+"""
+import contextlib
+import json
+import os
+import sqlite3
+import sys
+import time
+import plyvel
+import config
+import run_history
+import vortex_keys
+
+EXPORT_VERSION = 1
+
+# Rows are written in batches of this many
+BATCH_SIZE = 1000
+
+SCHEMA_SQL = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+
+CREATE TABLE mods (
+    game TEXT, mod_id TEXT,
+    installation_path TEXT, type TEXT, state TEXT, archive_id TEXT, rules TEXT,
+    PRIMARY KEY (game, mod_id)
+);
+CREATE TABLE mod_attributes (
+    game TEXT, mod_id TEXT, name TEXT, value,
+    PRIMARY KEY (game, mod_id, name)
+);
+CREATE INDEX mod_attributes_name ON mod_attributes (name, value);
+-- Any other key below a mod (path relative to the mod)
+CREATE TABLE mod_fields (
+    game TEXT, mod_id TEXT, path TEXT, value,
+    PRIMARY KEY (game, mod_id, path)
+);
+
+CREATE TABLE profiles (
+    profile_id TEXT PRIMARY KEY, name TEXT, game TEXT, last_activated INTEGER
+);
+CREATE TABLE mod_state (
+    profile_id TEXT, mod_id TEXT, enabled INTEGER, enabled_time INTEGER,
+    PRIMARY KEY (profile_id, mod_id)
+);
+CREATE INDEX mod_state_mod ON mod_state (mod_id);
+
+CREATE TABLE downloads (
+    download_id TEXT PRIMARY KEY,
+    local_path TEXT, file_md5 TEXT, size INTEGER, state TEXT, file_time INTEGER
+);
+CREATE INDEX downloads_md5 ON downloads (file_md5);
+CREATE TABLE download_games (
+    download_id TEXT, game TEXT,
+    PRIMARY KEY (download_id, game)
+);
+CREATE INDEX download_games_game ON download_games (game);
+-- modInfo and any other key below a download
+CREATE TABLE download_fields (
+    download_id TEXT, path TEXT, value,
+    PRIMARY KEY (download_id, path)
+);
+
+CREATE TABLE settings (path TEXT PRIMARY KEY, value);
+"""
+
+# LevelDB field -> column, per row table
+MOD_COLUMNS = {'installationPath': 'installation_path', 'type': 'type', 'state': 'state',
+               'archiveId': 'archive_id', 'rules': 'rules'}
+PROFILE_COLUMNS = {'name': 'name', 'gameId': 'game', 'lastActivated': 'last_activated'}
+DOWNLOAD_COLUMNS = {'localPath': 'local_path', 'fileMD5': 'file_md5', 'size': 'size',
+                    'state': 'state', 'fileTime': 'file_time'}
+
+def sql_value(value):
+    """Scalars are stored as-is, lists and objects as JSON text"""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+class _Table:
+    """Batched INSERTs into one table"""
+
+    def __init__(self, conn, table, columns):
+        self.conn = conn
+        self.table = table
+        self.sql = f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        self.pending = []
+        self.rows = 0
+
+    def add(self, row):
+        self.pending.append(row)
+        if len(self.pending) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.conn.executemany(self.sql, self.pending)
+            self.rows += len(self.pending)
+            self.pending = []
+
+class _RowTable(_Table):
+    """
+    Builds one row from several keys.
+
+    All keys of a row share a key prefix, so they are adjacent in LevelDB
+    order: a row is complete as soon as a key of another row arrives.
+    """
+
+    def __init__(self, conn, table, key_columns, columns):
+        super().__init__(conn, table, list(key_columns) + list(columns))
+        self.columns = {column: i for i, column in enumerate(columns)}
+        self.key = None
+        self.values = None
+
+    def set(self, key, column, value):
+        if key != self.key:
+            self.finish_row()
+            self.key = key
+            self.values = [None] * len(self.columns)
+        self.values[self.columns[column]] = sql_value(value)
+
+    def finish_row(self):
+        if self.key is not None:
+            self.add(self.key + tuple(self.values))
+            self.key = None
+
+def read_export_fingerprint(output):
+    """Fingerprint stored in an existing export, None if there is none"""
+    if not os.path.exists(output):
+        return None
+    try:
+        conn = sqlite3.connect(output)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+def export_state(db_path, output, fingerprint=None, jobs=None):
+    """
+    Write all tables into a new SQLite file at output, returns row counts.
+
+    Keys are decoded by up to `jobs` sharded_scan workers; rows are written
+    here in key order, so rows built from adjacent keys stay whole.
+    """
+    tmp_output = output + '.tmp'
+    if os.path.exists(tmp_output):
+        os.remove(tmp_output)
+    conn = sqlite3.connect(tmp_output)
+    # A throwaway file until it is renamed into place
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executescript(SCHEMA_SQL)
+
+    mods = _RowTable(conn, 'mods', ['game', 'mod_id'], list(MOD_COLUMNS.values()))
+    mod_attributes = _Table(conn, 'mod_attributes', ['game', 'mod_id', 'name', 'value'])
+    mod_fields = _Table(conn, 'mod_fields', ['game', 'mod_id', 'path', 'value'])
+    profiles = _RowTable(conn, 'profiles', ['profile_id'], list(PROFILE_COLUMNS.values()))
+    mod_state = _RowTable(conn, 'mod_state', ['profile_id', 'mod_id'], ['enabled', 'enabled_time'])
+    downloads = _RowTable(conn, 'downloads', ['download_id'], list(DOWNLOAD_COLUMNS.values()))
+    download_games = _Table(conn, 'download_games', ['download_id', 'game'])
+    download_fields = _Table(conn, 'download_fields', ['download_id', 'path', 'value'])
+    settings = _Table(conn, 'settings', ['path', 'value'])
+
+    def mod_field(field):
+        return lambda value, game, mod_id: mods.set((game, mod_id), MOD_COLUMNS[field], value)
+
+    def profile_field(value, profile_id, field):
+        if field in PROFILE_COLUMNS:
+            profiles.set((profile_id,), PROFILE_COLUMNS[field], value)
+
+    def download_field(value, download_id, field):
+        if field in DOWNLOAD_COLUMNS:
+            downloads.set((download_id,), DOWNLOAD_COLUMNS[field], value)
+        elif field == 'game' and isinstance(value, list):
+            for game in value:
+                download_games.add((download_id, game))
+        else:
+            download_fields.add((download_id, field, sql_value(value)))
+
+    handlers = {
+        'setting': lambda value, path: settings.add((path, sql_value(value))),
+        'profile_field': profile_field,
+        'mod_enabled': lambda value, profile_id, mod_id: mod_state.set((profile_id, mod_id), 'enabled', value),
+        'mod_enabled_time': lambda value, profile_id, mod_id: mod_state.set((profile_id, mod_id), 'enabled_time', value),
+        'mod_installation_path': mod_field('installationPath'),
+        'mod_type': mod_field('type'),
+        'mod_state': mod_field('state'),
+        'mod_archive_id': mod_field('archiveId'),
+        'mod_rules': mod_field('rules'),
+        'mod_attribute': lambda value, game, mod_id, name: mod_attributes.add((game, mod_id, name, sql_value(value))),
+        'mod_extra': lambda value, game, mod_id, path: mod_fields.add((game, mod_id, path, sql_value(value))),
+        'download_field': download_field,
+        'download_extra': lambda value, download_id, path: download_fields.add((download_id, path, sql_value(value))),
+    }
+
+    tables = [mods, mod_attributes, mod_fields, profiles, mod_state,
+              downloads, download_games, download_fields, settings]
+    try:
+        # game=None: export every game's mods
+        try:
+            with run_history.current().phase('scan'):
+                routed = vortex_keys.scan_parallel(db_path, handlers, game=None, jobs=jobs)
+        except (plyvel.Error, OSError) as e:
+            print(f"Error opening database: {e}")
+            conn.close()
+            os.remove(tmp_output)
+            return None
+        for table in tables:
+            if isinstance(table, _RowTable):
+                table.finish_row()
+            table.flush()
+
+        run_history.current().set(db_keys=routed)
+        meta = {
+            'version': EXPORT_VERSION,
+            'fingerprint': fingerprint or '',
+            'source': os.path.abspath(db_path),
+            'exported': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'keys': routed,
+        }
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)",
+                         [(key, str(value)) for key, value in meta.items()])
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp_output, output)
+    return {table.table: table.rows for table in tables}
+
+def run_query(output, sql):
+    """Run one SQL statement against the export and print the rows tab-separated"""
+    conn = sqlite3.connect(output)
+    try:
+        cursor = conn.execute(sql)
+        if cursor.description:
+            print('\t'.join(column[0] for column in cursor.description))
+        for row in cursor:
+            print('\t'.join('' if value is None else str(value) for value in row))
+    except sqlite3.Error as e:
+        print(f"ERROR: {e}")
+        return False
+    finally:
+        conn.close()
+    return True
+
+def export_sqlite(db_path=None, output=None, force=False, query=None, jobs=None):
+    """
+    Export unless the existing export has the same fingerprint, then run query.
+
+    Without db_path the Vortex database is fingerprinted in place and only
+    copied (config.get_safe_db_path()) if the export is out of date.
+    """
+    output = output or config.SQLITE_EXPORT
+    run = run_history.current()
+    # A fresh copy has the fingerprint of Vortex's database
+    fingerprint = config.db_fingerprint(db_path or config.VORTEX_STATE_DB)
+
+    run.set_db(db_path or config.VORTEX_STATE_DB)
+    if not force and read_export_fingerprint(output) == fingerprint:
+        print(f"✓ {output} is up to date (database unchanged)", file=sys.stderr if query else sys.stdout)
+    else:
+        if db_path is None:
+            with run.phase('copy'):
+                db_path = config.get_safe_db_path()
+            # Vortex may have written since the check above
+            fingerprint = config.db_fingerprint(db_path)
+        start = time.perf_counter()
+        counts = export_state(db_path, output, fingerprint, jobs)
+        if counts is None:
+            return False
+        elapsed = time.perf_counter() - start
+        out = sys.stderr if query else sys.stdout
+        print(f"✓ Exported to {output} in {elapsed:.2f}s", file=out)
+        for table, rows in counts.items():
+            print(f"  {table:16s} {rows:8d} rows", file=out)
+
+    if query:
+        return run_query(output, query)
+    return True
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Export the Vortex state into an indexed SQLite database',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Export (skipped if the database did not change since the last export)
+  python3 export_sqlite.py
+
+  # Enabled plugins of a profile that have an update available
+  python3 export_sqlite.py --query "
+    SELECT m.mod_id FROM mods m
+    JOIN mod_state s ON s.mod_id = m.mod_id AND s.profile_id = 'abc123' AND s.enabled
+    JOIN mod_attributes f ON f.game = m.game AND f.mod_id = m.mod_id AND f.name = 'fileId'
+    JOIN mod_attributes n ON n.game = m.game AND n.mod_id = m.mod_id AND n.name = 'newestFileId'
+    WHERE m.type = 'bepinex-plugin' AND f.value != n.value"
+
+  # Or query the file directly
+  sqlite3 vortex_state.sqlite 'SELECT type, count(*) FROM mods GROUP BY type'
+        """
+    )
+    parser.add_argument('--db', default=None, help='Path to LevelDB database (default: auto-detect from config)')
+    parser.add_argument('--output', '-o', default=None,
+                        help=f'SQLite file to write (default: {config.SQLITE_EXPORT})')
+    parser.add_argument('--force', action='store_true', help='Export even if the database is unchanged')
+    parser.add_argument('--query', '-q', default=None, help='SQL to run against the export afterwards')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Parallel scan workers (default: config.SCAN_JOBS or the number of CPUs)')
+
+    args = parser.parse_args()
+
+    run = run_history.start('export')
+
+    # The copy replaces the local database another command may be reading
+    with config.tool_lock('export') if args.db is None else contextlib.nullcontext():
+        # Without --db, Vortex's database is only copied if it changed since the export
+        try:
+            success = export_sqlite(args.db, args.output, args.force, args.query, args.jobs)
+        except (FileNotFoundError, RuntimeError) as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+    run.finish(success)
+    sys.exit(0 if success else 1)
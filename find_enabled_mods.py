@@ -2,141 +2,79 @@
 """
 Find enabled mods for Subnautica (current profile only)
 """
-import plyvel
-import json
+import contextlib
 import sys
 import config
+import output_format
+import vortex_keys
+
+# Keys of every mod record (--fields)
+FIELDS = ['id', 'name', 'version', 'author', 'description', 'enabled_time']
+
+def enabled_mod_records(library, profile_id):
+    """
+    Enabled mods of a profile as plain dicts, most recently enabled first.
+
+    Only truly enabled mods (enabled=true) that have an enabledTime are
+    listed. The order needs every enabled mod, so the list is complete
+    before the first record can be written.
+    """
+    mods = []
+    for record in library.enabled_records(profile_id):
+        enabled_time = library.enabled_time(profile_id, record.id)
+        if enabled_time is None:
+            continue
+        mods.append({
+            'id': record.id,
+            'name': record.display_name,
+            'version': record.version or 'unknown',
+            'author': record.author or 'unknown',
+            'description': record.attribute('shortDescription', ''),
+            'enabled_time': enabled_time,
+        })
 
-def find_enabled_mods(db_path='state/', game='subnautica'):
-    """Find all enabled mods for the current profile"""
-    try:
-        db = plyvel.DB(db_path, create_if_missing=False)
-    except Exception as e:
-        print(f"Error opening database: {e}")
-        return
-
-    # First, find the active profile for the game
-    active_profile_id = None
-    profiles = {}
-    mods_info = {}
-    enabled_mods = {}
-    mod_enabled_status = {}
-
-    print("Scanning database...")
-
-    for key, value in db:
-        key_str = key.decode('utf-8', errors='ignore')
-
-        # Find active profile for the game
-        if key_str == f'settings###profiles###lastActiveProfile###subnautica':
-            try:
-                active_profile_id = json.loads(value.decode('utf-8'))
-                print(f"Active profile ID: {active_profile_id}")
-            except:
-                pass
-
-        # Find profile names
-        if key_str.startswith('persistent###profiles###') and key_str.endswith('###name'):
-            profile_id = key_str.split('###')[2]
-            try:
-                profile_name = json.loads(value.decode('utf-8'))
-                profiles[profile_id] = profile_name
-            except:
-                pass
-
-        # Find enabled status (true/false flag)
-        if '###modState###' in key_str and key_str.endswith('###enabled'):
-            parts = key_str.split('###')
-            if len(parts) >= 5:
-                profile_id = parts[2]
-                mod_id = parts[4]
-                try:
-                    is_enabled = value.decode('utf-8') == 'true'
-                    if profile_id not in mod_enabled_status:
-                        mod_enabled_status[profile_id] = {}
-                    mod_enabled_status[profile_id][mod_id] = is_enabled
-                except:
-                    pass
-
-        # Find enabled mods in profiles (modState entries with enabledTime)
-        if '###modState###' in key_str and key_str.endswith('###enabledTime'):
-            parts = key_str.split('###')
-            if len(parts) >= 5:
-                profile_id = parts[2]
-                mod_id = parts[4]
-                try:
-                    enabled_time = value.decode('utf-8')
-                    if profile_id not in enabled_mods:
-                        enabled_mods[profile_id] = {}
-                    enabled_mods[profile_id][mod_id] = enabled_time
-                except:
-                    pass
-
-        # Collect mod information for subnautica
-        if key_str.startswith('persistent###mods###subnautica###'):
-            parts = key_str.split('###')
-            if len(parts) >= 4:
-                mod_id = parts[3]
-                if mod_id not in mods_info:
-                    mods_info[mod_id] = {}
-
-                # Extract the attribute name
-                if len(parts) >= 6 and parts[4] == 'attributes':
-                    attr_name = parts[5]
-                    try:
-                        attr_value = json.loads(value.decode('utf-8'))
-                        mods_info[mod_id][attr_name] = attr_value
-                    except:
-                        pass
-
-    db.close()
-
-    if not active_profile_id:
-        print("ERROR: Could not find active profile for Subnautica!")
-        return
-
-    # Get the active profile's mods
-    profile_name = profiles.get(active_profile_id, f"Unknown ({active_profile_id})")
-    profile_mods = enabled_mods.get(active_profile_id, {})
-    profile_enabled_status = mod_enabled_status.get(active_profile_id, {})
-
-    # Filter to only truly enabled mods (where enabled=true)
-    truly_enabled_mods = {}
-    for mod_id, enabled_time in profile_mods.items():
-        if profile_enabled_status.get(mod_id, False):
-            truly_enabled_mods[mod_id] = enabled_time
+    # Sort by enabled time (most recent first)
+    mods.sort(key=lambda mod: mod['enabled_time'], reverse=True)
+    return mods
+
+def enabled_mods_report(library, profile_id):
+    """
+    enabled_mod_records() plus the profile and installed mod count, as
+    printed in text mode. JSON-serializable so the query daemon can serve it.
+    """
+    return {
+        'profile_id': profile_id,
+        'profile_name': library.profile_name(profile_id, f"Unknown ({profile_id})"),
+        'installed_count': len(library.installed_records()),
+        'mods': enabled_mod_records(library, profile_id),
+    }
+
+def print_enabled_mods(report):
+    """Display an enabled_mods_report()"""
+    mods = report['mods']
 
-    # Display results
     print("\n" + "="*80)
-    print(f"CURRENT PROFILE: {profile_name}")
+    print(f"CURRENT PROFILE: {report['profile_name']}")
     print("="*80)
-    print(f"Profile ID: {active_profile_id}")
-    print(f"Total enabled mods: {len(truly_enabled_mods)}")
-    print(f"Total installed mods: {len(mods_info)}\n")
+    print(f"Profile ID: {report['profile_id']}")
+    print(f"Total enabled mods: {len(mods)}")
+    print(f"Total installed mods: {report['installed_count']}\n")
 
-    if not truly_enabled_mods:
+    if not mods:
         print("No mods are currently enabled in this profile.")
         return
 
-    # Sort by enabled time (most recent first)
-    sorted_mods = sorted(truly_enabled_mods.items(), key=lambda x: x[1], reverse=True)
-
     print("="*80)
     print("ENABLED MODS")
     print("="*80 + "\n")
 
-    for i, (mod_id, enabled_time) in enumerate(sorted_mods, 1):
-        mod_info = mods_info.get(mod_id, {})
-        mod_name = mod_info.get('name', mod_id)
-        mod_version = mod_info.get('modVersion', 'unknown')
-        mod_author = mod_info.get('author', 'unknown')
-
-        print(f"{i:3d}. {mod_name}")
-        print(f"     Version: {mod_version}")
-        print(f"     Author: {mod_author}")
+    for i, mod in enumerate(mods, 1):
+        print(f"{i:3d}. {mod['name']}")
+        print(f"     Version: {mod['version']}")
+        print(f"     Author: {mod['author']}")
 
         # Show short description if available
-        short_desc = mod_info.get('shortDescription', '')
+        short_desc = mod['description']
         if short_desc:
             # Truncate if too long
             if len(short_desc) > 100:
@@ -144,26 +82,78 @@ def find_enabled_mods(db_path='state/', game='subnautica'):
             print(f"     Description: {short_desc}")
 
         # Optionally show mod ID and enabled time (commented out for cleaner output)
-        # print(f"     Mod ID: {mod_id}")
-        # print(f"     Enabled: {enabled_time}")
+        # print(f"     Mod ID: {mod['id']}")
+        # print(f"     Enabled: {mod['enabled_time']}")
         print()
 
+def find_enabled_mods(db_path='state/', game='subnautica', fmt=output_format.TEXT, fields=None):
+    """Find all enabled mods for the current profile, returns False on errors"""
+    # Only records on stdout in the machine formats
+    with contextlib.redirect_stdout(sys.stderr) if fmt != output_format.TEXT else contextlib.nullcontext():
+        print("Scanning database...")
+
+        state = vortex_keys.load_state(db_path, game, keep_attributes=('shortDescription',))
+        if state is None:
+            return False
+
+        active_profile_id = state['active_profile_id']
+        if not active_profile_id:
+            print(f"ERROR: Could not find active profile for {game}!")
+            return False
+        print(f"Active profile ID: {active_profile_id}")
+
+    if fmt != output_format.TEXT:
+        # Records only, without the text report's profile summary
+        output_format.write_records(enabled_mod_records(state['library'], active_profile_id), fmt, fields)
+    else:
+        print_enabled_mods(enabled_mods_report(state['library'], active_profile_id))
+    return True
+
 if __name__ == "__main__":
     import argparse
 
-    parser = argparse.ArgumentParser(description='Find enabled mods for current profile')
+    parser = argparse.ArgumentParser(
+        description='Find enabled mods for current profile',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Enabled mods, most recently enabled first
+  python3 find_enabled_mods.py
+
+  # Names and versions as JSON for other tools
+  python3 find_enabled_mods.py --format json --fields name,version
+        """
+    )
     parser.add_argument('--db', default=None, help='Path to LevelDB database (default: auto-detect from config)')
     parser.add_argument('--game', default=config.DEFAULT_GAME, help=f'Game name (default: {config.DEFAULT_GAME})')
+    parser.add_argument('--use-daemon', action='store_true',
+                        help='Ask the running query daemon (vortex_daemon.py) first')
+    output_format.add_arguments(parser)
 
     args = parser.parse_args()
-
-    # Use config if no db path specified
-    if args.db is None:
-        try:
-            args.db = config.get_safe_db_path()
-        except (FileNotFoundError, RuntimeError) as e:
-            print(f"ERROR: {e}")
-            sys.exit(1)
-
-    find_enabled_mods(args.db, args.game)
-
+    fields = output_format.check_arguments(parser, args, FIELDS)
+    machine = args.format != output_format.TEXT
+
+    if args.use_daemon:
+        import vortex_daemon
+        report = vortex_daemon.request('enabled_mods', game=args.game)
+        if report is not None:
+            if machine:
+                output_format.write_records(report['mods'], args.format, fields)
+            else:
+                print_enabled_mods(report)
+            sys.exit(0)
+
+    # A fresh copy replaces the local database another command may be reading
+    with config.tool_lock('find_enabled_mods') if args.db is None else contextlib.nullcontext():
+        # Use config if no db path specified
+        if args.db is None:
+            try:
+                with contextlib.redirect_stdout(sys.stderr) if machine else contextlib.nullcontext():
+                    args.db = config.get_safe_db_path()
+            except (FileNotFoundError, RuntimeError) as e:
+                print(f"ERROR: {e}", file=sys.stderr if machine else sys.stdout)
+                sys.exit(1)
+
+        success = find_enabled_mods(args.db, args.game, args.format, fields)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Per-directory batched filesystem operations.
+
+Deploy and cleanup touch thousands of entries that live in a handful of
+directories deep below the Steam library. Instead of resolving the full
+absolute path for every call, operations are grouped by directory: each
+directory is opened once, listed once with scandir, and the individual
+symlink/unlink calls are issued relative to that directory's fd.
+"""
+import errno
+import os
+
+DIR_FLAGS = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0) | getattr(os, 'O_CLOEXEC', 0)
+
+# How a staging file is placed in the game directory
+SYMLINK = 'symlink'
+HARDLINK = 'hardlink'
+REFLINK = 'reflink'
+COPY = 'copy'
+METHODS = [SYMLINK, HARDLINK, REFLINK, COPY]
+
+# Tried next when a method is not possible between staging and the game
+# (different devices, no reflink support, protected_hardlinks)
+FALLBACKS = {HARDLINK: REFLINK, REFLINK: COPY}
+UNSUPPORTED_ERRNOS = (errno.EXDEV, errno.EOPNOTSUPP, errno.EINVAL, errno.ENOTTY, errno.EPERM, errno.EMLINK)
+# Errors that say something about the file, not about the pair of filesystems
+PER_FILE_ERRNOS = (errno.EMLINK,)
+
+# (method asked for, source device, target device) -> the fallback that worked,
+# so a deployment tries a failing method once, not once per file
+_working_methods = {}
+# Source directory -> device (files are on their directory's filesystem)
+_source_devices = {}
+
+# ioctl(dest_fd, FICLONE, src_fd): share the source's extents (btrfs, XFS, bcachefs)
+FICLONE = 0x40049409
+
+def group_by_directory(items, path_of=lambda item: item):
+    """Group items by the directory of their path, keeping the original order"""
+    groups = {}
+    for item in items:
+        dir_path, name = os.path.split(path_of(item))
+        groups.setdefault(dir_path, []).append((name, item))
+    return groups
+
+def list_directory(dir_fd):
+    """Return {name: DirEntry} for an open directory (one getdents pass, no stat)"""
+    with os.scandir(dir_fd) as it:
+        return {entry.name: entry for entry in it}
+
+def make_dirs(dir_path, created=None):
+    """os.makedirs(exist_ok=True) that appends the directories it creates to created"""
+    missing = []
+    path = dir_path
+    while not os.path.isdir(path):
+        missing.append(path)
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    for path in reversed(missing):
+        try:
+            os.mkdir(path)
+        except FileExistsError:
+            if not os.path.isdir(path):
+                raise
+            continue
+        if created is not None:
+            created.append(path)
+
+def prune_dirs(dirs):
+    """
+    Remove those of the given directories that are empty.
+
+    One post-order pass: in reverse sorted order every directory comes
+    before its parent, and rmdir itself is the emptiness check, so no
+    directory is listed. Returns the removed directories.
+    """
+    removed = []
+    for path in sorted(set(dirs), reverse=True):
+        try:
+            os.rmdir(path)
+        except OSError:
+            # Not empty (or already gone)
+            continue
+        removed.append(path)
+    return removed
+
+def _copy_file(src, name, dir_fd, clone=False):
+    """Copy (or with clone, reflink) src to name, keeping mode and mtime"""
+    import fcntl
+    import shutil
+
+    src_stat = os.stat(src)
+
+    def opener(path, flags):
+        return os.open(path, flags, src_stat.st_mode & 0o7777, dir_fd=dir_fd)
+
+    try:
+        with open(src, 'rb') as fsrc, open(name, 'xb', opener=opener) as fdst:
+            if clone:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            else:
+                shutil.copyfileobj(fsrc, fdst)
+    except OSError:
+        # Don't leave a partial file behind for the next method
+        try:
+            os.unlink(name, dir_fd=dir_fd)
+        except FileNotFoundError:
+            pass
+        raise
+    # Same mtime as the staging file: verify uses it to spot stale copies
+    os.utime(name, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns), dir_fd=dir_fd)
+
+def _source_device(src):
+    src_dir = os.path.dirname(src)
+    device = _source_devices.get(src_dir)
+    if device is None:
+        device = _source_devices[src_dir] = os.stat(src_dir).st_dev
+    return device
+
+def place(src, name, dir_fd, method=SYMLINK, dir_dev=None):
+    """
+    Create name (relative to dir_fd) from src with the given method,
+    falling back along FALLBACKS if the filesystem can't do it.
+
+    The fallback that worked is remembered per pair of devices (dir_dev is
+    the device of dir_fd, if the caller knows it). Returns what the
+    manifest records about the file: {} for a symlink, otherwise
+    {'method': method used, 'inode': inode of the new file}.
+    """
+    key = None
+    if method in FALLBACKS:
+        if dir_dev is None:
+            dir_dev = os.fstat(dir_fd).st_dev
+        key = (method, _source_device(src), dir_dev)
+        method = _working_methods.get(key, method)
+    while True:
+        try:
+            if method == SYMLINK:
+                os.symlink(src, name, dir_fd=dir_fd)
+                return {}
+            if method == HARDLINK:
+                os.link(src, name, dst_dir_fd=dir_fd)
+            else:
+                _copy_file(src, name, dir_fd, clone=(method == REFLINK))
+            break
+        except OSError as e:
+            if e.errno not in UNSUPPORTED_ERRNOS or method not in FALLBACKS:
+                raise
+            method = FALLBACKS[method]
+            if key is not None and e.errno not in PER_FILE_ERRNOS:
+                _working_methods[key] = method
+    return {'method': method, 'inode': os.stat(name, dir_fd=dir_fd, follow_symlinks=False).st_ino}
+
+def place_file(src, dest, method=SYMLINK, created_dirs=None):
+    """place() for a single absolute path (creating its directory, see apply_links)"""
+    dir_path, name = os.path.split(dest)
+    make_dirs(dir_path, created_dirs)
+    dir_fd = os.open(dir_path, DIR_FLAGS)
+    try:
+        return place(src, name, dir_fd, method)
+    finally:
+        os.close(dir_fd)
+
+def apply_links(links, dry_run=False, method=SYMLINK, created_dirs=None, on_replace=None):
+    """
+    Place staging files for (src, dest) pairs, replacing whatever is at dest.
+
+    Returns a list of (src, dest, placed) for the files that were (or
+    would be) placed, with placed as returned by place(). Entries blocked
+    by a real directory are reported and skipped. Directories that had to
+    be created are appended to created_dirs, parents first. on_replace is
+    called with the path of every regular file about to be replaced.
+    """
+    if dry_run:
+        return [(src, dest, {} if method == SYMLINK else {'method': method}) for src, dest in links]
+
+    created = []
+    groups = group_by_directory(links, path_of=lambda link: link[1])
+
+    # Parents before children so makedirs only runs for missing directories
+    for dir_path in sorted(groups):
+        make_dirs(dir_path, created_dirs)
+        dir_fd = os.open(dir_path, DIR_FLAGS)
+        try:
+            dir_dev = os.fstat(dir_fd).st_dev if method in FALLBACKS else None
+            existing = list_directory(dir_fd)
+            for name, (src, dest) in groups[dir_path]:
+                if name in existing:
+                    entry = existing[name]
+                    if entry is not None and entry.is_dir(follow_symlinks=False):
+                        print(f"  ✗ Cannot link {dest}: a directory is in the way")
+                        continue
+                    if on_replace is not None and entry is not None and entry.is_file(follow_symlinks=False):
+                        on_replace(dest)
+                    os.unlink(name, dir_fd=dir_fd)
+                placed = place(src, name, dir_fd, method, dir_dev)
+                # Created by us in this batch: known not to be a directory
+                existing[name] = None
+                created.append((src, dest, placed))
+        finally:
+            os.close(dir_fd)
+
+    return created
+
+def unlink_paths(paths):
+    """
+    Remove files/symlinks grouped by directory.
+
+    Returns (removed, failed) where failed is a list of (path, error).
+    """
+    removed = []
+    failed = []
+
+    for dir_path, names in group_by_directory(paths).items():
+        try:
+            dir_fd = os.open(dir_path, DIR_FLAGS)
+        except OSError as e:
+            failed.extend((path, e) for _, path in names)
+            continue
+        try:
+            for name, path in names:
+                try:
+                    os.unlink(name, dir_fd=dir_fd)
+                    removed.append(path)
+                except OSError as e:
+                    failed.append((path, e))
+        finally:
+            os.close(dir_fd)
+
+    return removed, failed
+
+# renameat2() flag: atomically swap two existing paths
+RENAME_EXCHANGE = 2
+AT_FDCWD = -100
+
+def exchange_paths(path_a, path_b):
+    """
+    Atomically swap two paths (directories or files) with renameat2().
+
+    Returns False if the kernel, libc or filesystem can't do it, so the
+    caller can fall back to two renames.
+    """
+    import ctypes
+    import errno
+
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        renameat2 = libc.renameat2
+    except (OSError, AttributeError):
+        return False
+    renameat2.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    if renameat2(AT_FDCWD, os.fsencode(path_a), AT_FDCWD, os.fsencode(path_b), RENAME_EXCHANGE) == 0:
+        return True
+    err = ctypes.get_errno()
+    if err in (errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+        return False
+    raise OSError(err, os.strerror(err), path_a)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Content-addressed backup store for game files replaced by a deployment.
+
+Deploying the BepInEx framework into the game root overwrites files that
+may already be there (e.g. a vanilla winhttp.dll or doorstop_config.ini).
+Before such a file is replaced, it is stored once under its SHA-256 in
+game_backups/ (hardlinked when the store is on the same filesystem) and
+recorded in the deploy manifest. Undeploying puts it back, touching only
+the replaced files instead of having Steam verify the whole game.
+"""
+import hashlib
+import os
+import shutil
+import stat
+import config
+import fs_batch
+
+OBJECTS_DIR = 'objects'
+
+CHUNK_SIZE = 1024 * 1024
+
+def _object_path(digest):
+    return os.path.join(config.GAME_BACKUP_DIR, OBJECTS_DIR, digest[:2], digest)
+
+def _hash_file(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def back_up(path):
+    """
+    Store the file at path before it is replaced.
+
+    Identical files are stored once. Returns the record the manifest
+    keeps for it: hash, size, mode and mtime.
+    """
+    st = os.lstat(path)
+    digest = _hash_file(path)
+    object_path = _object_path(digest)
+    if not os.path.exists(object_path):
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        tmp_path = object_path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        # The game file is unlinked right after, so a hardlink is a move
+        try:
+            os.link(path, tmp_path)
+        except OSError:
+            shutil.copy2(path, tmp_path)
+        os.replace(tmp_path, object_path)
+    return {'hash': digest, 'size': st.st_size, 'mode': stat.S_IMODE(st.st_mode), 'mtime_ns': st.st_mtime_ns}
+
+def restore(dest, record, created_dirs=None):
+    """
+    Put a backed-up file back at dest.
+
+    Returns False if something else is at dest by now (it is left alone)
+    or the object is missing from the store. The file is a copy (or
+    reflink) of the object, so the game can't modify the stored version.
+    """
+    if os.path.lexists(dest):
+        return False
+    object_path = _object_path(record['hash'])
+    if not os.path.exists(object_path):
+        print(f"  ✗ Cannot restore {dest}: backup {record['hash']} missing from {config.GAME_BACKUP_DIR}")
+        return False
+    fs_batch.place_file(object_path, dest, fs_batch.REFLINK, created_dirs)
+    os.chmod(dest, record['mode'])
+    os.utime(dest, ns=(record['mtime_ns'], record['mtime_ns']))
+    return True
+
+def restore_all(backups):
+    """Restore every {dest: record} of a manifest, returns (restored, skipped) dest lists"""
+    restored = []
+    skipped = []
+    for dest, record in backups.items():
+        try:
+            ok = restore(dest, record)
+        except OSError as e:
+            print(f"  ✗ Failed to restore {dest}: {e}")
+            ok = False
+        (restored if ok else skipped).append(dest)
+    return restored, skipped
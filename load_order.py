@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Load order of mods from their Vortex rules.
+
+Vortex stores per-mod rules under persistent###mods###<game>###<mod>###rules:
+
+  {"type": "before", "reference": {...}}    this mod loads before the other
+  {"type": "after", "reference": {...}}     this mod loads after the other
+  {"type": "requires", "reference": {...}}  loads after what it requires
+
+A mod that loads later wins a file both mods have. The rules form a graph;
+Kahn's algorithm peels it into layers (depth 0: nothing has to load
+before the mod, depth 1: only depth-0 mods have to, ...), so sorting by
+(depth, mod_rank) is a topological order that equals the plain
+mod_rank order when there are no rules. Mods on a cycle are reported and
+the rules between them ignored.
+
+References are matched by mod id, fileMD5, logicalFileName or
+fileExpression (a glob on the logical file name); other rule types and
+versionMatch are ignored.
+
+Two things are cached: the parsed rules of every mod, under a digest of
+their value, and the result for the whole graph, under a digest of its
+edges. References are resolved and the edges rebuilt on every call, and
+any change to the graph sorts all of it again; that is a linear pass over
+the mods that have rules, which is small next to reading them.
+"""
+import fnmatch
+import hashlib
+import json
+import os
+import config
+
+CACHE_VERSION = 1
+
+# Rule type -> True if the mod with the rule loads after the referenced one
+ORDER_RULES = {'before': False, 'after': True, 'requires': True}
+
+# Attributes a reference can match on
+MATCH_ATTRIBUTES = ('fileMD5', 'logicalFileName')
+
+def _digest(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+def parse_rules(rules):
+    """Ordering rules of one mod as [(loads after?, reference)]"""
+    parsed = []
+    for rule in rules or []:
+        if not isinstance(rule, dict) or rule.get('type') not in ORDER_RULES:
+            continue
+        reference = rule.get('reference')
+        if isinstance(reference, dict):
+            parsed.append((ORDER_RULES[rule['type']], reference))
+    return parsed
+
+class ReferenceIndex:
+    """Finds the mods a rule reference points to"""
+
+    def __init__(self, mod_ids, attributes):
+        self.mod_ids = set(mod_ids)
+        # mod id -> {fileMD5, logicalFileName}, looked up only when a reference needs it
+        self.attributes = attributes
+        self.by_attribute = None
+
+    def _build(self):
+        self.by_attribute = {name: {} for name in MATCH_ATTRIBUTES}
+        for mod_id in self.mod_ids:
+            values = self.attributes(mod_id) or {}
+            for name in MATCH_ATTRIBUTES:
+                value = values.get(name)
+                if value:
+                    self.by_attribute[name].setdefault(value.lower(), []).append(mod_id)
+
+    def resolve(self, reference):
+        """Ids of the mods a reference matches"""
+        mod_id = reference.get('id')
+        if mod_id:
+            return [mod_id] if mod_id in self.mod_ids else []
+        if self.by_attribute is None:
+            self._build()
+        for name in MATCH_ATTRIBUTES:
+            value = reference.get(name)
+            if value:
+                return self.by_attribute[name].get(value.lower(), [])
+        expression = reference.get('fileExpression')
+        if expression:
+            expression = expression.lower()
+            return [mod_id for name, mod_ids in self.by_attribute['logicalFileName'].items()
+                    if fnmatch.fnmatchcase(name, expression) for mod_id in mod_ids]
+        return []
+
+def layers(nodes, edges):
+    """
+    Kahn's algorithm in layers.
+
+    edges are (earlier, later) pairs. Returns (depths, cyclic): the depth of
+    every node that could be ordered and the set of nodes left on cycles.
+    """
+    successors = {node: [] for node in nodes}
+    indegree = {node: 0 for node in nodes}
+    for earlier, later in edges:
+        successors[earlier].append(later)
+        indegree[later] += 1
+
+    depths = {}
+    layer = [node for node in nodes if indegree[node] == 0]
+    depth = 0
+    while layer:
+        next_layer = []
+        for node in layer:
+            depths[node] = depth
+            for successor in successors[node]:
+                indegree[successor] -= 1
+                if indegree[successor] == 0:
+                    next_layer.append(successor)
+        layer = next_layer
+        depth += 1
+    return depths, set(nodes) - set(depths)
+
+def find_cycle(cyclic, edges):
+    """One cycle through the given nodes, as a list of nodes (first == last)"""
+    predecessors = {}
+    for earlier, later in edges:
+        if earlier in cyclic and later in cyclic:
+            predecessors.setdefault(later, []).append(earlier)
+    # Every node Kahn's algorithm left has a predecessor that was left too,
+    # so walking backwards from any of them runs into a cycle
+    node = min(cyclic)
+    seen = {}
+    path = []
+    while node not in seen:
+        seen[node] = len(path)
+        path.append(node)
+        node = min(predecessors[node])
+    cycle = path[seen[node]:] + [node]
+    cycle.reverse()
+    return cycle
+
+class LoadOrder:
+    """Depth of every mod in the rule graph, plus the cycles that were broken"""
+
+    def __init__(self, depths=None, cycles=None, edges=0):
+        self.depths = depths or {}
+        self.cycles = cycles or []
+        self.edges = edges
+
+    def depth(self, mod_id):
+        return self.depths.get(mod_id, 0)
+
+    def digest(self):
+        """Digest of the order the rules produce (a deployment depends on it)"""
+        return _digest([sorted(self.depths.items()), self.cycles])
+
+def build(rules, attributes, cache_path=None):
+    """
+    Compute the load order of a set of mods.
+
+    rules maps every mod id to its decoded rules value (None without
+    rules); attributes(mod_id) returns a dict with the mod's fileMD5 and
+    logicalFileName and is only called if a reference needs them. Not
+    incremental: only parsing, and the result of an unchanged graph, come
+    from the cache.
+    """
+    cache_path = cache_path or config.LOAD_ORDER_CACHE
+    cache = _load_cache(cache_path)
+    dirty = False
+
+    parsed = {}
+    cached_mods = cache['mods']
+    for mod_id in [mod_id for mod_id in cached_mods if not rules.get(mod_id)]:
+        del cached_mods[mod_id]
+        dirty = True
+    for mod_id, value in rules.items():
+        if not value:
+            continue
+        digest = _digest(value)
+        cached = cached_mods.get(mod_id)
+        if cached is None or cached['digest'] != digest:
+            cached = cached_mods[mod_id] = {'digest': digest, 'rules': parse_rules(value)}
+            dirty = True
+        if cached['rules']:
+            parsed[mod_id] = cached['rules']
+
+    index = ReferenceIndex(rules, attributes)
+    edges = set()
+    for mod_id, mod_rules in parsed.items():
+        for loads_after, reference in mod_rules:
+            for other in index.resolve(reference):
+                if other != mod_id:
+                    edges.add((other, mod_id) if loads_after else (mod_id, other))
+    edges = sorted(edges)
+
+    # Mods without an edge are at depth 0, only the others are sorted
+    nodes = sorted({node for edge in edges for node in edge})
+    graph_key = _digest([nodes, edges])
+    if cache['graph'].get('key') == graph_key:
+        order = LoadOrder(cache['graph']['depths'], cache['graph']['cycles'], len(edges))
+    else:
+        kept = edges
+        depths, cyclic = layers(nodes, kept)
+        cycles = []
+        on_cycle = set()
+        while cyclic:
+            # Ignore the rules between mods of a cycle, keep the others
+            cycle = find_cycle(cyclic, kept)
+            cycles.append(cycle)
+            on_cycle.update(cycle)
+            kept = [(a, b) for a, b in edges if not (a in on_cycle and b in on_cycle)]
+            depths, cyclic = layers(nodes, kept)
+        order = LoadOrder({node: depth for node, depth in depths.items() if depth}, cycles, len(edges))
+        cache['graph'] = {'key': graph_key, 'depths': order.depths, 'cycles': order.cycles}
+        dirty = True
+
+    if dirty:
+        _save_cache(cache_path, cache)
+    return order
+
+def read_rules(db, game, mod_ids):
+    """
+    Rules of the given mods by point lookups, plus an attributes() for build().
+
+    Cheaper than a scan when only the active profile's enabled mods matter.
+    """
+    import vortex_keys
+    rules = {mod_id: vortex_keys.get(db, 'mod_rules', game, mod=mod_id) for mod_id in mod_ids}
+
+    def attributes(mod_id):
+        return {name: vortex_keys.get(db, 'mod_attribute', game, mod=mod_id, attribute=name)
+                for name in MATCH_ATTRIBUTES}
+    return rules, attributes
+
+def _load_cache(cache_path):
+    try:
+        with open(cache_path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    if data.get('version') != CACHE_VERSION:
+        data = {}
+    mods = data.get('mods', {})
+    for cached in mods.values():
+        cached['rules'] = [tuple(rule) for rule in cached['rules']]
+    return {'mods': mods, 'graph': data.get('graph', {})}
+
+def _save_cache(cache_path, cache):
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': CACHE_VERSION, **cache}, f, separators=(',', ':'))
+    os.replace(tmp_path, cache_path)
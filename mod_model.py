@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Compact in-memory model of installed mods and profiles.
+
+Mod ids such as `Ancient Sword (BepInEx - Nautilus)-226-1-9-1755769809`
+used to be repeated as dict keys in several maps, once per profile. Here
+every mod id and profile id is interned once and mapped to a small int;
+mods are __slots__ records in a list indexed by that int, and per-profile
+enabled flags and enable times are parallel arrays over the same index.
+"""
+import sys
+from array import array
+from enum import Enum
+
+class ModType(Enum):
+    """Vortex mod types (unknown types map to OTHER, raw value kept on the record)"""
+    NONE = ''
+    BEPINEX_5 = 'bepinex-5'
+    BEPINEX_PLUGIN = 'bepinex-plugin'
+    COLLECTION = 'collection'
+    DINPUT = 'dinput'
+    ENB = 'enb'
+    OTHER = '<other>'
+
+    @classmethod
+    def parse(cls, value):
+        if value is None:
+            return cls.NONE
+        try:
+            return cls(value)
+        except ValueError:
+            return cls.OTHER
+
+class ModState(Enum):
+    """Vortex mod install states"""
+    NONE = ''
+    INSTALLED = 'installed'
+    INSTALLING = 'installing'
+    DOWNLOADED = 'downloaded'
+    OTHER = '<other>'
+
+    @classmethod
+    def parse(cls, value):
+        if value is None:
+            return cls.NONE
+        try:
+            return cls(value)
+        except ValueError:
+            return cls.OTHER
+
+# Enabled flags per profile: one byte per mod index
+UNSET = 0
+DISABLED = 1
+ENABLED = 2
+
+class ModRecord:
+    """One mod. `id` is the interned id string shared with the library"""
+    __slots__ = ('index', 'id', 'installed', 'name', 'version', 'author', 'mod_type',
+                 'raw_type', 'state', 'installation_path', 'attributes')
+
+    def __init__(self, index, mod_id):
+        self.index = index
+        self.id = mod_id
+        # False for ids only known from a profile's modState (uninstalled mods)
+        self.installed = False
+        self.name = None
+        self.version = None
+        self.author = None
+        self.mod_type = ModType.NONE
+        # Only set for ModType.OTHER, so unknown types are not lost
+        self.raw_type = None
+        self.state = ModState.NONE
+        self.installation_path = None
+        # Extra attributes the caller asked to keep (None until one is set)
+        self.attributes = None
+
+    @property
+    def type_name(self):
+        """The type string as stored by Vortex ('unknown' if there is none)"""
+        if self.mod_type is ModType.OTHER:
+            return self.raw_type
+        return self.mod_type.value or 'unknown'
+
+    @property
+    def state_name(self):
+        return self.state.value or 'unknown'
+
+    @property
+    def display_name(self):
+        return self.name or self.id
+
+    def attribute(self, name, default=None):
+        if self.attributes is None:
+            return default
+        return self.attributes.get(name, default)
+
+    def __repr__(self):
+        return f"ModRecord({self.id!r}, type={self.type_name!r})"
+
+# Attributes with a dedicated slot on ModRecord
+SLOT_ATTRIBUTES = {'name': 'name', 'modVersion': 'version', 'author': 'author'}
+
+class ModLibrary:
+    """All mods of one game plus per-profile state, keyed by interned small ints"""
+
+    def __init__(self, keep_attributes=()):
+        self.records = []
+        self._mod_index = {}
+        self.profile_ids = []
+        self.profile_names = []
+        self._profile_index = {}
+        self._enabled = []
+        self._enabled_time = []
+        # Attributes without a slot are dropped unless listed here
+        self.keep_attributes = frozenset(keep_attributes)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def mod_index(self, mod_id):
+        """Small int for a mod id, interning it on first use"""
+        index = self._mod_index.get(mod_id)
+        if index is None:
+            mod_id = sys.intern(mod_id)
+            index = len(self.records)
+            self._mod_index[mod_id] = index
+            self.records.append(ModRecord(index, mod_id))
+        return index
+
+    def record(self, mod_id):
+        """Record for a mod id, created if it does not exist yet"""
+        return self.records[self.mod_index(mod_id)]
+
+    def add_mod(self, mod_id):
+        """Record for an installed mod (seen under persistent###mods###<game>)"""
+        record = self.record(mod_id)
+        record.installed = True
+        return record
+
+    def installed_records(self):
+        return [record for record in self.records if record.installed]
+
+    def get(self, mod_id):
+        """Record for a mod id, None if unknown"""
+        index = self._mod_index.get(mod_id)
+        return None if index is None else self.records[index]
+
+    def profile_index(self, profile_id):
+        """Small int for a profile id, interning it on first use"""
+        index = self._profile_index.get(profile_id)
+        if index is None:
+            profile_id = sys.intern(profile_id)
+            index = len(self.profile_ids)
+            self._profile_index[profile_id] = index
+            self.profile_ids.append(profile_id)
+            self.profile_names.append(None)
+            self._enabled.append(bytearray())
+            self._enabled_time.append(array('q'))
+        return index
+
+    def set_field(self, mod_id, field, value):
+        """Store a top-level mod field (installationPath, type, state)"""
+        record = self.add_mod(mod_id)
+        if field == 'installationPath':
+            record.installation_path = value
+        elif field == 'type':
+            record.mod_type = ModType.parse(value)
+            record.raw_type = value if record.mod_type is ModType.OTHER else None
+        elif field == 'state':
+            record.state = ModState.parse(value)
+
+    def set_attribute(self, mod_id, name, value):
+        """Store a mod attribute if it has a slot or was asked for"""
+        record = self.add_mod(mod_id)
+        slot = SLOT_ATTRIBUTES.get(name)
+        if slot is not None:
+            setattr(record, slot, value)
+        elif name in self.keep_attributes:
+            if record.attributes is None:
+                record.attributes = {}
+            record.attributes[sys.intern(name)] = value
+
+    def set_profile_name(self, profile_id, name):
+        self.profile_names[self.profile_index(profile_id)] = name
+
+    def profile_name(self, profile_id, default=None):
+        index = self._profile_index.get(profile_id)
+        if index is None or self.profile_names[index] is None:
+            return default
+        return self.profile_names[index]
+
+    def _grow(self, column, index, fill):
+        if len(column) <= index:
+            column.extend([fill] * (index + 1 - len(column)))
+
+    def set_enabled(self, profile_id, mod_id, enabled):
+        flags = self._enabled[self.profile_index(profile_id)]
+        index = self.mod_index(mod_id)
+        self._grow(flags, index, UNSET)
+        flags[index] = ENABLED if enabled else DISABLED
+
+    def set_enabled_time(self, profile_id, mod_id, enabled_time):
+        times = self._enabled_time[self.profile_index(profile_id)]
+        index = self.mod_index(mod_id)
+        self._grow(times, index, 0)
+        times[index] = int(enabled_time)
+
+    def enabled_flags(self, profile_id):
+        """Per-mod-index enabled flags of a profile (UNSET/DISABLED/ENABLED)"""
+        index = self._profile_index.get(profile_id)
+        return bytearray() if index is None else self._enabled[index]
+
+    def is_enabled(self, profile_id, mod_id):
+        profile_index = self._profile_index.get(profile_id)
+        index = self._mod_index.get(mod_id)
+        if profile_index is None or index is None:
+            return False
+        flags = self._enabled[profile_index]
+        return index < len(flags) and flags[index] == ENABLED
+
+    def enabled_time(self, profile_id, mod_id):
+        """enabledTime of a mod in a profile, None if not recorded"""
+        profile_index = self._profile_index.get(profile_id)
+        index = self._mod_index.get(mod_id)
+        if profile_index is None or index is None:
+            return None
+        times = self._enabled_time[profile_index]
+        if index >= len(times) or not times[index]:
+            return None
+        return times[index]
+
+    def enabled_records(self, profile_id):
+        """Records of all mods with enabled=true in a profile, in index order"""
+        flags = self.enabled_flags(profile_id)
+        return [self.records[i] for i, flag in enumerate(flags) if flag == ENABLED]
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Machine-readable output for the listing scripts.
+
+find_mod_paths.py and find_enabled_mods.py print prose by default. With
+--format json, jsonl or tsv they write one record per mod instead,
+through a single buffered writer, as the records are produced (sorted
+output, like find_enabled_mods.py's, once the sort is done):
+
+  json   one JSON array, one record per line
+  jsonl  one JSON object per line
+  tsv    a header line, then tab-separated values (tabs, newlines and
+         backslashes escaped as \\t, \\n and \\\\)
+
+--fields picks and orders the columns. Names are the record keys
+(installation_path) or their camelCase spelling as Vortex uses it
+(installationPath). Status messages go to stderr in these formats, so
+stdout holds only the records.
+"""
+import io
+import json
+import re
+import sys
+
+TEXT = 'text'
+JSON = 'json'
+JSONL = 'jsonl'
+TSV = 'tsv'
+
+FORMATS = [TEXT, JSON, JSONL, TSV]
+
+# One write() per 64 KiB instead of one per line
+BUFFER_SIZE = 64 * 1024
+
+def _snake_case(name):
+    return re.sub(r'(?<!^)([A-Z])', r'_\1', name).lower()
+
+def parse_fields(spec, available):
+    """
+    Turn a --fields value into [(column name, record key)].
+
+    Without spec, all available keys in their order. Raises ValueError
+    for unknown fields.
+    """
+    if not spec:
+        return [(key, key) for key in available]
+    fields = []
+    for name in (part.strip() for part in spec.split(',')):
+        if not name:
+            continue
+        key = name if name in available else _snake_case(name)
+        if key not in available:
+            raise ValueError(f"unknown field '{name}' (choose from {', '.join(available)})")
+        fields.append((name, key))
+    if not fields:
+        raise ValueError("no fields given")
+    return fields
+
+def _tsv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        value = 'true' if value else 'false'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+class RecordWriter:
+    """Streams records to stdout in one of the machine formats"""
+
+    def __init__(self, fmt, fields, stream=None):
+        self.fmt = fmt
+        self.fields = fields
+        self.count = 0
+        if stream is None:
+            # Our own buffer on stdout's descriptor, anything printed before goes first
+            sys.stdout.flush()
+            stream = io.TextIOWrapper(io.BufferedWriter(io.FileIO(sys.stdout.fileno(), 'w', closefd=False),
+                                                        BUFFER_SIZE), encoding='utf-8', newline='\n')
+        self.out = stream
+        if fmt == TSV:
+            self.out.write('\t'.join(name for name, _ in fields) + '\n')
+        elif fmt == JSON:
+            self.out.write('[')
+
+    def write(self, record):
+        """Write one record (a dict), keeping only the selected fields"""
+        if self.fmt == TSV:
+            self.out.write('\t'.join(_tsv_value(record.get(key)) for _, key in self.fields) + '\n')
+        else:
+            line = json.dumps({name: record.get(key) for name, key in self.fields}, ensure_ascii=False)
+            if self.fmt == JSON:
+                line = ('\n' if self.count == 0 else ',\n') + line
+            else:
+                line += '\n'
+            self.out.write(line)
+        self.count += 1
+
+    def close(self):
+        """Finish the output (closes the JSON array) and flush it"""
+        if self.fmt == JSON:
+            self.out.write('\n]\n' if self.count else ']\n')
+        try:
+            self.out.flush()
+        except BrokenPipeError:
+            # The reader (e.g. head) is gone, which is fine
+            pass
+
+def write_records(records, fmt, fields):
+    """Write an iterable of records, returns how many were written"""
+    writer = RecordWriter(fmt, fields)
+    try:
+        for record in records:
+            writer.write(record)
+    except BrokenPipeError:
+        pass
+    finally:
+        writer.close()
+    return writer.count
+
+def add_arguments(parser):
+    """Add --format and --fields to a listing script's parser"""
+    parser.add_argument('--format', choices=FORMATS, default=TEXT,
+                        help='Output format (default: text); json, jsonl and tsv write one record per mod')
+    parser.add_argument('--fields', default=None, metavar='FIELD,...',
+                        help='Fields to output with --format json/jsonl/tsv, e.g. name,version,type,installationPath')
+
+def check_arguments(parser, args, available):
+    """Validate --format/--fields, returns the parsed fields (None for text)"""
+    if args.format == TEXT:
+        if args.fields:
+            parser.error('--fields needs --format json, jsonl or tsv')
+        return None
+    try:
+        return parse_fields(args.fields, available)
+    except ValueError as e:
+        parser.error(str(e))
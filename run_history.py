@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Persistent history of deploy, cleanup and scan runs.
+
+Every run appends one JSON line to run_history.jsonl: total and per-phase
+timings, its workload (links, keys, files), the database size, enabled
+mod count and cache hit rates. `stats` shows trends and flags runs that
+were much slower than earlier runs of the same command with a similar
+workload, e.g. after a Vortex update bloated state.v2.
+"""
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+import config
+
+# Earlier comparable runs that make up the baseline
+BASELINE_RUNS = 10
+# Fewer comparable runs than this: no verdict
+MIN_BASELINE_RUNS = 3
+# Runs whose workload is within this fraction of each other are comparable
+WORKLOAD_TOLERANCE = 0.25
+# Flag runs slower than this multiple of the baseline median...
+REGRESSION_FACTOR = 1.5
+# ...unless they are only this many seconds slower (noise on fast runs)
+MIN_REGRESSION_SECONDS = 0.5
+
+# Fields that describe the size of a run's work, most specific first
+WORKLOAD_FIELDS = ['links', 'db_keys', 'files', 'enabled_mods', 'db_bytes']
+
+class Run:
+    """One recorded run; use start() and current() rather than creating it directly"""
+
+    def __init__(self, command, **fields):
+        self.record = {'command': command, 'started': time.strftime('%Y-%m-%dT%H:%M:%S')}
+        self.record.update(fields)
+        self.phases = {}
+        self.start_time = time.perf_counter()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time a phase; repeated phases add up"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - start
+
+    def set(self, **fields):
+        self.record.update(fields)
+
+    def set_db(self, db_path):
+        """Record the on-disk size of a database directory"""
+        try:
+            self.record['db_bytes'] = sum(entry.stat().st_size for entry in os.scandir(db_path)
+                                          if entry.is_file())
+        except OSError:
+            pass
+
+    def finish(self, success=True):
+        """Append the record to the history file (never fails the run)"""
+        self.record['seconds'] = round(time.perf_counter() - self.start_time, 3)
+        self.record['success'] = bool(success)
+        self.record['phases'] = {name: round(seconds, 3) for name, seconds in self.phases.items()}
+        try:
+            with open(config.RUN_HISTORY, 'a') as f:
+                f.write(json.dumps(self.record, sort_keys=True) + '\n')
+        except OSError as e:
+            print(f"Warning: Could not write run history: {e}", file=sys.stderr)
+
+class _NoRun(Run):
+    """Stand-in when no run is being recorded (e.g. library use by the daemon)"""
+
+    def __init__(self):
+        super().__init__(None)
+
+    def finish(self, success=True):
+        pass
+
+_current = None
+
+def start(command, **fields):
+    """Start recording a run; code below can reach it with current()"""
+    global _current
+    _current = Run(command, **fields)
+    return _current
+
+def current():
+    """The run being recorded, or a stand-in that records nothing"""
+    return _current if _current is not None else _NoRun()
+
+def load_history(path=None):
+    """All recorded runs, oldest first (unreadable lines are skipped)"""
+    path = path or config.RUN_HISTORY
+    runs = []
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    runs.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return runs
+
+def workload(run):
+    """(field, size) of a run's work, (None, None) if it recorded none"""
+    for field in WORKLOAD_FIELDS:
+        if run.get(field) is not None:
+            return field, run[field]
+    return None, None
+
+def _comparable(run, other):
+    field, size = workload(run)
+    other_field, other_size = workload(other)
+    if field != other_field:
+        return False
+    if not size:
+        return not other_size
+    return abs(other_size - size) <= WORKLOAD_TOLERANCE * size
+
+def find_regressions(runs):
+    """
+    {index: (baseline seconds, factor)} for runs much slower than the
+    median of the earlier successful runs of the same command and workload.
+    """
+    regressions = {}
+    for i, run in enumerate(runs):
+        if not run.get('success'):
+            continue
+        baseline = [other['seconds'] for other in runs[:i]
+                    if other.get('command') == run.get('command') and other.get('success')
+                    and _comparable(run, other)][-BASELINE_RUNS:]
+        if len(baseline) < MIN_BASELINE_RUNS:
+            continue
+        median = statistics.median(baseline)
+        if run['seconds'] > median * REGRESSION_FACTOR and run['seconds'] - median > MIN_REGRESSION_SECONDS:
+            regressions[i] = (median, run['seconds'] / median if median else float('inf'))
+    return regressions
+
+def format_size(size):
+    """Human-readable size in bytes (also used by verify_staging.py)"""
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return f"{size} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+def print_stats(command=None, last=20):
+    """Recent runs with regression flags, then per-command trends"""
+    runs = load_history()
+    regressions = find_regressions(runs)
+    indexed = [(i, run) for i, run in enumerate(runs) if command is None or run.get('command') == command]
+    if not indexed:
+        print("No runs recorded yet.")
+        return
+
+    print("="*80)
+    print(f"RECENT RUNS (last {min(last, len(indexed))} of {len(indexed)})")
+    print("="*80)
+    for i, run in indexed[-last:]:
+        field, size = workload(run)
+        work = f"{size} {field}" if field and field != 'db_bytes' else ''
+        db_size = format_size(run['db_bytes']) if run.get('db_bytes') is not None else ''
+        mark = '✓' if run.get('success') else '✗'
+        print(f"{mark} {run['started'].replace('T', ' ')}  {run['command']:14s} {run['seconds']:8.2f}s  "
+              f"{work:18s} {db_size:>10s}")
+        phases = run.get('phases') or {}
+        if len(phases) > 1:
+            print("    " + ', '.join(f"{name} {seconds:.2f}s" for name, seconds in phases.items()))
+        if run.get('cache_hit_rate') is not None:
+            print(f"    staging cache hit rate {run['cache_hit_rate']:.0%}")
+        if i in regressions:
+            median, factor = regressions[i]
+            print(f"    ⚠ {factor:.1f}x slower than the baseline ({median:.2f}s median of comparable runs)")
+
+    print()
+    print("="*80)
+    print("TRENDS")
+    print("="*80)
+    commands = sorted({run['command'] for _, run in indexed})
+    for name in commands:
+        command_runs = [run for _, run in indexed if run['command'] == name and run.get('success')]
+        if not command_runs:
+            continue
+        seconds = [run['seconds'] for run in command_runs]
+        line = f"{name:14s} {len(command_runs):4d} runs, median {statistics.median(seconds):.2f}s"
+        sizes = [run['db_bytes'] for run in command_runs if run.get('db_bytes')]
+        if len(sizes) > 1:
+            growth = (sizes[-1] - sizes[0]) / sizes[0] if sizes[0] else 0
+            line += f", DB {format_size(sizes[0])} → {format_size(sizes[-1])} ({growth:+.0%})"
+        flagged = sum(1 for i, run in indexed if run['command'] == name and i in regressions)
+        if flagged:
+            line += f", ⚠ {flagged} slow runs"
+        print(line)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Show the history of deploy, cleanup and scan runs',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Recent runs, slow-run warnings and trends
+  python3 run_history.py stats
+
+  # Only deployments, last 50
+  python3 run_history.py stats --command deploy --last 50
+        """
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    stats_parser = subparsers.add_parser('stats', help='Show recent runs, regressions and trends')
+    stats_parser.add_argument('--command', dest='run_command', default=None,
+                              help='Only runs of this command (deploy, cleanup, export, ...)')
+    stats_parser.add_argument('--last', type=int, default=20, help='Number of recent runs to list (default: 20)')
+
+    args = parser.parse_args()
+
+    print_stats(args.run_command, args.last)
+    sys.exit(0)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Shadow-tree deployment of BepInEx/plugins.
+
+The new plugin tree is built in plugins.shadow next to the live
+directory and switched in with a single renameat2(RENAME_EXCHANGE), so
+the game never sees a half-deployed plugins directory. The replaced
+tree is kept as plugins.previous, and rolling back is the same swap in
+the other direction.
+
+Only the plugins directory can be swapped: the BepInEx framework is
+deployed into the game root, which also holds the game itself.
+"""
+import os
+import shutil
+import fs_batch
+
+SHADOW_SUFFIX = '.shadow'
+PREVIOUS_SUFFIX = '.previous'
+
+def plugins_dir(game_path):
+    return os.path.join(game_path, 'BepInEx', 'plugins')
+
+def shadow_dir(live_dir):
+    return live_dir + SHADOW_SUFFIX
+
+def previous_dir(live_dir):
+    return live_dir + PREVIOUS_SUFFIX
+
+def to_shadow(path, live_dir):
+    """Where a path below the live directory is built in the shadow tree (None if it is not below it)"""
+    if path == live_dir or path.startswith(live_dir + os.sep):
+        return shadow_dir(live_dir) + path[len(live_dir):]
+    return None
+
+def to_live(path, live_dir):
+    """The live path of a path below the shadow tree (other paths are returned as they are)"""
+    shadow = shadow_dir(live_dir)
+    if path == shadow or path.startswith(shadow + os.sep):
+        return live_dir + path[len(shadow):]
+    return path
+
+def side_trees(live_dir):
+    """The shadow and previous trees next to the live directory that exist"""
+    return [path for path in (shadow_dir(live_dir), previous_dir(live_dir)) if os.path.lexists(path)]
+
+def prepare_shadow(live_dir, owned, owned_dirs=(), created_dirs=None):
+    """
+    Create an empty shadow tree and carry over everything in the live tree
+    that the last deployment did not create (`owned` and `owned_dirs` are
+    the live files and directories recorded in its manifest).
+
+    Real files are hardlinked (copied across devices), foreign symlinks are
+    recreated, and every other directory is rebuilt, empty ones included
+    (a plugin may expect its folder). The shadow root and any parents it
+    needed are appended to created_dirs. Returns the number of carried entries.
+    """
+    shadow = shadow_dir(live_dir)
+    # Left over from an interrupted deployment
+    if os.path.lexists(shadow):
+        shutil.rmtree(shadow)
+    fs_batch.make_dirs(shadow, created_dirs)
+
+    owned_dirs = set(owned_dirs)
+    carried = 0
+    for dir_path, dir_names, file_names in os.walk(live_dir):
+        target_dir = to_shadow(dir_path, live_dir)
+        if dir_path not in owned_dirs:
+            os.makedirs(target_dir, exist_ok=True)
+        for name in dir_names[:]:
+            if os.path.islink(os.path.join(dir_path, name)):
+                # os.walk does not descend into directory symlinks
+                dir_names.remove(name)
+                file_names.append(name)
+        for name in file_names:
+            path = os.path.join(dir_path, name)
+            if path in owned:
+                continue
+            # A directory of ours that holds a foreign file
+            os.makedirs(target_dir, exist_ok=True)
+            dest = os.path.join(target_dir, name)
+            if os.path.islink(path):
+                os.symlink(os.readlink(path), dest)
+            else:
+                try:
+                    os.link(path, dest)
+                except OSError:
+                    shutil.copy2(path, dest)
+            carried += 1
+    return carried
+
+def _swap(new_dir, live_dir, keep_dir):
+    """Make new_dir the live directory and move the old one to keep_dir"""
+    if os.path.lexists(keep_dir):
+        shutil.rmtree(keep_dir)
+    if not os.path.lexists(live_dir):
+        os.rename(new_dir, live_dir)
+        return True
+    if fs_batch.exchange_paths(new_dir, live_dir):
+        os.rename(new_dir, keep_dir)
+        return True
+    # No renameat2 here: two renames, the directory is briefly missing
+    os.rename(live_dir, keep_dir)
+    os.rename(new_dir, live_dir)
+    return False
+
+def swap_in(live_dir):
+    """Switch the shadow tree in, the old tree becomes plugins.previous. Returns True if atomic."""
+    return _swap(shadow_dir(live_dir), live_dir, previous_dir(live_dir))
+
+def rollback(live_dir):
+    """
+    Swap plugins.previous back in; the rolled-back tree becomes
+    plugins.previous, so the rollback itself can be undone the same way.
+    """
+    previous = previous_dir(live_dir)
+    if not os.path.isdir(previous):
+        return None
+    if not os.path.lexists(live_dir):
+        os.rename(previous, live_dir)
+        return True
+    if fs_batch.exchange_paths(previous, live_dir):
+        return True
+    tmp_dir = live_dir + '.rollback-tmp'
+    os.rename(live_dir, tmp_dir)
+    os.rename(previous, live_dir)
+    os.rename(tmp_dir, previous)
+    return False
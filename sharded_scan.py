@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Sharded parallel range scans over the LevelDB keyspace.
+
+The keyspace is cut into disjoint [start, stop) ranges of about the same
+on-disk size, using the table file boundaries and sampled split keys
+weighed with approximate_sizes(). Every range is scanned by a worker
+process with its own iterator, and the results come back in range order,
+which is key order.
+
+LevelDB allows one process per database directory, so each worker opens
+its own hardlinked clone of the directory. Clones are taken after the
+database was opened and closed again here, so they share its recovered
+table files and are only made when the scan is split at all.
+"""
+import contextlib
+import heapq
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import plyvel
+import config
+
+# Ranges smaller than this are not worth a worker of their own
+MIN_SHARD_BYTES = 1024 * 1024
+
+# Ranges per worker, so a slow range does not leave the others idle
+SHARDS_PER_JOB = 4
+
+# Upper bound on approximate_size() probes when sampling split keys
+MAX_PROBES = 4096
+
+# " 5:387950['first key' @ 27042 : 1 .. 'last key' @ 1 : 1]"
+_SSTABLE_RE = re.compile(r"\['(.*?)' @ \d+ : \d+ \.\. '(.*?)' @ \d+ : \d+\]")
+
+# Open clone of the database in a worker process
+_worker_db = None
+
+def _unescape(text):
+    """Undo LevelDB's EscapeString (non-printable bytes as \\xNN)"""
+    return re.sub(rb'\\x([0-9a-f]{2})', lambda m: bytes([int(m.group(1), 16)]), text.encode('latin-1'))
+
+def table_boundaries(db):
+    """First and last key of every table file"""
+    text = (db.get_property(b'leveldb.sstables') or b'').decode('latin-1')
+    keys = set()
+    for first, last in _SSTABLE_RE.findall(text):
+        keys.add(_unescape(first))
+        keys.add(_unescape(last))
+    return sorted(keys)
+
+def _midpoint(a, b):
+    """A key strictly between a and b (byte-wise), None if there is none"""
+    n = max(len(a), len(b)) + 1
+    low = int.from_bytes(a.ljust(n, b'\0'), 'big')
+    high = int.from_bytes(b.ljust(n, b'\0'), 'big')
+    key = ((low + high) // 2).to_bytes(n, 'big').rstrip(b'\0')
+    return key if a < key < b else None
+
+def _split_key(it, start, stop):
+    """A real key in (start, stop) near the byte midpoint, None if there is none"""
+    split = _midpoint(start, stop)
+    if split is None:
+        return None
+    it.seek(split)
+    if it.valid() and it.key() < stop:
+        return it.key()
+    # Nothing in [split, stop): take the last key before split instead
+    if it.valid():
+        it.prev()
+    else:
+        it.seek_to_last()
+    if it.valid() and start < it.key():
+        return it.key()
+    return None
+
+def split_ranges(db, shards):
+    """
+    Cut the keyspace into at most `shards` ranges of about the same size.
+
+    Returns [(start, stop), ...] in key order; the first start and the last
+    stop are None, so the ranges cover every key.
+    """
+    it = db.raw_iterator()
+    it.seek_to_first()
+    if shards <= 1 or not it.valid():
+        return [(None, None)]
+    first = it.key()
+    it.seek_to_last()
+    end = it.key() + b'\0'
+
+    def size(start, stop):
+        return db.approximate_size(start, stop)
+
+    # Start from the table file boundaries, then keep splitting the largest
+    # range at a sampled key (the first real key after the byte midpoint)
+    # until the pieces are small enough to be balanced.
+    bounds = [first] + [key for key in table_boundaries(db) if first < key < end] + [end]
+    heap = []
+    for start, stop in zip(bounds, bounds[1:]):
+        heapq.heappush(heap, (-size(start, stop), start, stop))
+    total = -sum(item[0] for item in heap)
+    if total == 0:
+        return [(None, None)]
+
+    leaves = []
+    probes = 0
+    while heap and probes < MAX_PROBES:
+        neg_size, start, stop = heapq.heappop(heap)
+        if -neg_size <= total / (shards * SHARDS_PER_JOB):
+            leaves.append((start, stop, -neg_size))
+            break
+        split = _split_key(it, start, stop)
+        if split is None:
+            leaves.append((start, stop, -neg_size))
+            continue
+        probes += 1
+        heapq.heappush(heap, (-size(start, split), start, split))
+        heapq.heappush(heap, (-size(split, stop), split, stop))
+    leaves.extend((start, stop, -neg_size) for neg_size, start, stop in heap)
+    leaves.sort()
+
+    # Merge adjacent pieces into shards of about total/shards each
+    target = total / shards
+    cuts = []
+    accumulated = 0
+    for start, stop, piece_size in leaves[:-1]:
+        accumulated += piece_size
+        if accumulated >= target * (len(cuts) + 1) and len(cuts) < shards - 1:
+            cuts.append(stop)
+    bounds = [None] + cuts + [None]
+    return list(zip(bounds, bounds[1:]))
+
+def clone_database(db_path, target):
+    """Hardlink (or copy) the database files into target, without the LOCK file"""
+    os.makedirs(target)
+    for name in os.listdir(db_path):
+        if name == 'LOCK':
+            continue
+        src = os.path.join(db_path, name)
+        dest = os.path.join(target, name)
+        try:
+            os.link(src, dest)
+        except OSError:
+            shutil.copy2(src, dest)
+
+def _init_worker(clones):
+    global _worker_db
+    _worker_db = plyvel.DB(clones.get(), create_if_missing=False)
+
+def _run_shard(fn, start, stop, args):
+    return fn(_worker_db, start, stop, *args)
+
+def default_jobs():
+    return config.SCAN_JOBS or os.cpu_count() or 1
+
+def map_ranges(db_path, fn, args=(), jobs=None, quiet=False):
+    """
+    Call fn(db, start, stop, *args) on disjoint key ranges covering the database.
+
+    Yields the results in key order. fn must be a module-level function and
+    its result picklable; start/stop are None at the ends of the keyspace.
+    With one job, or a database too small to split, fn runs once here on
+    the whole keyspace; otherwise the database is cloned once per worker.
+    """
+    jobs = jobs or default_jobs()
+    db_path = os.path.abspath(db_path)
+
+    db = plyvel.DB(db_path, create_if_missing=False)
+    try:
+        shards = 1
+        if jobs > 1:
+            total = db.approximate_size(b'', b'\xff' * 8)
+            shards = min(jobs * SHARDS_PER_JOB, total // MIN_SHARD_BYTES)
+        ranges = split_ranges(db, shards)
+        if len(ranges) == 1:
+            yield fn(db, None, None, *args)
+            return
+    finally:
+        db.close()
+
+    # No more workers than ranges, each with its own clone
+    jobs = min(jobs, len(ranges))
+    workdir = tempfile.mkdtemp(prefix='.scan-', dir=os.path.dirname(db_path))
+    try:
+        for i in range(jobs):
+            clone_database(db_path, os.path.join(workdir, str(i)))
+
+        if not quiet:
+            print(f"Scanning {len(ranges)} ranges with {jobs} workers...", file=sys.stderr)
+        context = multiprocessing.get_context()
+        clones = context.Queue()
+        for i in range(jobs):
+            clones.put(os.path.join(workdir, str(i)))
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=context,
+                                 initializer=_init_worker, initargs=(clones,)) as executor:
+            futures = [executor.submit(_run_shard, fn, start, stop, args) for start, stop in ranges]
+            for future in futures:
+                yield future.result()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def iterate(db, start, stop, **kwargs):
+    """db.iterator() over [start, stop), None meaning the end of the keyspace"""
+    if start is not None:
+        kwargs['start'] = start
+    if stop is not None:
+        kwargs['stop'] = stop
+    return db.iterator(**kwargs)
+
+def _count_keys(db, start, stop):
+    return sum(1 for _ in iterate(db, start, stop, include_value=False))
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Show how the LevelDB keyspace is split for parallel scans',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Split points and approximate range sizes for 8 workers
+  python3 sharded_scan.py --jobs 8
+
+  # Also time a parallel key count against a single-iterator one
+  python3 sharded_scan.py --jobs 8 --benchmark
+        """
+    )
+    parser.add_argument('--db', default=None, help='Path to LevelDB database (default: auto-detect from config)')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Worker processes (default: config.SCAN_JOBS or the number of CPUs)')
+    parser.add_argument('--benchmark', action='store_true', help='Time a parallel and a sequential key count')
+
+    args = parser.parse_args()
+
+    # The copy replaces the local database another command may be reading
+    with config.tool_lock('sharded_scan') if args.db is None else contextlib.nullcontext():
+        # Use config if no db path specified
+        if args.db is None:
+            try:
+                args.db = config.get_safe_db_path()
+            except (FileNotFoundError, RuntimeError) as e:
+                print(f"ERROR: {e}")
+                sys.exit(1)
+
+        jobs = args.jobs or default_jobs()
+        try:
+            db = plyvel.DB(args.db, create_if_missing=False)
+        except Exception as e:
+            print(f"Error opening database: {e}")
+            sys.exit(1)
+        try:
+            ranges = split_ranges(db, jobs * SHARDS_PER_JOB)
+            print("=" * 80)
+            print(f"KEY RANGES ({len(ranges)} for {jobs} workers)")
+            print("=" * 80)
+            for start, stop in ranges:
+                approx = db.approximate_size(start or b'', stop or b'\xff' * 8)
+                print(f"{approx:>12,d} bytes  {start!r} .. {stop!r}")
+        finally:
+            db.close()
+
+        if args.benchmark:
+            for label, n in (('sequential', 1), ('parallel', jobs)):
+                started = time.perf_counter()
+                keys = sum(map_ranges(args.db, _count_keys, jobs=n, quiet=True))
+                print(f"{label:10s}: {keys} keys in {time.perf_counter() - started:.3f}s")
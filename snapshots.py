@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Deduplicated history of state.v2 snapshots.
+
+Every LevelDB file is stored once under its SHA-256 in the object store and
+each snapshot is a small JSON manifest mapping file names to hashes.
+Files whose size and mtime didn't change since the last snapshot are not
+hashed again, so snapshotting an unchanged database costs a few stat
+calls. Objects are copied (reflinked where the filesystem supports it)
+into and out of the store, never hardlinked: LevelDB appends to its log
+and MANIFEST in place, which would change a shared object under every
+snapshot that references it.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import config
+import fs_batch
+
+OBJECTS_DIR = 'objects'
+SNAPSHOTS_DIR = 'snapshots'
+STAT_CACHE = 'stat_cache.json'
+
+# Lock and log files are per-process scratch files, not database content
+SKIP_FILES = {'LOCK', 'LOG', 'LOG.old'}
+
+CHUNK_SIZE = 1024 * 1024
+
+def _store_path(*parts):
+    return os.path.join(config.SNAPSHOT_DIR, *parts)
+
+def _object_path(digest):
+    return _store_path(OBJECTS_DIR, digest[:2], digest)
+
+def _load_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def _write_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def _hash_file(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def _copy(src, dest):
+    """Copy src to a new file dest, as a reflink where the filesystem supports it"""
+    fs_batch.place_file(src, os.path.abspath(dest), fs_batch.REFLINK)
+
+def list_snapshots():
+    """Return all snapshot manifests, oldest first"""
+    snapshot_dir = _store_path(SNAPSHOTS_DIR)
+    if not os.path.isdir(snapshot_dir):
+        return []
+    snapshots = []
+    for name in sorted(os.listdir(snapshot_dir)):
+        if name.endswith('.json'):
+            snapshot = _load_json(os.path.join(snapshot_dir, name), None)
+            if snapshot:
+                snapshots.append(snapshot)
+    snapshots.sort(key=lambda s: s['created'])
+    return snapshots
+
+def take_snapshot(db_dir, quiet=False):
+    """
+    Record the database directory as a snapshot, returns its id.
+
+    Files whose size and mtime match the stat cache are not hashed again,
+    and objects that already exist are not stored again. If nothing changed
+    since the latest snapshot, no new snapshot is created.
+    """
+    os.makedirs(_store_path(OBJECTS_DIR), exist_ok=True)
+    os.makedirs(_store_path(SNAPSHOTS_DIR), exist_ok=True)
+
+    stat_cache_path = _store_path(STAT_CACHE)
+    stat_cache = _load_json(stat_cache_path, {})
+    new_stat_cache = {}
+
+    files = {}
+    stored_bytes = 0
+    for name in sorted(os.listdir(db_dir)):
+        path = os.path.join(db_dir, name)
+        if name in SKIP_FILES or not os.path.isfile(path):
+            continue
+
+        st = os.stat(path)
+        signature = [st.st_size, st.st_mtime_ns]
+        cached = stat_cache.get(name)
+        if cached and cached[:2] == signature and os.path.exists(_object_path(cached[2])):
+            digest = cached[2]
+        else:
+            digest = _hash_file(path)
+            object_path = _object_path(digest)
+            if not os.path.exists(object_path):
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                tmp_path = object_path + '.tmp'
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                _copy(path, tmp_path)
+                os.replace(tmp_path, object_path)
+                stored_bytes += st.st_size
+
+        new_stat_cache[name] = signature + [digest]
+        files[name] = {'hash': digest, 'size': st.st_size}
+
+    _write_json(stat_cache_path, new_stat_cache)
+
+    snapshots = list_snapshots()
+    if snapshots and snapshots[-1]['files'] == files:
+        if not quiet:
+            print(f"✓ Latest snapshot {snapshots[-1]['id']} already matches this state")
+        return snapshots[-1]['id']
+
+    snapshot_id = time.strftime('%Y%m%d-%H%M%S')
+    # Two snapshots within the same second get a suffix
+    suffix = 1
+    while os.path.exists(_store_path(SNAPSHOTS_DIR, snapshot_id + '.json')):
+        suffix += 1
+        snapshot_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+
+    _write_json(_store_path(SNAPSHOTS_DIR, snapshot_id + '.json'), {
+        'id': snapshot_id,
+        'created': time.time(),
+        'source': os.path.abspath(db_dir),
+        'files': files,
+    })
+
+    if not quiet:
+        print(f"✓ Snapshot {snapshot_id} saved ({len(files)} files, {stored_bytes} new bytes stored)")
+    return snapshot_id
+
+def find_snapshot(snapshot_id):
+    """Find a snapshot by id, 'latest', or a unique id prefix"""
+    snapshots = list_snapshots()
+    if not snapshots:
+        return None
+    if snapshot_id == 'latest':
+        return snapshots[-1]
+    matches = [s for s in snapshots if s['id'] == snapshot_id] or \
+              [s for s in snapshots if s['id'].startswith(snapshot_id)]
+    return matches[0] if len(matches) == 1 else None
+
+def extract_snapshot(snapshot, target):
+    """Write the files of a snapshot manifest into a new directory"""
+    os.makedirs(target)
+    for name, entry in snapshot['files'].items():
+        _copy(_object_path(entry['hash']), os.path.join(target, name))
+
+def restore_snapshot(snapshot_id, target=None, dry_run=False):
+    """
+    Materialize a snapshot as a database directory.
+
+    The previous directory at target is kept as <target>.before-restore.
+    Restoring over the Vortex database is refused while Vortex is running.
+    """
+    target = target or config.VORTEX_STATE_DB
+    snapshot = find_snapshot(snapshot_id)
+    if snapshot is None:
+        print(f"ERROR: No unique snapshot matches '{snapshot_id}'")
+        return False
+
+    if os.path.abspath(target) == os.path.abspath(config.VORTEX_STATE_DB) and config.is_vortex_running():
+        print("ERROR: Vortex is currently running (lockfile detected)!")
+        print("Please close Vortex before restoring a snapshot.")
+        return False
+
+    missing = [name for name, entry in snapshot['files'].items()
+               if not os.path.exists(_object_path(entry['hash']))]
+    if missing:
+        print(f"ERROR: Snapshot {snapshot['id']} is missing objects for: {', '.join(missing)}")
+        return False
+
+    print(f"{'[DRY RUN] ' if dry_run else ''}Restoring snapshot {snapshot['id']} to {target}")
+    if dry_run:
+        return True
+
+    tmp_dir = target.rstrip(os.sep) + '.restore-tmp'
+    backup_dir = target.rstrip(os.sep) + '.before-restore'
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    extract_snapshot(snapshot, tmp_dir)
+
+    if os.path.exists(target):
+        if os.path.exists(backup_dir):
+            shutil.rmtree(backup_dir)
+        os.rename(target, backup_dir)
+        print(f"  Previous state kept at {backup_dir}")
+    os.rename(tmp_dir, target)
+
+    print(f"✓ Restored {len(snapshot['files'])} files")
+    return True
+
+def prune_snapshots(keep=None, keep_days=None, dry_run=False, quiet=False):
+    """
+    Apply the retention policy, then delete objects no snapshot references.
+
+    A snapshot is kept if it is among the newest `keep` snapshots or younger
+    than `keep_days` days.
+    """
+    keep = config.SNAPSHOT_KEEP if keep is None else keep
+    keep_days = config.SNAPSHOT_KEEP_DAYS if keep_days is None else keep_days
+
+    snapshots = list_snapshots()
+    cutoff = time.time() - keep_days * 86400
+    kept = []
+    removed = []
+    for i, snapshot in enumerate(snapshots):
+        if i >= len(snapshots) - keep or snapshot['created'] >= cutoff:
+            kept.append(snapshot)
+        else:
+            removed.append(snapshot)
+
+    referenced = {entry['hash'] for s in kept for entry in s['files'].values()}
+    unreferenced = []
+    objects_dir = _store_path(OBJECTS_DIR)
+    if os.path.isdir(objects_dir):
+        for shard in os.listdir(objects_dir):
+            for digest in os.listdir(os.path.join(objects_dir, shard)):
+                if digest not in referenced:
+                    unreferenced.append(os.path.join(objects_dir, shard, digest))
+
+    freed = sum(os.path.getsize(path) for path in unreferenced)
+    if not quiet or removed:
+        print(f"{'[DRY RUN] ' if dry_run else ''}Pruning {len(removed)} snapshots, "
+              f"{len(unreferenced)} objects ({freed} bytes)")
+
+    if dry_run:
+        return True
+
+    for snapshot in removed:
+        os.remove(_store_path(SNAPSHOTS_DIR, snapshot['id'] + '.json'))
+    for path in unreferenced:
+        os.remove(path)
+    return True
+
+def print_snapshots():
+    """List snapshots with their size and how many bytes each one added"""
+    snapshots = list_snapshots()
+    if not snapshots:
+        print("No snapshots found.")
+        return
+
+    print("="*80)
+    print("STATE SNAPSHOTS")
+    print("="*80)
+    seen = set()
+    for snapshot in snapshots:
+        total = sum(entry['size'] for entry in snapshot['files'].values())
+        added = sum(entry['size'] for entry in snapshot['files'].values() if entry['hash'] not in seen)
+        seen.update(entry['hash'] for entry in snapshot['files'].values())
+        created = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot['created']))
+        print(f"  {snapshot['id']:20s} {created}  {len(snapshot['files']):3d} files  "
+              f"{total:10d} bytes  (+{added} new)")
+    print()
+    print(f"Total snapshots: {len(snapshots)}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Manage deduplicated snapshots of the Vortex state database',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Snapshot the current Vortex state
+  python3 snapshots.py take
+
+  # Show all snapshots
+  python3 snapshots.py list
+
+  # Roll the Vortex database back (Vortex must be closed)
+  python3 snapshots.py restore 20260204-101500
+
+  # Restore into another directory
+  python3 snapshots.py restore latest --to /tmp/state.v2.old
+
+  # Apply the retention policy
+  python3 snapshots.py prune --keep 10 --keep-days 14
+        """
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    take_parser = subparsers.add_parser('take', help='Snapshot the Vortex database')
+    take_parser.add_argument('--db', default=None,
+                             help='Database directory to snapshot (default: fresh copy of the Vortex database)')
+
+    subparsers.add_parser('list', help='List snapshots')
+
+    restore_parser = subparsers.add_parser('restore', help='Restore a snapshot')
+    restore_parser.add_argument('snapshot', help="Snapshot id, id prefix or 'latest'")
+    restore_parser.add_argument('--to', default=None,
+                                help='Target directory (default: the Vortex database)')
+    restore_parser.add_argument('--dry-run', action='store_true', help='Preview without making changes')
+
+    prune_parser = subparsers.add_parser('prune', help='Delete old snapshots and unreferenced objects')
+    prune_parser.add_argument('--keep', type=int, default=None,
+                              help=f'Always keep the newest N snapshots (default: {config.SNAPSHOT_KEEP})')
+    prune_parser.add_argument('--keep-days', type=int, default=None,
+                              help=f'Keep snapshots younger than N days (default: {config.SNAPSHOT_KEEP_DAYS})')
+    prune_parser.add_argument('--dry-run', action='store_true', help='Preview without making changes')
+
+    args = parser.parse_args()
+
+    if args.command == 'take':
+        # The copy replaces the local database another command may be reading
+        with config.tool_lock('snapshots take') if args.db is None else contextlib.nullcontext():
+            try:
+                db_path = args.db or config.get_safe_db_path()
+            except (FileNotFoundError, RuntimeError) as e:
+                print(f"ERROR: {e}")
+                sys.exit(1)
+            take_snapshot(db_path)
+        success = True
+    elif args.command == 'list':
+        print_snapshots()
+        success = True
+    elif args.command == 'restore':
+        if args.dry_run:
+            success = restore_snapshot(args.snapshot, args.to, args.dry_run)
+        else:
+            # Not under a running deploy or profile edit
+            with config.tool_lock('snapshots restore'):
+                success = restore_snapshot(args.snapshot, args.to, args.dry_run)
+    else:
+        success = prune_snapshots(args.keep, args.keep_days, args.dry_run)
+
+    sys.exit(0 if success else 1)
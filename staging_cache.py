@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Persistent cache of staging directory listings.
+
+Staging folders only change when Vortex installs, updates or removes a
+mod, but every deploy walks all of them. A directory's mtime changes
+whenever an entry is added, removed or renamed in it, and Vortex
+reinstalling a mod recreates the folder (new inode), so a listing cached
+under (path, device, inode, mtime) stays valid until exactly that
+directory changes. Planning then costs one stat per directory instead of
+a full scandir walk.
+"""
+import json
+import os
+import threading
+import time
+import config
+
+CACHE_VERSION = 1
+
+# Directories modified this recently are not cached: a change within the
+# same mtime tick would otherwise go unnoticed (coarse timestamps on
+# some filesystems).
+RACY_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+class ListingCache:
+    """Directory listings keyed by path and validated by inode and mtime"""
+
+    def __init__(self, path=None):
+        self.path = path or config.STAGING_CACHE
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Load the cache file, starting empty if it is missing or unreadable"""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == CACHE_VERSION:
+            self.entries = data.get('dirs', {})
+
+    def save(self):
+        """Write the cache back if anything changed"""
+        if not self.dirty:
+            return
+        with self.lock:
+            data = {'version': CACHE_VERSION, 'dirs': self.entries}
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
+    def list_dir(self, dir_path):
+        """
+        Return (dirs, files) entry names of a directory.
+
+        Raises FileNotFoundError like os.scandir if the directory is gone.
+        """
+        st = os.stat(dir_path)
+        key = [st.st_dev, st.st_ino, st.st_mtime_ns]
+
+        with self.lock:
+            cached = self.entries.get(dir_path)
+            if cached is not None and cached['key'] == key:
+                self.hits += 1
+                return cached['dirs'], cached['files']
+
+        dirs = []
+        files = []
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                if entry.is_dir():
+                    dirs.append(entry.name)
+                else:
+                    files.append(entry.name)
+
+        with self.lock:
+            self.misses += 1
+            if cached is not None:
+                # Subdirectories that disappeared take their cached subtree with them
+                for name in set(cached['dirs']) - set(dirs):
+                    self._forget_tree(os.path.join(dir_path, name))
+            if time.time_ns() - st.st_mtime_ns > RACY_WINDOW_NS:
+                self.entries[dir_path] = {'key': key, 'dirs': dirs, 'files': files}
+            else:
+                self.entries.pop(dir_path, None)
+            self.dirty = True
+
+        return dirs, files
+
+    def _forget_tree(self, dir_path):
+        prefix = dir_path + os.sep
+        for path in [p for p in self.entries if p == dir_path or p.startswith(prefix)]:
+            del self.entries[path]
+
+    def hit_rate(self):
+        """Fraction of listings served from the cache"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
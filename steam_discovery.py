@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Find the game and Vortex's Proton prefix across Steam installations.
+
+config.py used to assume ~/.steam/steam for everything. Games in a
+secondary Steam library, or a Flatpak/Snap Steam, need:
+
+  1. every Steam root (native, Flatpak, Snap)
+  2. its steamapps/libraryfolders.vdf, listing all libraries
+  3. the library with appmanifest_<appid>.acf, whose "installdir" is the
+     game folder below steamapps/common/
+  4. the compatdata/<appid> prefix Vortex was installed into
+
+The result is cached in a small JSON file together with the mtime of
+every file it was derived from. On the next start, a few stat calls tell
+whether anything changed (a library added, the game moved); only then
+are the VDF files parsed again.
+
+This module only uses the standard library: config.py imports it.
+"""
+import json
+import os
+import sys
+
+CACHE_VERSION = 1
+
+# Where Steam installs itself: native, Flatpak and Snap
+STEAM_ROOTS = [
+    "~/.steam/steam",
+    "~/.steam/root",
+    "~/.local/share/Steam",
+    "~/.var/app/com.valvesoftware.Steam/.local/share/Steam",
+    "~/.var/app/com.valvesoftware.Steam/data/Steam",
+    "~/snap/steam/common/.local/share/Steam",
+]
+
+# Vortex's user data inside a Proton prefix
+VORTEX_IN_PREFIX = os.path.join("pfx", "drive_c", "users", "steamuser", "AppData", "Roaming", "Vortex")
+
+def parse_vdf(text):
+    """
+    Parse Valve's KeyValues text format into nested dicts.
+
+    Only what libraryfolders.vdf and appmanifest files use: quoted keys,
+    quoted values and { } blocks. Comments (//) are skipped.
+    """
+    tokens = []
+    i = 0
+    length = len(text)
+    while i < length:
+        c = text[i]
+        if c.isspace():
+            i += 1
+        elif c in '{}':
+            tokens.append(c)
+            i += 1
+        elif c == '/' and text.startswith('//', i):
+            end = text.find('\n', i)
+            i = length if end == -1 else end
+        elif c == '"':
+            value = []
+            i += 1
+            while i < length and text[i] != '"':
+                if text[i] == '\\' and i + 1 < length:
+                    i += 1
+                value.append(text[i])
+                i += 1
+            tokens.append(''.join(value))
+            i += 1
+        else:
+            # Unquoted token
+            start = i
+            while i < length and not text[i].isspace() and text[i] not in '{}"':
+                i += 1
+            tokens.append(text[start:i])
+
+    root = {}
+    stack = [root]
+    key = None
+    for token in tokens:
+        if token == '{':
+            block = {}
+            if key is not None:
+                stack[-1][key] = block
+            stack.append(block)
+            key = None
+        elif token == '}':
+            if len(stack) > 1:
+                stack.pop()
+            key = None
+        elif key is None:
+            key = token
+        else:
+            stack[-1][key] = token
+            key = None
+    return root
+
+def _read_vdf(path):
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            return parse_vdf(f.read())
+    except OSError:
+        return None
+
+def _mtime(path):
+    """mtime_ns of a file, None if it doesn't exist"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def steam_roots():
+    """Existing Steam roots, each once (~/.steam/steam is usually a symlink to another)"""
+    roots = []
+    seen = set()
+    for root in STEAM_ROOTS:
+        path = os.path.expanduser(root)
+        if not os.path.isdir(os.path.join(path, 'steamapps')):
+            continue
+        real = os.path.realpath(path)
+        if real not in seen:
+            seen.add(real)
+            roots.append(real)
+    return roots
+
+def library_folders(root):
+    """Steam library paths listed in a root's libraryfolders.vdf (the root itself first)"""
+    libraries = [root]
+    data = _read_vdf(os.path.join(root, 'steamapps', 'libraryfolders.vdf'))
+    folders = (data or {}).get('libraryfolders') or (data or {}).get('LibraryFolders') or {}
+    for key, value in folders.items():
+        # Current format: "0" { "path" "..." }, old format: "1" "/path"
+        path = value.get('path') if isinstance(value, dict) else (value if key.isdigit() else None)
+        if path:
+            path = os.path.realpath(path)
+            if path not in libraries:
+                libraries.append(path)
+    return libraries
+
+def discover(app_id, cache_path=None):
+    """
+    Locate the game and the Vortex prefix of a Steam app.
+
+    Returns a dict with 'game_path' and 'vortex_dir' (None if not found),
+    'libraries' and 'sources' (the files the result was derived from,
+    path -> mtime_ns). With cache_path, an earlier result is returned
+    as long as none of its sources changed.
+    """
+    cached = _load_cache(cache_path, app_id)
+    if cached is not None:
+        return cached
+
+    sources = {}
+    libraries = []
+    for root in steam_roots():
+        vdf_path = os.path.join(root, 'steamapps', 'libraryfolders.vdf')
+        sources[vdf_path] = _mtime(vdf_path)
+        for library in library_folders(root):
+            if library not in libraries:
+                libraries.append(library)
+
+    game_path = None
+    vortex_dir = None
+    for library in libraries:
+        steamapps = os.path.join(library, 'steamapps')
+        manifest_path = os.path.join(steamapps, f'appmanifest_{app_id}.acf')
+        sources[manifest_path] = _mtime(manifest_path)
+        if game_path is None and sources[manifest_path] is not None:
+            app_state = (_read_vdf(manifest_path) or {}).get('AppState', {})
+            installdir = app_state.get('installdir')
+            if installdir and os.path.isdir(os.path.join(steamapps, 'common', installdir)):
+                game_path = os.path.join(steamapps, 'common', installdir)
+
+        # Proton keeps the prefix next to the game, but look in every library
+        compat_dir = os.path.join(steamapps, 'compatdata', str(app_id))
+        sources[compat_dir] = _mtime(compat_dir)
+        candidate = os.path.join(compat_dir, VORTEX_IN_PREFIX)
+        if vortex_dir is None and os.path.isdir(candidate):
+            vortex_dir = candidate
+
+    result = {'app_id': str(app_id), 'game_path': game_path, 'vortex_dir': vortex_dir,
+              'libraries': libraries, 'sources': sources}
+    if cache_path:
+        _save_cache(cache_path, result)
+    return result
+
+def _load_cache(cache_path, app_id):
+    if not cache_path:
+        return None
+    try:
+        with open(cache_path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    result = data.get('result')
+    if data.get('version') != CACHE_VERSION or not result or result.get('app_id') != str(app_id):
+        return None
+    # A root that appeared (e.g. Flatpak Steam installed) has no source yet
+    known = set(result['sources'])
+    for root in steam_roots():
+        if os.path.join(root, 'steamapps', 'libraryfolders.vdf') not in known:
+            return None
+    for path, mtime in result['sources'].items():
+        if _mtime(path) != mtime:
+            return None
+    for path in (result['game_path'], result['vortex_dir']):
+        if path is not None and not os.path.isdir(path):
+            return None
+    return result
+
+def _save_cache(cache_path, result):
+    tmp_path = cache_path + '.tmp'
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'result': result}, f, indent=1)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Read-only working directory: discover again next time
+        pass
+
+if __name__ == "__main__":
+    import argparse
+    import config
+
+    parser = argparse.ArgumentParser(
+        description='Show where Steam, the game and Vortex were found',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Show the discovered paths (from the cache if nothing changed)
+  python3 steam_discovery.py
+
+  # Search all Steam libraries again
+  python3 steam_discovery.py --refresh
+        """
+    )
+    parser.add_argument('--refresh', action='store_true', help='Ignore the cached result')
+    args = parser.parse_args()
+
+    if args.refresh and os.path.exists(config.STEAM_DISCOVERY_CACHE):
+        os.remove(config.STEAM_DISCOVERY_CACHE)
+    result = discover(config.STEAM_APP_ID, config.STEAM_DISCOVERY_CACHE)
+
+    print("="*80)
+    print("STEAM DISCOVERY")
+    print("="*80)
+    print(f"Steam roots: {', '.join(steam_roots()) or 'none found'}")
+    print("Libraries:")
+    for library in result['libraries']:
+        print(f"  {library}")
+    print()
+    found = True
+    for label, path in (('Game', result['game_path']), ('Vortex', result['vortex_dir'])):
+        if path:
+            print(f"✓ {label}: {path}")
+        else:
+            print(f"✗ {label}: not found in any library (app {config.STEAM_APP_ID})")
+            found = False
+    sys.exit(0 if found else 1)
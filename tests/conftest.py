@@ -0,0 +1,39 @@
+"""
+Shared fixtures. The scripts are flat modules in the repository root.
+"""
+import os
+import sys
+import tempfile
+import plyvel
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# config.py discovers Steam on import and caches the result in the working
+# directory: import it once from a scratch directory
+_cwd = os.getcwd()
+os.chdir(tempfile.mkdtemp(prefix='vortexfixer-tests-'))
+try:
+    import config  # noqa: E402,F401
+finally:
+    os.chdir(_cwd)
+
+@pytest.fixture(autouse=True)
+def _workdir(tmp_path, monkeypatch):
+    """Run every test in its own directory, where the scripts write their caches"""
+    monkeypatch.chdir(tmp_path)
+
+@pytest.fixture
+def make_db(tmp_path):
+    """Create a LevelDB with the given {key: value} (str or bytes), returns its path"""
+    def make(items, name='state.v2', **options):
+        path = str(tmp_path / name)
+        db = plyvel.DB(path, create_if_missing=True, **options)
+        with db.write_batch() as batch:
+            for key, value in items.items():
+                batch.put(key.encode() if isinstance(key, str) else key,
+                          value.encode() if isinstance(value, str) else value)
+        db.close()
+        return path
+    return make
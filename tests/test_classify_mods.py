@@ -0,0 +1,34 @@
+import classify_mods
+from mod_model import ModType
+
+def test_layouts(tmp_path):
+    framework = tmp_path / 'framework'
+    (framework / 'BepInEx' / 'core').mkdir(parents=True)
+    plugin = tmp_path / 'plugin'
+    (plugin / 'Thing').mkdir(parents=True)
+    (plugin / 'Thing' / 'Thing.dll').write_text('dll')
+    other = tmp_path / 'other'
+    (other / 'textures').mkdir(parents=True)
+
+    assert classify_mods.infer_type(str(framework))[0] is ModType.BEPINEX_5
+    assert classify_mods.infer_type(str(plugin))[0] is ModType.BEPINEX_PLUGIN
+    assert classify_mods.infer_type(str(other))[0] is None
+
+def test_cache_sees_a_plugin_added_to_a_folder(tmp_path):
+    staging = tmp_path / 'mod'
+    (staging / 'Thing').mkdir(parents=True)
+    (staging / 'Thing' / 'readme.txt').write_text('text')
+    cache = classify_mods.TypeCache(str(tmp_path / 'types.json'))
+
+    assert cache.classify('mod', str(staging))[0] is None
+    assert cache.classify('mod', str(staging))[0] is None
+    assert cache.hits == 1
+
+    # Only the folder one level down changes, the top-level listing doesn't
+    (staging / 'Thing' / 'Thing.dll').write_text('dll')
+    assert cache.classify('mod', str(staging))[0] is ModType.BEPINEX_PLUGIN
+    assert cache.misses == 2
+
+def test_missing_staging_directory(tmp_path):
+    cache = classify_mods.TypeCache(str(tmp_path / 'types.json'))
+    assert cache.classify('mod', str(tmp_path / 'missing'))[0] is None
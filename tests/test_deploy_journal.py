@@ -0,0 +1,100 @@
+import deploy_journal
+
+def journal_with(path, write):
+    journal = deploy_journal.Journal(str(path))
+    journal.start('/game', 'profile')
+    write(journal)
+    journal.close()
+    return deploy_journal.load_journal(str(path))
+
+def test_no_journal(tmp_path):
+    assert deploy_journal.load_journal(str(tmp_path / 'missing.jsonl')) is None
+
+def test_done_mods_and_possibly_placed_links(tmp_path):
+    def write(journal):
+        journal.plan('a', 'symlink', [('/s/a.dll', '/game/a.dll'), ('/s/shared', '/game/shared')],
+                     [('/s/a.dll', '/game/a.dll')])
+        journal.done('a', {'/game/a.dll': {'src': '/s/a.dll', 'mod': 'a'}}, ['/game/dir'])
+        journal.plan('b', 'copy', [('/s/b.dll', '/game/b.dll')], [('/s/b.dll', '/game/b.dll')])
+    state = journal_with(tmp_path / 'journal.jsonl', write)
+
+    assert state['game_path'] == '/game'
+    assert state['dirs'] == ['/game/dir']
+    assert list(state['done']) == ['a']
+    # The done record compares all links, not only the winning ones
+    assert state['done']['a']['links'] == [['/s/a.dll', '/game/a.dll'], ['/s/shared', '/game/shared']]
+    # Winning links of a started mod may be on disk, lost ones never are
+    assert state['entries'] == {'/game/a.dll': {'src': '/s/a.dll', 'mod': 'a'},
+                                '/game/b.dll': {'src': '/s/b.dll', 'mod': 'b', 'method': 'copy'}}
+    assert '/game/shared' not in state['entries']
+
+def test_replanned_mod_is_not_done(tmp_path):
+    def write(journal):
+        journal.plan('a', 'symlink', [('/s/a', '/game/a')], [('/s/a', '/game/a')])
+        journal.done('a', {'/game/a': {'src': '/s/a', 'mod': 'a'}}, [])
+        journal.plan('a', 'symlink', [('/s/a', '/game/a')], [('/s/a', '/game/a')])
+    assert journal_with(tmp_path / 'journal.jsonl', write)['done'] == {}
+
+def test_backups_and_torn_last_line(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+
+    def write(journal):
+        journal.backup('/game/winhttp.dll', {'hash': 'abc'})
+    journal_with(path, write)
+    with open(path, 'a') as f:
+        f.write('{"op": "done", "mod": "a", "entr')
+    state = deploy_journal.load_journal(str(path))
+    assert state['backups'] == {'/game/winhttp.dll': {'hash': 'abc'}}
+    assert state['done'] == {}
+
+def test_shadow_builds_are_never_reused(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = deploy_journal.Journal(str(path))
+    journal.start('/game', 'profile', shadow=True)
+    journal.plan('a', 'symlink', [('/s/a', '/game/a')], [('/s/a', '/game/a')])
+    journal.done('a', {'/game/a': {'src': '/s/a', 'mod': 'a'}}, [])
+    journal.close()
+    state = deploy_journal.load_journal(str(path))
+    assert state['done'] == {}
+    assert '/game/a' in state['entries']
+
+def test_old_plans_without_winning_links(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    path.write_text('{"op": "start", "game_path": "/game"}\n'
+                    '{"op": "plan", "mod": "a", "method": "symlink", "links": [["/s/a", "/game/a"]]}\n')
+    assert deploy_journal.load_journal(str(path))['entries'] == {'/game/a': {'src': '/s/a', 'mod': 'a'}}
+
+def test_resume_reuses_only_files_still_placed(tmp_path):
+    import os
+    import deploy_mods
+    src_a = tmp_path / 'a.dll'
+    src_b = tmp_path / 'b.dll'
+    src_a.write_text('a')
+    src_b.write_text('b')
+    dest = str(tmp_path / 'shared.dll')
+    os.symlink(str(src_b), dest)
+    # A later mod replaced the link a's done record describes
+    assert not deploy_mods.still_placed(dest, {'src': str(src_a)})
+    assert deploy_mods.still_placed(dest, {'src': str(src_b)})
+    assert not deploy_mods.still_placed(str(tmp_path / 'missing.dll'), {'src': str(src_a)})
+
+def test_unfinished_plan_keeps_the_file_it_would_replace(tmp_path):
+    import os
+    import deploy_manifest
+    src_a = tmp_path / 'a'
+    src_b = tmp_path / 'b'
+    src_a.write_text('a')
+    src_b.write_text('bb')
+    dest = str(tmp_path / 'shared')
+    os.link(str(src_a), dest)
+
+    def write(journal):
+        journal.plan('a', 'hardlink', [(str(src_a), dest)], [(str(src_a), dest)])
+        journal.done('a', {dest: {'src': str(src_a), 'mod': 'a', 'method': 'hardlink',
+                                  'inode': os.lstat(dest).st_ino}}, [])
+        # Interrupted before b replaced the file
+        journal.plan('b', 'hardlink', [(str(src_b), dest)], [(str(src_b), dest)])
+    entry = journal_with(tmp_path / 'journal.jsonl', write)['entries'][dest]
+    assert entry['mod'] == 'b'
+    assert entry['previous']['mod'] == 'a'
+    assert deploy_manifest.is_owned(entry, os.lstat(dest))
@@ -0,0 +1,64 @@
+import errno
+import os
+import deploy_manifest
+import fs_batch
+
+def staged(tmp_path, name='Plugin.dll', content=b'plugin'):
+    src = tmp_path / 'staging' / name
+    src.parent.mkdir(exist_ok=True)
+    src.write_bytes(content)
+    game = tmp_path / 'game'
+    game.mkdir(exist_ok=True)
+    return str(src), str(game / name)
+
+def test_symlink_entries(tmp_path):
+    src, dest = staged(tmp_path)
+    os.symlink(src, dest)
+    assert deploy_manifest.is_owned({'src': src}, os.lstat(dest))
+    os.remove(dest)
+    open(dest, 'wb').close()
+    assert not deploy_manifest.is_owned({'src': src}, os.lstat(dest))
+
+def test_placed_files_are_recognised_by_inode(tmp_path):
+    src, dest = staged(tmp_path)
+    placed = fs_batch.place_file(src, dest, fs_batch.COPY)
+    entry = {'src': src, **placed}
+    assert deploy_manifest.entry_method(entry) == fs_batch.COPY
+    assert deploy_manifest.is_owned(entry, os.lstat(dest))
+
+    # Replaced by the game or the user: same content, other inode
+    os.rename(dest, dest + '.old')
+    with open(src, 'rb') as fsrc, open(dest, 'wb') as fdest:
+        fdest.write(fsrc.read())
+    assert not deploy_manifest.is_owned(entry, os.lstat(dest))
+
+def test_planned_entries_match_size_and_mtime(tmp_path):
+    src, dest = staged(tmp_path)
+    fs_batch.place_file(src, dest, fs_batch.COPY)
+    entry = {'src': src, 'method': fs_batch.COPY}
+    assert deploy_manifest.is_owned(entry, os.lstat(dest))
+    with open(dest, 'ab') as f:
+        f.write(b'patched')
+    assert not deploy_manifest.is_owned(entry, os.lstat(dest))
+    assert not deploy_manifest.is_owned({'src': str(tmp_path / 'gone'), 'method': fs_batch.COPY}, os.lstat(dest))
+
+def test_symlink_in_place_of_a_copy(tmp_path):
+    src, dest = staged(tmp_path)
+    os.symlink(src, dest)
+    assert not deploy_manifest.is_owned({'src': src, 'method': fs_batch.HARDLINK, 'inode': 1}, os.lstat(dest))
+
+def test_fallback_is_remembered_per_device_pair(tmp_path, monkeypatch):
+    monkeypatch.setattr(fs_batch, '_working_methods', {})
+    calls = []
+
+    def no_hardlinks(*args, **kwargs):
+        calls.append(args)
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+    monkeypatch.setattr(os, 'link', no_hardlinks)
+
+    links = [staged(tmp_path, f'Plugin{i}.dll') for i in range(3)]
+    placed = fs_batch.apply_links(links, method=fs_batch.HARDLINK)
+    assert len(calls) == 1
+    assert {deploy_manifest.entry_method(entry) for _, _, entry in placed} <= {fs_batch.REFLINK, fs_batch.COPY}
+    for src, dest, entry in placed:
+        assert deploy_manifest.is_owned({'src': src, **entry}, os.lstat(dest))
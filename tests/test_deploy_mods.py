@@ -0,0 +1,11 @@
+import config
+import deploy_mods
+
+PREFIX = '/steam/compatdata/264710/pfx'
+
+def test_win_to_linux(monkeypatch):
+    monkeypatch.setattr(config, 'VORTEX_USERDATA', PREFIX + '/drive_c/users/steamuser/AppData/Roaming/Vortex')
+    assert deploy_mods.win_to_linux('Z:\\home\\me\\Subnautica') == '/home/me/Subnautica'
+    assert deploy_mods.win_to_linux('C:\\Games\\staging') == PREFIX + '/drive_c/Games/staging'
+    assert deploy_mods.win_to_linux('{USERDATA}\\downloads') == config.VORTEX_USERDATA + '/downloads'
+    assert deploy_mods.win_to_linux('') is None
@@ -0,0 +1,74 @@
+import load_order
+
+def rule(kind, mod_id=None, **reference):
+    if mod_id is not None:
+        reference['id'] = mod_id
+    return {'type': kind, 'reference': reference}
+
+def no_attributes(mod_id):
+    return {}
+
+def build(rules, attributes=no_attributes, cache_path='load_order.json'):
+    return load_order.build(rules, attributes, cache_path)
+
+def test_layers_of_a_dag():
+    depths, cyclic = load_order.layers(['a', 'b', 'c', 'd'], [('a', 'b'), ('b', 'c'), ('a', 'c')])
+    assert depths == {'a': 0, 'd': 0, 'b': 1, 'c': 2}
+    assert cyclic == set()
+
+def test_layers_leave_cycles_and_what_follows_them():
+    depths, cyclic = load_order.layers(['a', 'b', 'c', 'd'], [('a', 'b'), ('b', 'a'), ('b', 'c'), ('d', 'c')])
+    assert depths == {'d': 0}
+    assert cyclic == {'a', 'b', 'c'}
+
+def test_find_cycle_skips_nodes_downstream_of_it():
+    edges = [('a', 'b'), ('b', 'a'), ('b', 'c')]
+    cycle = load_order.find_cycle({'a', 'b', 'c'}, edges)
+    assert cycle[0] == cycle[-1]
+    assert set(cycle) == {'a', 'b'}
+
+def test_parse_rules_keeps_order_rules_only():
+    parsed = load_order.parse_rules([rule('before', 'x'), rule('after', 'y'), rule('requires', 'z'),
+                                     rule('conflicts', 'w'), {'type': 'after'}, 'junk'])
+    assert parsed == [(False, {'id': 'x'}), (True, {'id': 'y'}), (True, {'id': 'z'})]
+
+def test_rules_give_depths():
+    order = build({'a': None, 'b': [rule('after', 'a')], 'c': [rule('before', 'b')], 'd': None})
+    # c loads before b, b after a: a and c at depth 0, b at 1
+    assert order.depth('a') == 0 and order.depth('c') == 0 and order.depth('d') == 0
+    assert order.depth('b') == 1
+    assert order.edges == 2
+    assert order.cycles == []
+
+def test_references_by_md5_and_file_expression():
+    attributes = {'a': {'fileMD5': 'ABC'}, 'b': {'logicalFileName': 'Cool Mod'}, 'c': {}}
+    order = build({'a': None, 'b': None,
+                   'c': [rule('after', fileMD5='abc'), rule('after', fileExpression='cool*')]},
+                  attributes.get)
+    assert order.depth('c') == 1
+    assert order.edges == 2
+
+def test_cycle_is_reported_and_its_rules_ignored():
+    order = build({'a': [rule('after', 'b')], 'b': [rule('after', 'a')], 'c': [rule('after', 'b')]})
+    assert len(order.cycles) == 1
+    assert set(order.cycles[0]) == {'a', 'b'}
+    # a and b fall back to depth 0, the rule c -> b still counts
+    assert order.depth('a') == 0 and order.depth('b') == 0
+    assert order.depth('c') == 1
+
+def test_cache_reuses_parsed_rules_and_result(monkeypatch):
+    rules = {'a': None, 'b': [rule('after', 'a')]}
+    first = build(rules)
+
+    def not_again(*args):
+        raise AssertionError("unchanged rules parsed or sorted again")
+    with monkeypatch.context() as patch:
+        patch.setattr(load_order, 'parse_rules', not_again)
+        patch.setattr(load_order, 'layers', not_again)
+        second = build(rules)
+    assert second.depths == first.depths
+    assert second.digest() == first.digest()
+
+    changed = build({'a': [rule('after', 'b')], 'b': None})
+    assert changed.depth('a') == 1 and changed.depth('b') == 0
+    assert changed.digest() != first.digest()
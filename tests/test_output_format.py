@@ -0,0 +1,43 @@
+import io
+import json
+import pytest
+import output_format
+from output_format import RecordWriter
+
+FIELDS = ['name', 'installation_path', 'enabled']
+
+def write(fmt, records, spec=None):
+    out = io.StringIO()
+    writer = RecordWriter(fmt, output_format.parse_fields(spec, FIELDS), out)
+    for record in records:
+        writer.write(record)
+    writer.close()
+    return out.getvalue()
+
+def test_tsv_escapes_separators():
+    text = write(output_format.TSV, [{'name': 'Tab\there', 'installation_path': 'C:\\mods\\x', 'enabled': True},
+                                     {'name': 'Two\nlines\r', 'installation_path': None, 'enabled': False}])
+    assert text.splitlines() == [
+        'name\tinstallation_path\tenabled',
+        'Tab\\there\tC:\\\\mods\\\\x\ttrue',
+        'Two\\nlines\\r\t\tfalse',
+    ]
+
+def test_fields_accept_camel_case_and_keep_the_given_name():
+    assert output_format.parse_fields('installationPath, name', FIELDS) == [
+        ('installationPath', 'installation_path'), ('name', 'name')]
+    text = write(output_format.JSONL, [{'name': 'A', 'installation_path': 'a', 'enabled': True}],
+                 'installationPath')
+    assert json.loads(text) == {'installationPath': 'a'}
+
+def test_unknown_or_empty_fields():
+    with pytest.raises(ValueError):
+        output_format.parse_fields('name,size', FIELDS)
+    with pytest.raises(ValueError):
+        output_format.parse_fields(' , ', FIELDS)
+
+def test_json_is_one_array():
+    records = [{'name': 'A', 'installation_path': 'a', 'enabled': True},
+               {'name': 'B', 'installation_path': 'b', 'enabled': False}]
+    assert json.loads(write(output_format.JSON, records)) == records
+    assert json.loads(write(output_format.JSON, [])) == []
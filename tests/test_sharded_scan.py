@@ -0,0 +1,62 @@
+import os
+import plyvel
+import pytest
+import sharded_scan
+
+KEYS = 20000
+
+@pytest.fixture
+def big_db(make_db):
+    """A database spread over several table files (small write buffer)"""
+    items = {f'persistent###mods###subnautica###mod{i:06d}###attributes###name': os.urandom(48).hex()
+             for i in range(KEYS)}
+    return make_db(items, write_buffer_size=64 * 1024)
+
+def count(db, start, stop):
+    return sum(1 for _ in sharded_scan.iterate(db, start, stop, include_value=False))
+
+def test_midpoint_is_strictly_between():
+    assert b'a' < sharded_scan._midpoint(b'a', b'c') < b'c'
+    assert b'abc' < sharded_scan._midpoint(b'abc', b'abd') < b'abd'
+    assert sharded_scan._midpoint(b'a', b'a') is None
+    assert sharded_scan._midpoint(b'a', b'a\0') is None
+
+def test_empty_database_and_single_shard(make_db):
+    db = plyvel.DB(make_db({}))
+    try:
+        assert sharded_scan.split_ranges(db, 8) == [(None, None)]
+    finally:
+        db.close()
+
+    db = plyvel.DB(make_db({'a': '1', 'b': '2'}, name='small'))
+    try:
+        assert sharded_scan.split_ranges(db, 1) == [(None, None)]
+    finally:
+        db.close()
+
+def test_ranges_cover_every_key_once(big_db):
+    db = plyvel.DB(big_db)
+    try:
+        ranges = sharded_scan.split_ranges(db, 4)
+        assert 1 < len(ranges) <= 4
+        assert ranges[0][0] is None and ranges[-1][1] is None
+        for (_, stop), (start, _) in zip(ranges, ranges[1:]):
+            assert stop == start and stop is not None
+        counts = [count(db, start, stop) for start, stop in ranges]
+    finally:
+        db.close()
+    assert sum(counts) == KEYS
+    # About the same size: no range is empty or holds almost everything
+    assert min(counts) > 0
+    assert max(counts) < KEYS * 0.75
+
+def test_map_ranges_single_job_runs_once(big_db):
+    assert list(sharded_scan.map_ranges(big_db, sharded_scan._count_keys, jobs=1)) == [KEYS]
+
+def test_map_ranges_parallel_matches_sequential(big_db, monkeypatch):
+    monkeypatch.setattr(sharded_scan, 'MIN_SHARD_BYTES', 1024)
+    results = list(sharded_scan.map_ranges(big_db, sharded_scan._count_keys, jobs=2, quiet=True))
+    assert len(results) > 1
+    assert sum(results) == KEYS
+    # Clones are removed afterwards
+    assert not [name for name in os.listdir(os.path.dirname(big_db)) if name.startswith('.scan-')]
@@ -0,0 +1,71 @@
+import plyvel
+import vortex_keys
+from vortex_keys import KeyRouter
+
+def route(router, key, value=b'null'):
+    return router.route(key.encode(), value)
+
+def recorder(calls, name):
+    return lambda value, *captures: calls.append((name, value) + captures)
+
+def test_literal_beats_capture():
+    calls = []
+    router = KeyRouter({'mod_name': recorder(calls, 'name'), 'mod_attribute': recorder(calls, 'attribute')})
+    assert route(router, 'persistent###mods###subnautica###m1###attributes###name', b'"Nice"')
+    assert route(router, 'persistent###mods###subnautica###m1###attributes###version', b'"1.0"')
+    assert calls == [('name', 'Nice', 'm1'), ('attribute', '1.0', 'm1', 'version')]
+
+def test_backtracks_from_a_literal_dead_end_to_a_capture():
+    # 'modState' is a literal below the profile, but only mod_enabled continues from it
+    calls = []
+    router = KeyRouter({'mod_enabled': recorder(calls, 'enabled'), 'profile_field': recorder(calls, 'field')})
+    assert route(router, 'persistent###profiles###p1###modState', b'{}')
+    assert route(router, 'persistent###profiles###p1###modState###m1###enabled', b'true')
+    assert calls == [('field', {}, 'p1', 'modState'), ('enabled', True, 'p1', 'm1')]
+
+def test_failed_branch_does_not_leak_captures_into_rest():
+    calls = []
+    router = KeyRouter({'mod_attribute': recorder(calls, 'attribute'), 'mod_other': recorder(calls, 'other')})
+    assert route(router, 'persistent###mods###subnautica###m1###attributes###a###b', b'x')
+    assert calls == [('other', b'x', 'm1', 'attributes###a###b')]
+
+def test_unmatched_keys_and_other_games():
+    calls = []
+    router = KeyRouter({'mod_type': recorder(calls, 'type')})
+    assert not route(router, 'persistent###mods###skyrim###m1###type')
+    assert not route(router, 'persistent###mods###subnautica###m1###type###extra')
+    assert calls == []
+
+def test_game_none_captures_the_game():
+    calls = []
+    router = KeyRouter({'mod_type': recorder(calls, 'type')}, game=None)
+    assert route(router, 'persistent###mods###skyrim###m1###type', b'"dinput"')
+    assert calls == [('type', 'dinput', 'skyrim', 'm1')]
+
+def test_undecodable_values_become_none():
+    calls = []
+    router = KeyRouter({'mod_enabled_time': recorder(calls, 'time')})
+    assert route(router, 'persistent###profiles###p1###modState###m1###enabledTime', b'soon')
+    assert calls == [('time', None, 'p1', 'm1')]
+
+def test_prefixes_are_minimal():
+    router = KeyRouter({'mod_type': print, 'mod_name': print, 'downloads_path': print})
+    assert router.prefixes() == [b'persistent###mods###subnautica###', b'settings###downloads###path']
+
+def test_scan_routes_only_the_registered_ranges(make_db):
+    path = make_db({
+        'persistent###mods###subnautica###m1###type': '"bepinex-plugin"',
+        'persistent###mods###subnautica###m2###type': '""',
+        'persistent###mods###skyrim###m3###type': '"dinput"',
+        'settings###mods###installPath###subnautica': '"C:\\\\staging"',
+    })
+    calls = []
+    router = KeyRouter({'mod_type': recorder(calls, 'type')})
+    db = plyvel.DB(path)
+    try:
+        assert router.scan(db) == 2
+        assert vortex_keys.get(db, 'staging_path', 'subnautica') == 'C:\\staging'
+        assert vortex_keys.get(db, 'mod_type', 'subnautica', mod='missing') is None
+    finally:
+        db.close()
+    assert calls == [('type', 'bepinex-plugin', 'm1'), ('type', '', 'm2')]
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Verify deployed mod links against the deploy manifest (or a fresh plan)
+and optionally repair only the broken entries.
+"""
+import contextlib
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import config
+import deploy_manifest
+import deploy_status
+import fs_batch
+import game_backups
+import run_history
+
+OK = 'ok'
+DANGLING = 'dangling'
+# For hardlinks and copies: the staging file changed since it was placed
+RETARGETED = 'retargeted'
+REPLACED = 'replaced-by-file'
+MISSING = 'missing'
+
+STATUSES = [OK, DANGLING, RETARGETED, REPLACED, MISSING]
+
+# Entries per worker task; keeps executor overhead low for thousands of links
+CHUNK_SIZE = 256
+
+def check_entry(dest, entry):
+    """Classify one expected link by looking at the game directory"""
+    src = entry['src']
+    try:
+        st = os.lstat(dest)
+    except (FileNotFoundError, NotADirectoryError):
+        return MISSING
+
+    if not deploy_manifest.is_owned(entry, st):
+        return REPLACED
+
+    if deploy_manifest.entry_method(entry) != fs_batch.SYMLINK:
+        # Hardlinks and copies: the staging file must still have the same
+        # content, which deploy carried over as size and mtime
+        try:
+            src_st = os.stat(src)
+        except FileNotFoundError:
+            return DANGLING
+        if (st.st_size, st.st_mtime_ns) != (src_st.st_size, src_st.st_mtime_ns):
+            return RETARGETED
+        return OK
+
+    if os.readlink(dest) != src:
+        return RETARGETED
+
+    if not os.path.exists(src):
+        return DANGLING
+
+    return OK
+
+def _check_chunk(chunk):
+    return [(dest, entry, check_entry(dest, entry)) for dest, entry in chunk]
+
+def check_entries(entries, jobs=None):
+    """
+    Classify all entries in parallel.
+
+    lstat/readlink release the GIL, so a thread pool overlaps the
+    filesystem round trips. Returns a list of (dest, entry, status).
+    """
+    items = list(entries.items())
+    chunks = [items[i:i + CHUNK_SIZE] for i in range(0, len(items), CHUNK_SIZE)]
+    if not chunks:
+        return []
+
+    jobs = jobs or min(32, (os.cpu_count() or 1) * 4)
+    results = []
+    with ThreadPoolExecutor(max_workers=min(jobs, len(chunks))) as executor:
+        for chunk_result in executor.map(_check_chunk, chunks):
+            results.extend(chunk_result)
+    return results
+
+def repair_entry(dest, entry, status, created_dirs=None, backups=None):
+    """
+    Fix one broken entry, returns True if the entry is now correct or gone.
+
+    Files are placed again with the entry's method; entry is updated with
+    the method and inode actually used. Directories that had to be
+    recreated are appended to created_dirs, and a real file in the way
+    (e.g. put back by a game update) is stored in the backup store and
+    recorded in backups.
+    """
+    src = entry['src']
+    if status == DANGLING:
+        # The staging file no longer exists, so the correct state is no link
+        os.remove(dest)
+        return True
+
+    if not os.path.exists(src):
+        print(f"  ✗ Cannot repair {dest}: staging file missing: {src}")
+        return False
+
+    if status == REPLACED and os.path.isdir(dest) and not os.path.islink(dest):
+        print(f"  ✗ Cannot repair {dest}: replaced by a directory")
+        return False
+
+    if status == REPLACED and backups is not None and os.path.isfile(dest) and not os.path.islink(dest):
+        backups[dest] = game_backups.back_up(dest)
+    if status in (RETARGETED, REPLACED):
+        os.remove(dest)
+
+    entry.pop('inode', None)
+    entry.update(fs_batch.place_file(src, dest, deploy_manifest.entry_method(entry), created_dirs))
+    return True
+
+def merge_plan(manifest, entries, repaired, failed, game, game_path):
+    """
+    Fold a repaired plan into the recorded manifest.
+
+    Entries that were fine keep their recorded method and inode, repaired
+    ones take what was placed now, and files the plan no longer has are
+    removed like a redeploy would (see deploy_mods.remove_stale_entries).
+    Returns (manifest, removed files).
+    """
+    if manifest is not None and manifest['game_path'] != game_path:
+        # Recorded for another game directory, not ours to clean up
+        manifest = None
+    recorded = manifest['entries'] if manifest is not None else {}
+    merged = {}
+    for dest, entry in entries.items():
+        old = recorded.get(dest)
+        if dest in failed or (dest not in repaired and old is not None and old['src'] == entry['src']
+                              and deploy_manifest.entry_method(old) == deploy_manifest.entry_method(entry)):
+            if old is not None:
+                merged[dest] = old
+            continue
+        merged[dest] = entry
+
+    if manifest is None:
+        manifest = deploy_manifest.new_manifest(game, game_path, None, None)
+        manifest['entries'] = merged
+        return manifest, []
+
+    import deploy_mods
+    previous = manifest
+    manifest = {**previous, 'entries': merged, 'backups': {}}
+    removed, _, pruned = deploy_mods.remove_stale_entries(previous, manifest)
+    manifest['dirs'] = [path for path in previous.get('dirs', []) if path not in pruned]
+    return manifest, removed
+
+def load_expected(use_plan, db_path, game, plan=None):
+    """Return (entries, game_path) from the manifest, the daemon's plan or a fresh plan"""
+    if use_plan and plan is not None:
+        return plan['entries'], plan['game_path']
+
+    if use_plan:
+        # Only import the database layer when it is actually needed
+        import deploy_mods
+        import staging_cache
+        data = deploy_mods.get_mod_data(db_path, game)
+        if not data:
+            return None, None
+        cache = staging_cache.ListingCache()
+        entries = deploy_mods.plan_deployment(data, cache)
+        cache.save()
+        data['classifier'].save()
+        return entries, data['game_path']
+
+    manifest = deploy_manifest.load_manifest()
+    if manifest is None:
+        print(f"ERROR: No deploy manifest found at {config.DEPLOY_MANIFEST}")
+        print("Run deploy_mods.py first, or use --plan to verify against the database")
+        return None, None
+    return manifest['entries'], manifest['game_path']
+
+def verify_deploy(use_plan=False, db_path=None, game='subnautica', repair=False,
+                  dry_run=False, verbose=False, jobs=None, plan=None):
+    """
+    Verify deployed links, returns True if everything is (now) correct
+
+    plan is a deploy plan already fetched from the query daemon.
+    """
+    print("="*80)
+    print("VORTEX DEPLOYMENT VERIFICATION")
+    print("="*80)
+    print()
+
+    run = run_history.current()
+    with run.phase('load'):
+        entries, game_path = load_expected(use_plan, db_path, game, plan)
+    if entries is None:
+        return False
+    run.set(links=len(entries))
+
+    print(f"Game Path: {game_path}")
+    print(f"Expected from: {'database plan' if use_plan else config.DEPLOY_MANIFEST}")
+    print(f"Checking {len(entries)} links...")
+    print()
+
+    with run.phase('check'):
+        results = check_entries(entries, jobs)
+
+    counts = {status: 0 for status in STATUSES}
+    broken = []
+    for dest, entry, status in results:
+        counts[status] += 1
+        if status != OK:
+            broken.append((dest, entry, status))
+
+    for status in STATUSES:
+        print(f"  {status:18s}: {counts[status]:6d}")
+    print()
+
+    if broken and (verbose or dry_run or not repair):
+        print("Broken entries:")
+        for dest, entry, status in sorted(broken, key=lambda item: item[0]):
+            print(f"  [{status}] {os.path.relpath(dest, game_path)} -> {entry['src']}")
+        print()
+
+    if not broken:
+        print("✓ Deployment is healthy")
+        return True
+
+    if not repair:
+        print("Run with --repair to fix only the broken entries")
+        return False
+
+    if dry_run:
+        print(f"DRY RUN MODE - {len(broken)} entries would be repaired")
+        return True
+
+    print(f"Repairing {len(broken)} entries...")
+    repaired = set()
+    failed = set()
+    created_dirs = []
+    backups = {}
+    # A file the last deployment placed (e.g. as a hardlink) is not a game file to keep
+    recorded = (deploy_manifest.load_manifest() or {}).get('entries', {}) if use_plan else {}
+    for dest, entry, status in broken:
+        try:
+            keep = backups
+            if dest in recorded and os.path.lexists(dest) and deploy_manifest.is_owned(recorded[dest], os.lstat(dest)):
+                keep = None
+            if repair_entry(dest, entry, status, created_dirs, keep):
+                repaired.add(dest)
+                if status == DANGLING:
+                    entries.pop(dest, None)
+                if verbose:
+                    print(f"  ✓ Repaired [{status}]: {os.path.relpath(dest, game_path)}")
+            else:
+                failed.add(dest)
+        except OSError as e:
+            failed.add(dest)
+            print(f"  ✗ Failed to repair {dest}: {e}")
+
+    # Keep the manifest in line with what is now on disk
+    manifest = deploy_manifest.load_manifest()
+    stale = []
+    if use_plan:
+        manifest, stale = merge_plan(manifest, entries, repaired, failed, game, game_path)
+    elif manifest is not None:
+        manifest['entries'] = entries
+    if manifest is not None:
+        manifest['dirs'] = sorted(set(manifest.get('dirs', [])) | set(created_dirs))
+        manifest.setdefault('backups', {}).update(backups)
+        deploy_manifest.save_manifest(manifest)
+        deploy_status.manifest_updated()
+
+    print()
+    print(f"Repaired: {len(repaired)}")
+    if stale:
+        print(f"Removed {len(stale)} files that are no longer planned")
+    if failed:
+        print(f"Failed: {len(failed)}")
+    return not failed
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Verify deployed mod links and repair broken ones',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Check links recorded by the last deployment
+  python3 verify_deploy.py
+
+  # Fix only dangling, retargeted, replaced or missing links
+  python3 verify_deploy.py --repair
+
+  # Check against what the Vortex database says should be deployed
+  python3 verify_deploy.py --plan
+        """
+    )
+    parser.add_argument('--plan', action='store_true',
+                        help='Verify against a fresh plan from the database instead of the manifest')
+    parser.add_argument('--db', default=None, help='Path to LevelDB database (default: auto-detect from config)')
+    parser.add_argument('--game', default=config.DEFAULT_GAME, help=f'Game name (default: {config.DEFAULT_GAME})')
+    parser.add_argument('--repair', action='store_true', help='Repair broken entries')
+    parser.add_argument('--dry-run', action='store_true', help='Preview repairs without making them')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Show detailed output')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Number of parallel workers')
+    parser.add_argument('--use-daemon', action='store_true',
+                        help='With --plan: get the plan from the running query daemon (vortex_daemon.py)')
+
+    args = parser.parse_args()
+
+    run = run_history.start('verify-repair' if args.repair else 'verify')
+
+    # The daemon has its own copy; without it (or if it isn't running) the
+    # plan is computed from the database
+    plan = None
+    if args.plan and args.use_daemon:
+        import vortex_daemon
+        plan = vortex_daemon.request('deploy_plan', game=args.game)
+
+    # Repairs change the game directory and --plan replaces the local database copy
+    if (args.repair and not args.dry_run) or (args.plan and plan is None):
+        lock = config.tool_lock('verify-repair' if args.repair else 'verify')
+    else:
+        lock = contextlib.nullcontext()
+    with lock:
+        # Only the plan mode needs the database
+        if args.plan and args.db is None and plan is None:
+            try:
+                with run.phase('copy'):
+                    args.db = config.get_safe_db_path()
+            except (FileNotFoundError, RuntimeError) as e:
+                print(f"ERROR: {e}")
+                sys.exit(1)
+
+        success = verify_deploy(args.plan, args.db, args.game, args.repair,
+                                args.dry_run, args.verbose, args.jobs, plan)
+    run.finish(success)
+    sys.exit(0 if success else 1)
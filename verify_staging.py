@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Verify downloaded archives and staging folders against the Vortex database.
+
+Downloads are hashed and compared with the fileMD5/size Vortex recorded,
+installed mods are compared member by member (size and CRC) with the zip
+archive they were installed from, and downloads with the same MD5 are
+reported as duplicates together with the bytes that could be reclaimed.
+
+Hashing runs in a process pool. Files are read in fixed-size chunks and
+only a bounded number of tasks is in flight, so memory stays flat no
+matter how many hundreds of GB of downloads there are.
+"""
+import contextlib
+import hashlib
+import os
+import sys
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import config
+import run_history
+import vortex_keys
+from deploy_mods import win_to_linux
+from run_history import format_size
+
+CHUNK_SIZE = 1024 * 1024
+
+# Download statuses
+OK = 'ok'
+MISSING = 'missing'
+SIZE_MISMATCH = 'size-mismatch'
+MD5_MISMATCH = 'md5-mismatch'
+UNVERIFIED = 'no-md5-recorded'
+
+# Staging statuses
+CORRUPT = 'corrupt'
+PARTIAL = 'partial'
+STAGING_MISSING = 'staging-missing'
+NO_ARCHIVE = 'no-archive'
+UNSUPPORTED = 'unsupported-archive'
+
+# Marker files Vortex writes itself; they are not part of any archive
+VORTEX_MARKERS = ('__folder_managed_by_vortex', '__vortex_staging_folder', '__vortex_downloads_folder')
+
+def hash_file(path):
+    """Return (md5 hex digest, size) reading the file in chunks"""
+    md5 = hashlib.md5()
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            md5.update(chunk)
+            size += len(chunk)
+    return md5.hexdigest(), size
+
+def crc_file(path):
+    """CRC32 of a file, the checksum zip archives store per member"""
+    crc = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+def check_download(download_id, path, expected_size, expected_md5, do_hash):
+    """Worker: returns (download_id, status, md5, size)"""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return download_id, MISSING, None, None
+
+    if expected_size is not None and size != expected_size:
+        return download_id, SIZE_MISMATCH, None, size
+
+    if not do_hash:
+        return download_id, OK if expected_md5 else UNVERIFIED, expected_md5, size
+
+    md5, size = hash_file(path)
+    if not expected_md5:
+        return download_id, UNVERIFIED, md5, size
+    return download_id, OK if md5 == expected_md5 else MD5_MISMATCH, md5, size
+
+def check_staging(mod_id, archive_path, staging_dir):
+    """
+    Worker: compare a mod's staging folder with its zip archive.
+
+    Installers may move files to other folders, so files are matched by
+    name and then by size and CRC. A staging file whose name is in the
+    archive but whose content matches no member is corrupt, as is one
+    that vanished or can't be read during the check; archive members
+    missing from staging make the folder partial (which is what any FOMOD
+    or other selective install looks like, so it is not a problem).
+    Returns (mod_id, status, details).
+    """
+    if not os.path.isdir(staging_dir):
+        return mod_id, STAGING_MISSING, []
+    if not archive_path or not os.path.isfile(archive_path):
+        return mod_id, NO_ARCHIVE, []
+    if not zipfile.is_zipfile(archive_path):
+        return mod_id, UNSUPPORTED, []
+
+    # file name -> set of (size, crc) of archive members with that name
+    members = {}
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    name = os.path.basename(info.filename).lower()
+                    members.setdefault(name, set()).add((info.file_size, info.CRC))
+    except (zipfile.BadZipFile, OSError) as e:
+        return mod_id, UNSUPPORTED, [str(e)]
+
+    corrupt = []
+    seen = set()
+    for root, _, files in os.walk(staging_dir):
+        for name in files:
+            if name in VORTEX_MARKERS:
+                continue
+            key = name.lower()
+            expected = members.get(key)
+            if expected is None:
+                continue
+            seen.add(key)
+            path = os.path.join(root, name)
+            try:
+                size = os.path.getsize(path)
+                # Only read the file if some member has the same size
+                if not any(size == member_size for member_size, _ in expected) or \
+                        (size, crc_file(path)) not in expected:
+                    corrupt.append(os.path.relpath(path, staging_dir))
+            except OSError as e:
+                # Removed by Vortex meanwhile, or unreadable: one bad file, not a failed run
+                corrupt.append(f"{os.path.relpath(path, staging_dir)} ({e.strerror or e})")
+
+    if corrupt:
+        return mod_id, CORRUPT, corrupt
+    missing = sorted(set(members) - seen)
+    if missing:
+        return mod_id, PARTIAL, missing
+    return mod_id, OK, []
+
+def run_bounded(executor, fn, tasks, limit):
+    """Submit tasks keeping at most `limit` in flight, yield results as they finish"""
+    pending = set()
+    for task in tasks:
+        if len(pending) >= limit:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+        pending.add(executor.submit(fn, *task))
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+def load_metadata(db_path, game):
+    """Downloads, mods and paths of a game in one routed pass"""
+    downloads = {}
+    archive_ids = {}
+    settings = {'downloads_path': None}
+
+    def download_field(value, download_id, field):
+        if field in ('localPath', 'fileMD5', 'size', 'game', 'state'):
+            downloads.setdefault(download_id, {})[field] = value
+
+    state = vortex_keys.load_state(db_path, game, keep_attributes=('fileMD5', 'fileSize'), extra_handlers={
+        'download_field': download_field,
+        'downloads_path': lambda value: settings.__setitem__('downloads_path', value),
+        'mod_archive_id': lambda value, mod_id: archive_ids.__setitem__(mod_id, value),
+    })
+    if state is None:
+        return None
+
+    # Only this game's downloads
+    downloads = {download_id: info for download_id, info in downloads.items()
+                 if game in (info.get('game') or [])}
+
+    state['downloads'] = downloads
+    state['archive_ids'] = archive_ids
+    downloads_path = win_to_linux(settings['downloads_path'] or r'{USERDATA}\downloads')
+    state['download_dir'] = os.path.join(downloads_path, game)
+    state['staging_dir'] = win_to_linux(state['staging_path'])
+    return state
+
+def verify_staging(db_path='state/', game='subnautica', jobs=None, quick=False,
+                   check_archives=True, verbose=False):
+    """Verify downloads and staging folders, returns True if nothing is wrong"""
+    print("="*80)
+    print("VORTEX STAGING VERIFICATION")
+    print("="*80)
+
+    run = run_history.current()
+    run.set_db(db_path)
+    with run.phase('load'):
+        state = load_metadata(db_path, game)
+    if state is None:
+        return False
+
+    downloads = state['downloads']
+    download_dir = state['download_dir']
+    staging_dir = state['staging_dir']
+    library = state['library']
+    jobs = jobs or os.cpu_count() or 1
+    # A couple of queued tasks per worker keeps the pool busy without
+    # holding a result list for every file
+    limit = jobs * 2
+
+    print(f"Download directory: {download_dir}")
+    print(f"Staging directory: {staging_dir}")
+    print(f"Downloads: {len(downloads)}, installed mods: {len(library.installed_records())}")
+    print(f"Workers: {jobs}{' (quick: sizes only)' if quick else ''}")
+    print()
+
+    problems = 0
+    download_status = {}
+    download_md5 = {}
+    download_size = {}
+
+    tasks = []
+    for download_id, info in sorted(downloads.items()):
+        if not info.get('localPath'):
+            continue
+        path = os.path.join(download_dir, info['localPath'])
+        tasks.append((download_id, path, info.get('size'), info.get('fileMD5'), not quick))
+
+    print(f"Checking {len(tasks)} downloads...")
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for download_id, status, md5, size in run_bounded(executor, check_download, tasks, limit):
+            download_status[download_id] = status
+            download_md5[download_id] = md5
+            download_size[download_id] = size
+            local_path = downloads[download_id]['localPath']
+            if status in (OK, UNVERIFIED):
+                if verbose:
+                    print(f"  ✓ {local_path} ({status})")
+                continue
+            problems += 1
+            detail = ''
+            if status == SIZE_MISMATCH:
+                detail = f" (expected {downloads[download_id].get('size')} bytes, found {size})"
+            print(f"  ✗ {local_path}: {status}{detail}")
+
+        staging_results = {}
+        if check_archives and staging_dir:
+            staging_tasks = []
+            for record in library.installed_records():
+                if not record.installation_path:
+                    continue
+                download = downloads.get(state['archive_ids'].get(record.id))
+                archive_path = None
+                if download and download.get('localPath'):
+                    archive_path = os.path.join(download_dir, download['localPath'])
+                staging_tasks.append((record.id, archive_path,
+                                      os.path.join(staging_dir, record.installation_path)))
+
+            print(f"\nComparing {len(staging_tasks)} staging folders with their archives...")
+            for mod_id, status, details in run_bounded(executor, check_staging, staging_tasks, limit):
+                staging_results[mod_id] = status
+                record = library.get(mod_id)
+                if status in (OK, NO_ARCHIVE, UNSUPPORTED):
+                    if verbose:
+                        print(f"  ✓ {record.display_name} ({status})")
+                    continue
+                if status == PARTIAL:
+                    # FOMOD and other selective installers leave archive files out on purpose
+                    if verbose:
+                        print(f"  ⚠ {record.display_name}: {status} ({len(details)} archive files not installed)")
+                    continue
+                problems += 1
+                print(f"  ✗ {record.display_name}: {status}")
+                for detail in details[:10]:
+                    print(f"      {detail}")
+                if len(details) > 10:
+                    print(f"      ... and {len(details) - 10} more")
+
+    # Mods installed from a different version of the archive than the download
+    for record in library.installed_records():
+        mod_md5 = record.attribute('fileMD5')
+        archive_id = state['archive_ids'].get(record.id)
+        if mod_md5 and archive_id in downloads:
+            md5 = download_md5.get(archive_id) or downloads[archive_id].get('fileMD5')
+            if md5 and md5 != mod_md5:
+                problems += 1
+                print(f"  ✗ {record.display_name}: installed archive MD5 {mod_md5} differs from download {md5}")
+
+    # Duplicate downloads (same content stored more than once)
+    by_md5 = {}
+    for download_id, md5 in download_md5.items():
+        if md5 and download_status[download_id] != MISSING:
+            by_md5.setdefault(md5, []).append(download_id)
+    duplicates = {md5: ids for md5, ids in by_md5.items() if len(ids) > 1}
+    duplicate_bytes = sum(download_size[i] or 0 for ids in duplicates.values() for i in sorted(ids)[1:])
+
+    if duplicates:
+        print("\nDuplicate downloads:")
+        for md5, ids in sorted(duplicates.items()):
+            print(f"  {md5}:")
+            for download_id in sorted(ids):
+                print(f"    {downloads[download_id]['localPath']} ({format_size(download_size[download_id] or 0)})")
+
+    # Files in the download directory that no download entry refers to
+    known = {info['localPath'] for info in downloads.values() if info.get('localPath')}
+    orphans = []
+    if os.path.isdir(download_dir):
+        for entry in os.scandir(download_dir):
+            if entry.is_file() and entry.name not in known and \
+                    not entry.name.startswith('.') and entry.name not in VORTEX_MARKERS:
+                orphans.append((entry.name, entry.stat().st_size))
+    orphan_bytes = sum(size for _, size in orphans)
+
+    if orphans:
+        print("\nFiles not known to Vortex:")
+        for name, size in sorted(orphans):
+            print(f"  {name} ({format_size(size)})")
+
+    print()
+    print("="*80)
+    print("SUMMARY")
+    print("="*80)
+    for status in (OK, UNVERIFIED, MISSING, SIZE_MISMATCH, MD5_MISMATCH):
+        count = sum(1 for s in download_status.values() if s == status)
+        if count:
+            print(f"Downloads {status}: {count}")
+    for status in (OK, CORRUPT, PARTIAL, STAGING_MISSING, NO_ARCHIVE, UNSUPPORTED):
+        count = sum(1 for s in staging_results.values() if s == status)
+        if count:
+            print(f"Staging {status}: {count}"
+                  + (" (archive files not installed, normal for FOMOD and other selective installs;"
+                     " not counted as problems)" if status == PARTIAL else ""))
+    print(f"Duplicate downloads: {sum(len(ids) - 1 for ids in duplicates.values())} "
+          f"({format_size(duplicate_bytes)} reclaimable)")
+    print(f"Unknown files in download directory: {len(orphans)} ({format_size(orphan_bytes)} reclaimable)")
+    print(f"Problems found: {problems}")
+    run.set(files=len(tasks), problems=problems)
+    return problems == 0
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Verify downloads and staging folders against the Vortex database',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Hash all downloads and compare staging folders with their archives
+  vortex-verify-staging
+
+  # Only compare sizes (fast), skip the archive comparison
+  vortex-verify-staging --quick --no-archives
+
+  # Use 4 worker processes and list every checked item
+  vortex-verify-staging --jobs 4 --verbose
+        """
+    )
+    parser.add_argument('--db', default=None, help='Path to LevelDB database (default: auto-detect from config)')
+    parser.add_argument('--game', default=config.DEFAULT_GAME, help=f'Game name (default: {config.DEFAULT_GAME})')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--quick', action='store_true', help='Only compare sizes, do not hash downloads')
+    parser.add_argument('--no-archives', action='store_true', help='Do not compare staging folders with archives')
+    parser.add_argument('--verbose', action='store_true', help='Also list items that are OK')
+
+    args = parser.parse_args()
+
+    run = run_history.start('verify-staging-quick' if args.quick else 'verify-staging')
+
+    # The copy replaces the local database another command may be reading
+    with config.tool_lock('verify-staging') if args.db is None else contextlib.nullcontext():
+        # Use config if no db path specified
+        if args.db is None:
+            try:
+                with run.phase('copy'):
+                    args.db = config.get_safe_db_path()
+            except (FileNotFoundError, RuntimeError) as e:
+                print(f"ERROR: {e}")
+                sys.exit(1)
+
+        success = verify_staging(args.db, args.game, args.jobs, args.quick,
+                                 not args.no_archives, args.verbose)
+    run.finish(success)
+    sys.exit(0 if success else 1)
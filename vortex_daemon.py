@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Local query daemon that keeps the parsed Vortex state in memory.
+
+Every script normally copies state.v2, opens it and parses it on each
+call. The daemon does that once, then answers queries over a Unix domain
+socket in a JSON-lines protocol: one request object per line, e.g.
+
+    {"cmd": "enabled_mods", "game": "subnautica"}
+
+and one response per line, {"ok": true, "result": ...} or
+{"ok": false, "error": "..."}.
+
+It reloads when state.v2 changes: inotify (through ctypes, no extra
+dependency) wakes it up, and the database fingerprint decides whether the
+content really changed. Without inotify it falls back to polling the
+fingerprint. While Vortex is running the last loaded state is served and
+marked as such; the reload happens once Vortex has closed.
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import socket
+import socketserver
+import sys
+import threading
+import time
+import config
+import vortex_keys
+
+# Seconds between fingerprint checks (also the fallback when inotify is missing)
+POLL_INTERVAL = 5.0
+# Wait this long after the last inotify event before checking (Vortex writes in bursts)
+SETTLE_TIME = 0.5
+# Client side: give up quickly so the CLIs can fall back to reading the database
+CLIENT_TIMEOUT = 10.0
+
+# inotify(7) event masks
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+def _inotify_open(paths):
+    """inotify fd watching the given directories, None if inotify is unavailable"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    for path in paths:
+        if os.path.isdir(path):
+            libc.inotify_add_watch(fd, path.encode(), WATCH_MASK)
+    return fd
+
+class StateCache:
+    """Parsed state per game, reloaded from a fresh copy when the database changes"""
+
+    def __init__(self, source=None, copy_path=None):
+        self.source = source or config.VORTEX_STATE_DB
+        self.copy_path = copy_path or config.DAEMON_STATE_COPY
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        # One deploy plan at a time: requests run in their own threads, and the
+        # listing, type and load order caches aren't made for concurrent planners
+        self.plan_lock = threading.Lock()
+        self.states = {}
+        self.fingerprint = None
+        self.loaded_at = None
+        self.vortex_running = False
+        self.reloads = 0
+        self.listing_cache = None
+        self.type_cache = None
+
+    def _load_game(self, game):
+        import load_order
+        rules = {}
+        state = vortex_keys.load_state(self.copy_path, game,
+                                       keep_attributes=('shortDescription',) + load_order.MATCH_ATTRIBUTES,
+                                       extra_handlers={'mod_rules': lambda value, mod: rules.__setitem__(mod, value)})
+        if state is None:
+            raise RuntimeError(f"Could not open database copy {self.copy_path}")
+        # For deploy plans (see load_order.py)
+        state['rules'] = rules
+        return state
+
+    def refresh(self, force=False):
+        """Reload if the database changed, returns True if a reload happened"""
+        with self.refresh_lock:
+            self.vortex_running = config.is_vortex_running()
+            if self.vortex_running:
+                # Keep serving the last consistent state until Vortex closes
+                return False
+
+            fingerprint = config.db_fingerprint(self.source)
+            if not force and fingerprint == self.fingerprint:
+                return False
+
+            with self.lock:
+                config.copy_database_to_local(self.copy_path)
+                games = list(self.states) or [config.DEFAULT_GAME]
+                self.states = {game: self._load_game(game) for game in games}
+                self.fingerprint = fingerprint
+                self.loaded_at = time.time()
+                self.reloads += 1
+        print(f"✓ State loaded ({', '.join(games)}), fingerprint {fingerprint[:12]}", flush=True)
+        return True
+
+    def get(self, game):
+        with self.lock:
+            state = self.states.get(game)
+            if state is None:
+                if self.fingerprint is None:
+                    raise RuntimeError("No state loaded yet (close Vortex so the daemon can read it)")
+                state = self.states[game] = self._load_game(game)
+            return state
+
+def _profile_id(state, params):
+    profile_id = params.get('profile') or state['active_profile_id']
+    if not profile_id:
+        raise RuntimeError("Could not find active profile")
+    return profile_id
+
+def cmd_status(cache, params):
+    return {
+        'fingerprint': cache.fingerprint,
+        'loaded_at': cache.loaded_at,
+        'vortex_running': cache.vortex_running,
+        'games': sorted(cache.states),
+        'reloads': cache.reloads,
+    }
+
+def cmd_enabled_mods(cache, params):
+    import find_enabled_mods
+    state = cache.get(params.get('game', config.DEFAULT_GAME))
+    return find_enabled_mods.enabled_mods_report(state['library'], _profile_id(state, params))
+
+def cmd_mod_paths(cache, params):
+    import find_mod_paths
+    state = cache.get(params.get('game', config.DEFAULT_GAME))
+    return find_mod_paths.mod_paths_report(state['library'], _profile_id(state, params),
+                                           state['game_path'], state['staging_path'],
+                                           params.get('all', False))
+
+def cmd_profile_diff(cache, params):
+    """Mods enabled in one profile but not the other"""
+    state = cache.get(params.get('game', config.DEFAULT_GAME))
+    library = state['library']
+    profile_a = params.get('a') or state['active_profile_id']
+    profile_b = params.get('b')
+    if not profile_b:
+        raise RuntimeError("profile_diff needs 'b' (and optionally 'a', default: active profile)")
+    enabled_a = {record.id: record.display_name for record in library.enabled_records(profile_a)}
+    enabled_b = {record.id: record.display_name for record in library.enabled_records(profile_b)}
+    return {
+        'a': {'id': profile_a, 'name': library.profile_name(profile_a)},
+        'b': {'id': profile_b, 'name': library.profile_name(profile_b)},
+        'only_in_a': sorted((enabled_a[i], i) for i in set(enabled_a) - set(enabled_b)),
+        'only_in_b': sorted((enabled_b[i], i) for i in set(enabled_b) - set(enabled_a)),
+        'in_both': len(set(enabled_a) & set(enabled_b)),
+    }
+
+def cmd_deploy_plan(cache, params):
+    """The links a deployment would create, as deploy_mods.plan_deployment() returns them"""
+    import classify_mods
+    import deploy_mods
+    import load_order
+    import staging_cache
+    game = params.get('game', config.DEFAULT_GAME)
+    state = cache.get(game)
+    library = state['library']
+    data = {
+        'active_profile_id': _profile_id(state, params),
+        'library': library,
+        'game_path': deploy_mods.win_to_linux(state['game_path']),
+        'staging_path': deploy_mods.win_to_linux(state['staging_path']),
+        'mods_info': {record.id: record for record in library.installed_records()},
+    }
+    with cache.plan_lock:
+        if cache.listing_cache is None:
+            cache.listing_cache = staging_cache.ListingCache()
+        if cache.type_cache is None:
+            cache.type_cache = classify_mods.TypeCache(listings=cache.listing_cache)
+        data['classifier'] = cache.type_cache
+        enabled = library.enabled_records(data['active_profile_id'])
+        data['load_order'] = load_order.build({record.id: state['rules'].get(record.id) for record in enabled},
+                                              lambda mod_id: library.get(mod_id).attributes)
+        entries = deploy_mods.plan_deployment(data, cache.listing_cache)
+        cache.listing_cache.save()
+        cache.type_cache.save()
+    return {'game_path': data['game_path'], 'entries': entries}
+
+def cmd_reload(cache, params):
+    return {'reloaded': cache.refresh(force=True)}
+
+COMMANDS = {
+    'status': cmd_status,
+    'enabled_mods': cmd_enabled_mods,
+    'mod_paths': cmd_mod_paths,
+    'profile_diff': cmd_profile_diff,
+    'deploy_plan': cmd_deploy_plan,
+    'reload': cmd_reload,
+}
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                cmd = request.pop('cmd')
+                if cmd == 'shutdown':
+                    self._reply({'ok': True, 'result': {'stopping': True}})
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                    return
+                if cmd not in COMMANDS:
+                    raise RuntimeError(f"Unknown command: {cmd}")
+                response = {'ok': True, 'result': COMMANDS[cmd](self.server.cache, request)}
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            self._reply(response)
+
+    def _reply(self, response):
+        self.wfile.write(json.dumps(response).encode() + b'\n')
+        self.wfile.flush()
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def watch(cache, stop):
+    """Reload the cache whenever the database (or the lockfile) changes"""
+    fd = _inotify_open([cache.source, os.path.dirname(config.VORTEX_LOCKFILE)])
+    if fd is None:
+        print(f"inotify unavailable, polling every {POLL_INTERVAL}s", flush=True)
+
+    while not stop.is_set():
+        if fd is not None:
+            readable, _, _ = select.select([fd], [], [], POLL_INTERVAL)
+            if readable:
+                # Drain the burst of events, then let Vortex finish writing
+                while True:
+                    try:
+                        if not os.read(fd, 65536):
+                            break
+                    except BlockingIOError:
+                        break
+                time.sleep(SETTLE_TIME)
+        else:
+            stop.wait(POLL_INTERVAL)
+
+        try:
+            cache.refresh()
+        except (OSError, RuntimeError) as e:
+            print(f"Warning: Could not refresh state: {e}", flush=True)
+
+    if fd is not None:
+        os.close(fd)
+
+def _socket_in_use(path):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        client.close()
+
+def serve(socket_path=None, game=None):
+    """Run the daemon until it is told to shut down"""
+    socket_path = socket_path or config.DAEMON_SOCKET
+    if os.path.exists(socket_path):
+        if _socket_in_use(socket_path):
+            print(f"ERROR: A daemon is already listening on {socket_path}")
+            return False
+        os.remove(socket_path)
+
+    cache = StateCache()
+    if game:
+        cache.states[game] = None
+    try:
+        cache.refresh(force=True)
+    except (OSError, RuntimeError) as e:
+        print(f"Warning: {e}")
+    if cache.vortex_running:
+        print("Vortex is running, the state will be loaded once it closes")
+
+    # Only this user may talk to the daemon
+    old_umask = os.umask(0o077)
+    try:
+        server = _Server(socket_path, _RequestHandler)
+    finally:
+        os.umask(old_umask)
+    server.cache = cache
+
+    stop = threading.Event()
+    watcher = threading.Thread(target=watch, args=(cache, stop), daemon=True)
+    watcher.start()
+
+    print(f"Listening on {socket_path}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+    print("Daemon stopped")
+    return True
+
+def request(cmd, socket_path=None, quiet=False, **params):
+    """
+    Send one request to the daemon and return its result.
+
+    Returns None if no daemon is running or the request failed, so callers
+    can fall back to reading the database themselves.
+    """
+    socket_path = socket_path or config.DAEMON_SOCKET
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(CLIENT_TIMEOUT)
+    try:
+        client.connect(socket_path)
+        client.sendall(json.dumps(dict(params, cmd=cmd)).encode() + b'\n')
+        with client.makefile('rb') as f:
+            response = json.loads(f.readline())
+    except (OSError, ValueError) as e:
+        if not quiet:
+            print(f"Query daemon not available ({e}), reading the database instead", file=sys.stderr)
+        return None
+    finally:
+        client.close()
+
+    if not response.get('ok'):
+        if not quiet:
+            print(f"Query daemon error: {response.get('error')}", file=sys.stderr)
+        return None
+    return response['result']
+
+def _parse_params(pairs):
+    """key=value arguments; values are JSON if they parse, strings otherwise"""
+    params = {}
+    for pair in pairs:
+        key, _, value = pair.partition('=')
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    return params
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Local query daemon holding the parsed Vortex state in memory',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Start the daemon (e.g. from your session autostart)
+  python3 vortex_daemon.py serve &
+
+  # Use it from the existing scripts
+  python3 find_enabled_mods.py --use-daemon
+  python3 find_mod_paths.py --use-daemon --all
+  python3 verify_deploy.py --plan --use-daemon
+
+  # Raw queries
+  python3 vortex_daemon.py query enabled_mods
+  python3 vortex_daemon.py query profile_diff b=<profile id>
+  python3 vortex_daemon.py query deploy_plan game=subnautica
+
+  # Status and shutdown
+  python3 vortex_daemon.py status
+  python3 vortex_daemon.py stop
+        """
+    )
+    parser.add_argument('--socket', default=None, help=f'Socket path (default: {config.DAEMON_SOCKET})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='Run the daemon')
+    serve_parser.add_argument('--game', default=config.DEFAULT_GAME,
+                              help=f'Game to load at startup (default: {config.DEFAULT_GAME})')
+
+    subparsers.add_parser('status', help='Show what the daemon has loaded')
+    subparsers.add_parser('stop', help='Stop the daemon')
+
+    query_parser = subparsers.add_parser('query', help='Send a raw query and print the JSON result')
+    query_parser.add_argument('cmd', choices=sorted(COMMANDS), help='Query to run')
+    query_parser.add_argument('params', nargs='*', help='key=value parameters')
+
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        success = serve(args.socket, args.game)
+    elif args.command == 'stop':
+        success = request('shutdown', args.socket) is not None
+        if success:
+            print("✓ Daemon stopping")
+    else:
+        cmd = 'status' if args.command == 'status' else args.cmd
+        params = {} if args.command == 'status' else _parse_params(args.params)
+        result = request(cmd, args.socket, **params)
+        success = result is not None
+        if success:
+            print(json.dumps(result, indent=2))
+
+    sys.exit(0 if success else 1)
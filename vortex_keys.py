@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Declarative schema of the Vortex state keys the tools care about.
+
+Keys are `###`-separated paths. Each schema entry is a key pattern whose
+segments are either literals or `{captures}`; a final `{*rest}` captures
+the remaining path. The patterns a tool asks for are compiled into a
+segment-level dispatch tree, so every key is decoded and split once and
+routed straight to its handler with its value already decoded. Adding a
+field means adding a schema entry, not another per-key check.
+"""
+import json
+import plyvel
+
+# Value decoders
+JSON = 'json'
+BOOL = 'bool'
+INT = 'int'
+TEXT = 'text'
+RAW = 'raw'
+
+# name -> (pattern, value kind). {game} is bound when the router is built
+# for one game; a router built with game=None captures it like any other.
+SCHEMA = {
+    # Settings
+    'active_profile': ('settings###profiles###lastActiveProfile###{game}', JSON),
+    'game_path': ('settings###gameMode###discovered###{game}###path', JSON),
+    'staging_path': ('settings###mods###installPath###{game}', JSON),
+    'downloads_path': ('settings###downloads###path', JSON),
+    'setting': ('settings###{*path}', JSON),
+
+    # Profiles
+    'profile_name': ('persistent###profiles###{profile}###name', JSON),
+    'profile_game': ('persistent###profiles###{profile}###gameId', JSON),
+    'profile_field': ('persistent###profiles###{profile}###{field}', JSON),
+    'mod_enabled': ('persistent###profiles###{profile}###modState###{mod}###enabled', BOOL),
+    'mod_enabled_time': ('persistent###profiles###{profile}###modState###{mod}###enabledTime', INT),
+
+    # Installed mods of the game
+    'mod_installation_path': ('persistent###mods###{game}###{mod}###installationPath', JSON),
+    'mod_type': ('persistent###mods###{game}###{mod}###type', JSON),
+    'mod_state': ('persistent###mods###{game}###{mod}###state', JSON),
+    'mod_rules': ('persistent###mods###{game}###{mod}###rules', JSON),
+    'mod_archive_id': ('persistent###mods###{game}###{mod}###archiveId', JSON),
+    'mod_name': ('persistent###mods###{game}###{mod}###attributes###name', JSON),
+    'mod_attribute': ('persistent###mods###{game}###{mod}###attributes###{attribute}', JSON),
+    # Any other key of a mod (only routed here if no other pattern matched).
+    # mod_other leaves the value undecoded for callers that only need the id.
+    'mod_other': ('persistent###mods###{game}###{mod}###{*rest}', RAW),
+    'mod_extra': ('persistent###mods###{game}###{mod}###{*rest}', JSON),
+
+    # Downloads
+    'download_field': ('persistent###downloads###files###{download}###{field}', JSON),
+    'download_game': ('persistent###downloads###files###{download}###game', JSON),
+    'download_mod_info': ('persistent###downloads###files###{download}###modInfo###{*path}', JSON),
+    'download_extra': ('persistent###downloads###files###{download}###{*rest}', JSON),
+}
+
+def decode_value(value, kind):
+    """Decode a raw LevelDB value, None if it can't be decoded"""
+    if kind == RAW:
+        return value
+    if kind == BOOL:
+        return value == b'true'
+    try:
+        if kind == JSON:
+            return json.loads(value)
+        if kind == INT:
+            return int(value)
+        return value.decode('utf-8')
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def key_for(name, game='subnautica', **captures):
+    """Build the raw key of a schema entry, e.g. key_for('game_path', game)"""
+    pattern, _ = SCHEMA[name]
+    return pattern.format(game=game, **captures).encode()
+
+def get(db, name, game='subnautica', **captures):
+    """Point lookup of a single schema key, decoded (None if missing)"""
+    _, kind = SCHEMA[name]
+    value = db.get(key_for(name, game, **captures))
+    return None if value is None else decode_value(value, kind)
+
+class _Node:
+    __slots__ = ('literals', 'capture', 'rest', 'end')
+
+    def __init__(self):
+        self.literals = {}
+        self.capture = None
+        self.rest = None
+        self.end = None
+
+class KeyRouter:
+    """
+    Dispatch keys to handlers by walking a tree of key segments.
+
+    handlers maps schema names to callables invoked as
+    handler(value, *captures). Literal segments win over captures, so
+    'mod_name' takes the name attribute even if 'mod_attribute' is also
+    registered.
+    """
+
+    def __init__(self, handlers, game='subnautica', schema=SCHEMA):
+        self.root = _Node()
+        self.game = game
+        self.patterns = []
+        for name, handler in handlers.items():
+            pattern, kind = schema[name]
+            if game is not None:
+                pattern = pattern.replace('{game}', game)
+            self.patterns.append(pattern)
+            self._add(pattern.split('###'), (handler, kind))
+
+    def _add(self, segments, target):
+        node = self.root
+        for i, segment in enumerate(segments):
+            if segment.startswith('{*'):
+                node.rest = target
+                return
+            if segment.startswith('{'):
+                if node.capture is None:
+                    node.capture = _Node()
+                node = node.capture
+            else:
+                node = node.literals.setdefault(segment, _Node())
+        node.end = target
+
+    def _match(self, node, parts, i, captures):
+        if i == len(parts):
+            return node.end
+        child = node.literals.get(parts[i])
+        if child is not None:
+            target = self._match(child, parts, i + 1, captures)
+            if target is not None:
+                return target
+        if node.capture is not None:
+            captures.append(parts[i])
+            target = self._match(node.capture, parts, i + 1, captures)
+            if target is not None:
+                return target
+            captures.pop()
+        if node.rest is not None:
+            captures.append('###'.join(parts[i:]))
+            return node.rest
+        return None
+
+    def route(self, key, value):
+        """Route one raw key/value pair, returns True if a handler took it"""
+        parts = key.decode('utf-8', errors='ignore').split('###')
+        captures = []
+        target = self._match(self.root, parts, 0, captures)
+        if target is None:
+            return False
+        handler, kind = target
+        handler(decode_value(value, kind), *captures)
+        return True
+
+    def prefixes(self):
+        """
+        Smallest set of literal key prefixes covering all registered patterns.
+
+        Scanning only these ranges skips unrelated parts of the database
+        (e.g. the large changelog blob).
+        """
+        literal_prefixes = []
+        for pattern in self.patterns:
+            segments = []
+            for segment in pattern.split('###'):
+                if segment.startswith('{'):
+                    break
+                segments.append(segment)
+            if len(segments) == len(pattern.split('###')):
+                literal_prefixes.append(pattern)
+            else:
+                literal_prefixes.append('###'.join(segments) + '###')
+        result = []
+        for prefix in sorted(set(literal_prefixes)):
+            if not any(prefix.startswith(other) for other in result):
+                result.append(prefix)
+        return [prefix.encode() for prefix in result]
+
+    def scan(self, db, start=None, stop=None):
+        """
+        Route every key in the ranges the registered patterns can match.
+
+        start/stop limit the scan to one key range [start, stop), e.g. a
+        shard of sharded_scan.map_ranges().
+        """
+        routed = 0
+        for prefix in self.prefixes():
+            low = prefix
+            high = prefix[:-1] + bytes([prefix[-1] + 1])
+            if start is not None:
+                low = max(low, start)
+            if stop is not None:
+                high = min(high, stop)
+            if low >= high:
+                continue
+            for key, value in db.iterator(start=low, stop=high):
+                if self.route(key, value):
+                    routed += 1
+        return routed
+
+def _record_range(db, start, stop, names, game):
+    """Routed (name, captures, value) of one key range, for scan_parallel()"""
+    records = []
+
+    def recorder(name):
+        return lambda value, *captures: records.append((name, captures, value))
+
+    KeyRouter({name: recorder(name) for name in names}, game).scan(db, start, stop)
+    return records
+
+def scan_parallel(db_path, handlers, game='subnautica', jobs=None):
+    """
+    Like KeyRouter(handlers, game).scan() on a closed database, sharded.
+
+    Keys are matched and decoded in sharded_scan worker processes; the
+    handlers run here, in key order. Returns the number of routed keys.
+    """
+    import sharded_scan
+
+    routed = 0
+    for records in sharded_scan.map_ranges(db_path, _record_range, (sorted(handlers), game), jobs):
+        for name, captures, value in records:
+            handlers[name](value, *captures)
+        routed += len(records)
+    return routed
+
+def library_handlers(library):
+    """Handlers that fill a mod_model.ModLibrary (mods, profiles, mod states)"""
+    return {
+        'profile_name': lambda value, profile: library.set_profile_name(profile, value),
+        'mod_enabled': lambda value, profile, mod: library.set_enabled(profile, mod, value),
+        'mod_enabled_time': lambda value, profile, mod: value is not None and library.set_enabled_time(profile, mod, value),
+        'mod_installation_path': lambda value, mod: library.set_field(mod, 'installationPath', value),
+        'mod_type': lambda value, mod: library.set_field(mod, 'type', value),
+        'mod_state': lambda value, mod: library.set_field(mod, 'state', value),
+        'mod_attribute': lambda value, mod, attribute: library.set_attribute(mod, attribute, value),
+    }
+
+def load_state(db_path='state/', game='subnautica', keep_attributes=(), extra_handlers=None):
+    """
+    Load the active profile, paths, mods and profile states in one routed pass.
+
+    Returns a dict with 'active_profile_id', 'game_path', 'staging_path'
+    (as stored, Windows paths) and 'library' (a mod_model.ModLibrary), or
+    None if the database can't be opened.
+    """
+    import mod_model
+
+    try:
+        db = plyvel.DB(db_path, create_if_missing=False)
+    except Exception as e:
+        print(f"Error opening database: {e}")
+        return None
+
+    library = mod_model.ModLibrary(keep_attributes)
+    state = {
+        'active_profile_id': None,
+        'game_path': None,
+        'staging_path': None,
+        'library': library,
+    }
+
+    handlers = library_handlers(library)
+    handlers['active_profile'] = lambda value: state.__setitem__('active_profile_id', value)
+    handlers['game_path'] = lambda value: state.__setitem__('game_path', value)
+    handlers['staging_path'] = lambda value: state.__setitem__('staging_path', value)
+    if extra_handlers:
+        handlers.update(extra_handlers)
+
+    try:
+        KeyRouter(handlers, game).scan(db)
+    finally:
+        db.close()
+
+    return state